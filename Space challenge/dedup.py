@@ -0,0 +1,132 @@
+# Ingestion-time deduplication for parseris.py: one canonical record per publication.
+#
+# Records are looked at in CSV order and a record is an alias of an earlier, canonical one when
+#   1. it has the same PMC id (the same article listed under another title or URL),
+#   2. its section text is identical after normalization (sha256 content hash), or
+#   3. its section text is nearly identical (errata, re-exports): MinHash signatures over word
+#      shingles are bucketed with LSH and a candidate counts when the estimated Jaccard
+#      similarity reaches the threshold.
+# Error records and records without text are never compared by content. An error record is kept
+# until a good record with the same PMC id turns up, which then takes its place; failed fetches are
+# retried as before either way (the journal keeps every record).
+#
+# Signatures use one-permutation hashing (one hash per shingle, kept per slot) with the
+# built-in hash(); they only live for one run and are never written out.
+
+import os
+import re
+import hashlib
+
+from record_writer import record_key
+
+# Estimated Jaccard similarity of section text at or above which two records are the same article
+DEDUP_THRESHOLD = float(os.environ.get("DEDUP_THRESHOLD", "0.85"))
+SHINGLE_WORDS = 5
+# Shorter texts are only compared by PMC id and content hash
+MIN_WORDS = 50
+SLOTS = 128
+BANDS = 16
+
+_ROWS = SLOTS // BANDS
+_MASK = (1 << 64) - 1
+# above any slot value (64-bit hash // SLOTS), so borrowed values never equal real ones
+_BORROW = 1 << 58
+_WORD_RE = re.compile(r"\w+")
+
+
+def words(record):
+    """Lowercased words of a record's section text; the CSV title is left out on purpose."""
+    texts = (record.get("sections") or {}).values()
+    return _WORD_RE.findall(" ".join(t for t in texts if isinstance(t, str)).lower())
+
+
+def content_hash(tokens):
+    return hashlib.sha256(" ".join(tokens).encode("utf-8")).hexdigest()
+
+
+def signature(tokens, slots=SLOTS):
+    """MinHash signature of the word shingles of ``tokens``.
+
+    Each shingle is hashed once; the low bits pick a slot, the rest compete for its minimum.
+    Empty slots borrow from the next filled one so that every slot stays comparable.
+    """
+    sig = [None] * slots
+    for shingle in set(zip(*(tokens[i:] for i in range(SHINGLE_WORDS)))):
+        h = hash(shingle) & _MASK
+        slot, value = h % slots, h // slots
+        if sig[slot] is None or value < sig[slot]:
+            sig[slot] = value
+    if all(v is None for v in sig):
+        return None
+    out = list(sig)
+    for i in range(slots):
+        if sig[i] is None:
+            step = 1
+            while sig[(i + step) % slots] is None:
+                step += 1
+            out[i] = sig[(i + step) % slots] + step * _BORROW
+    return tuple(out)
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+class Deduplicator:
+    """Feed records in order with ``add``; it answers whether each one duplicates an earlier one."""
+
+    def __init__(self, threshold=DEDUP_THRESHOLD):
+        self.threshold = threshold
+        self._keys = {}       # PMC id -> canonical number
+        self._failed = {}     # PMC id -> number of an error record kept for it so far
+        self.replaced = {}    # number -> number of the error record it replaces
+        self._hashes = {}     # content hash -> canonical number
+        self._buckets = [{} for _ in range(BANDS)]
+        self._signatures = {}
+        self._count = 0
+
+    def add(self, record):
+        """Register the next record; returns ``(canonical number, reason, similarity)`` or None.
+
+        Numbers count every ``add`` call from 0. Only canonical records are remembered, so an
+        alias always points at a canonical record. When a good record arrives for a PMC id that so
+        far only had an error record, ``replaced[number]`` names that error record, which the
+        caller drops whatever ``add`` returns.
+        """
+        number = self._count
+        self._count += 1
+        key = record_key(record.get("link"))
+        if key in self._keys:
+            return self._keys[key], "pmcid", 1.0
+        if record.get("error"):
+            if key in self._failed:
+                return self._failed[key], "pmcid", 1.0
+            self._failed[key] = number
+            return None
+        if key in self._failed:
+            self.replaced[number] = self._failed.pop(key)
+        tokens = words(record)
+        if not tokens:
+            self._keys[key] = number
+            return None
+        digest = content_hash(tokens)
+        if digest in self._hashes:
+            return self._hashes[digest], "content_hash", 1.0
+        sig = signature(tokens) if len(tokens) >= MIN_WORDS else None
+        if sig is not None:
+            best = None
+            for band, bucket in enumerate(self._buckets):
+                for other in bucket.get(sig[band * _ROWS:(band + 1) * _ROWS], ()):
+                    score = similarity(sig, self._signatures[other])
+                    if score >= self.threshold and (best is None or score > best[1]):
+                        best = (other, score)
+            if best is not None:
+                return best[0], "near_duplicate", round(best[1], 3)
+        self._keys[key] = number
+        self._hashes[digest] = number
+        if sig is not None:
+            self._signatures[number] = sig
+            for band, bucket in enumerate(self._buckets):
+                bucket.setdefault(sig[band * _ROWS:(band + 1) * _ROWS], []).append(number)
+        return None
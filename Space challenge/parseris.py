@@ -2,25 +2,40 @@
 # and to help with some technical difficulties ChatGPT was used 
 
 import os
+import re
 import csv
 import json
 import logging
-from time import sleep
+import argparse
+import importlib.util
+import threading
+from time import sleep, monotonic
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 
 import requests
 from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
 from urllib3.util.retry import Retry
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from tqdm import tqdm
 
+from scrape_cache import ResponseCache, Journal
+from record_writer import RecordWriter, iter_records
+from dedup import DEDUP_THRESHOLD, Deduplicator
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 CSV_PATH = os.path.join(BASE_DIR, "SB_publication_PMC.csv")
-OUT_PATH = os.path.join(BASE_DIR, "data.json")
+OUT_PATH = os.path.join(BASE_DIR, "data.jsonl")
+LEGACY_OUT_PATH = os.path.join(BASE_DIR, "data.json")
+CACHE_DIR = os.path.join(BASE_DIR, ".http_cache")
+JOURNAL_PATH = os.path.join(BASE_DIR, "scrape_journal.jsonl")
 
-publications = {}
+# [(title, link), ...] for every CSV row, in order. A link listed under several titles is only
+# scraped once; the later rows are published as same-id duplicates of the first (see main()).
+publications = []
 if not os.path.exists(CSV_PATH):
     logging.error("CSV file not found: %s", CSV_PATH)
 else:
@@ -32,64 +47,213 @@ else:
             pass
         for row in reader:
             if len(row) >= 2:
-                publications[row[0]] = row[1]
+                publications.append((row[0], row[1]))
+
+# BeautifulSoup with html.parser by default: its output is the baseline the corpus was built with.
+# SCRAPER_HTML_PARSER=lxml opts into the faster direct lxml extraction, which matches it on
+# well-formed pages but drops text on some malformed markup (block elements inside <p>, unclosed
+# <p>); tests/fixtures/pmc holds the cases, tests/test_extract_golden.py compares both parsers.
+HTML_PARSER = os.environ.get("SCRAPER_HTML_PARSER", "html.parser")
+if importlib.util.find_spec("lxml"):
+    from lxml import etree
+elif HTML_PARSER == "lxml":
+    logging.warning("SCRAPER_HTML_PARSER=lxml but lxml is not installed; using html.parser")
+    HTML_PARSER = "html.parser"
+# only the article body is ever read, so only it is turned into a tree (the class attribute is
+# still a raw string while parsing, hence the word-boundary pattern)
+ARTICLE_BODY = SoupStrainer("section", attrs={"class": re.compile(r"(?:^|\s)main-article-body(?:\s|$)")})
 
 headers = {"User-Agent": "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/117.0"}
 
-session = requests.Session()
-session.headers.update(headers)
-retries = Retry(total=3, backoff_factor=0.3, status_forcelist=(500, 502, 503, 504))
-adapter = HTTPAdapter(max_retries=retries)
-session.mount("https://", adapter)
-session.mount("http://", adapter)
+# Concurrent mode defaults (see --help)
+DEFAULT_WORKERS = 8
+DEFAULT_RATE = 5.0  # requests per second per host
+DEFAULT_PARSE_PROCS = max(1, (os.cpu_count() or 2) - 1)
+
+
+def make_session():
+    s = requests.Session()
+    s.headers.update(headers)
+    retries = Retry(total=3, backoff_factor=0.3, status_forcelist=(500, 502, 503, 504))
+    adapter = HTTPAdapter(max_retries=retries, pool_maxsize=DEFAULT_WORKERS)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+
+session = make_session()
+
+
+def error_record(pub_name, url, error):
+    return {"name": pub_name, "link": url, "sectionNames": [], "sections": {}, "error": error}
 
 
-def parsing(pub_name, url, timeout=10):
+def fetch(pub_name, url, timeout=10, sess=None, cache=None):
+    """Download one article page. Returns (html, error_record, not_modified).
+
+    With a ``cache`` the request is conditional on the cached ETag/Last-Modified; a 304 answers
+    with the cached page and ``not_modified=True``.
+    """
+    sess = sess or session
     try:
-        resp = session.get(url, timeout=timeout)
+        resp = sess.get(url, timeout=timeout, headers=cache.conditional_headers(url) if cache else None)
+        if resp.status_code == 304:
+            html = cache.body(url) if cache else None
+            if html is not None:
+                return html, None, True
+            # validators without a body (cache was cleared): fetch it for real
+            resp = sess.get(url, timeout=timeout)
         resp.raise_for_status()
     except RequestException as e:
         logging.error("Network error for %s (%s): %s", pub_name, url, e)
-        return {"name": pub_name, "link": url, "sectionNames": [], "sections": {}, "error": str(e)}
+        return None, error_record(pub_name, url, str(e)), False
+    if cache:
+        try:
+            cache.store(url, resp)
+        except OSError:
+            logging.exception("Failed to cache response for %s", url)
+    return resp.text, None, False
+
+
+def parsing(pub_name, url, timeout=10, cache=None, previous=None):
+    html, err, not_modified = fetch(pub_name, url, timeout, cache=cache)
+    if err is not None:
+        return err
+    reused = reuse_unchanged(pub_name, url, not_modified, previous)
+    if reused is not None:
+        return reused
+    return extract_sections(pub_name, url, html)
+
+
+def reuse_unchanged(pub_name, url, not_modified, previous):
+    """The previous good record for ``url`` when the server reported the page unchanged."""
+    prev = (previous or {}).get(url)
+    if not_modified and prev and not prev.get("error"):
+        return dict(prev, name=pub_name)
+    return None
+
+
+# Text inside these is not part of BeautifulSoup's get_text() either
+_LX_SKIP_TEXT = frozenset(("script", "style", "template"))
+
+
+def _lx_iter_live(el, tag, removed):
+    """Descendants of ``el`` named ``tag`` in document order, skipping removed subtrees."""
+    stack = list(reversed(el))
+    while stack:
+        node = stack.pop()
+        if not isinstance(node.tag, str) or node in removed:
+            continue
+        if node.tag == tag:
+            yield node
+        stack.extend(reversed(node))
+
+
+def _lx_text(el, removed):
+    """Equivalent of BeautifulSoup ``get_text(separator="", strip=True)`` on an lxml element.
+
+    Removed elements keep their tail as a separate string, exactly like ``decompose()`` leaves
+    the following NavigableString in place.
+    """
+    out = []
+    stack = [(el, False)]
+    while stack:
+        node, tail_only = stack.pop()
+        if tail_only:
+            if node.tail:
+                out.append(node.tail)
+            continue
+        if node is not el:
+            stack.append((node, True))
+        if not isinstance(node.tag, str) or node in removed:
+            continue
+        if node.text and node.tag not in _LX_SKIP_TEXT:
+            out.append(node.text)
+        stack.extend((child, False) for child in reversed(node))
+    return "".join(t for t in (s.strip() for s in out) if t)
+
+
+def _extract_lxml(html):
+    """Section names and texts using lxml directly (no BeautifulSoup tree).
+
+    Mirrors the BeautifulSoup walk below: every <section> inside a main-article-body section with
+    a (not yet consumed) <h2> becomes a section; its h2 is then treated as decomposed.
+    """
+    root = etree.fromstring(html, etree.HTMLParser())
+    all_section_names = []
+    inner_text = {}
+    if root is None:
+        return all_section_names, inner_text
+    removed = set()
+    for sec in root.iter("section"):
+        if "main-article-body" not in (sec.get("class") or "").split():
+            continue
+        for subsec in list(_lx_iter_live(sec, "section", set())):
+            h2 = next(_lx_iter_live(subsec, "h2", removed), None)
+            if h2 is None:
+                continue
+            Section_name = _lx_text(h2, removed)
+            all_section_names.append(Section_name)
+            parts = []
+            removed.add(h2)
+            h3 = next(_lx_iter_live(subsec, "h3", removed), None)
+            if h3 is not None:
+                parts.append(_lx_text(h3, removed))
+                parts.append("\n")
+            for paragraph in _lx_iter_live(subsec, "p", removed):
+                parts.append(_lx_text(paragraph, removed))
+                parts.append("\n")
+            if Section_name == "References":
+                parts.append(_lx_text(subsec, removed))
+            inner_text[Section_name] = "".join(parts)
+    return all_section_names, inner_text
+
 
+def extract_sections(pub_name, url, html, progress=True):
+    """Turn an article page into its {name, link, sectionNames, sections} record."""
+    if HTML_PARSER == "lxml":
+        try:
+            names, texts = _extract_lxml(html)
+            logging.info("done: %s", pub_name)
+            return {"name": pub_name, "link": url, "sectionNames": names, "sections": texts}
+        except (ValueError, etree.LxmlError):
+            # e.g. an XML encoding declaration in a str document; the BeautifulSoup path copes
+            logging.debug("lxml extraction failed for %s, falling back to BeautifulSoup", pub_name)
     try:
-        soup = BeautifulSoup(resp.text, "html.parser")
+        soup = BeautifulSoup(html, HTML_PARSER, parse_only=ARTICLE_BODY)
     except Exception as e:
         logging.exception("Failed to parse HTML for %s (%s): %s", pub_name, url, e)
-        return {"name": pub_name, "link": url, "sectionNames": [], "sections": {}, "error": "parse_error"}
+        return error_record(pub_name, url, "parse_error")
 
     json_dictionary = {"name": pub_name, "link": url}
-    sections = soup.find_all("section")
     all_section_names = []
     inner_text = {}
 
-    for sec in sections:
+    for sec in soup.find_all("section", class_="main-article-body"):
         try:
-            if "class" in sec.attrs and "main-article-body" in sec["class"]:
-                subsections = sec.find_all("section")
-                for subsec in tqdm(subsections, desc=f"Parsing sections: {pub_name}", leave=False):
-                    try:
-                        if subsec.h2 is not None:
-                            Section_name = subsec.h2.get_text(strip=True)
-                            all_section_names.append(Section_name)
-                            temp_text = ""
-                            subsec.h2.decompose()
-                            if subsec.h3 is not None:
-                                subsection_name = subsec.h3.get_text(strip=True)
-                                temp_text += subsection_name + "\n"
-
-                            for paragraph in subsec.find_all("p"):
-                                par = paragraph.get_text(separator="", strip=True)
-                                temp_text += par + "\n"
-
-                            if Section_name == "References":
-                                ref = subsec.get_text(separator="", strip=True)
-                                temp_text += ref
-
-                            inner_text[Section_name] = temp_text
-                    except Exception:
-                        logging.exception("Error processing subsection in %s", pub_name)
-                        continue
+            subsections = sec.find_all("section")
+            for subsec in tqdm(subsections, desc=f"Parsing sections: {pub_name}", leave=False, disable=not progress):
+                try:
+                    if subsec.h2 is not None:
+                        Section_name = subsec.h2.get_text(strip=True)
+                        all_section_names.append(Section_name)
+                        parts = []
+                        subsec.h2.decompose()
+                        if subsec.h3 is not None:
+                            parts.append(subsec.h3.get_text(strip=True))
+                            parts.append("\n")
+
+                        for paragraph in subsec.find_all("p"):
+                            parts.append(paragraph.get_text(separator="", strip=True))
+                            parts.append("\n")
+
+                        if Section_name == "References":
+                            parts.append(subsec.get_text(separator="", strip=True))
+
+                        inner_text[Section_name] = "".join(parts)
+                except Exception:
+                    logging.exception("Error processing subsection in %s", pub_name)
+                    continue
         except Exception:
             logging.exception("Error processing section container for %s", pub_name)
             continue
@@ -100,27 +264,177 @@ def parsing(pub_name, url, timeout=10):
     return json_dictionary
 
 
-def main():
-    results = []
-    items = list(publications.items())
+def extract_sections_quiet(pub_name, url, html):
+    # process-pool entry point: no per-article progress bars from worker processes
     try:
-        for NAME, LINK in tqdm(items, desc="Parsing articles", total=len(items)):
-            try:
-                res = parsing(NAME, LINK)
-                results.append(res)
-                sleep(0.05)
-            except Exception as e:
-                logging.exception("Failed to parse article %s: %s", NAME, e)
-                results.append({"name": NAME, "link": LINK, "sectionNames": [], "sections": {}, "error": str(e)})
+        return extract_sections(pub_name, url, html, progress=False)
+    except Exception as e:
+        logging.exception("Failed to parse article %s: %s", pub_name, e)
+        return error_record(pub_name, url, str(e))
+
+
+class HostRateLimiter:
+    """Spaces out request start times per host to at most ``rate`` per second (0 disables)."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = monotonic()
+            slot = max(now, self._next.get(host, now))
+            self._next[host] = slot + self.interval
+        if slot > now:
+            sleep(slot - now)
+
+
+def run_sequential(items, on_result, cache=None, previous=None):
+    for NAME, LINK in tqdm(items, desc="Parsing articles", total=len(items)):
+        try:
+            res = parsing(NAME, LINK, cache=cache, previous=previous)
+            sleep(0.05)
+        except Exception as e:
+            logging.exception("Failed to parse article %s: %s", NAME, e)
+            res = error_record(NAME, LINK, str(e))
+        on_result(res)
+
+
+def run_concurrent(items, on_result, workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, parse_procs=DEFAULT_PARSE_PROCS,
+                   cache=None, previous=None):
+    """Fetch ``items`` [(name, url), ...] with a thread pool and parse them in a process pool.
+
+    ``workers`` caps concurrent downloads, ``rate`` caps requests per second per host and
+    ``parse_procs`` sizes the HTML parsing pool. ``on_result`` is called from this thread, once per
+    article, in completion order. ``cache``/``previous`` work as in ``parsing()``.
+    """
+    limiter = HostRateLimiter(rate)
+    local = threading.local()
+
+    def _fetch(name, url):
+        sess = getattr(local, "session", None)
+        if sess is None:
+            sess = local.session = make_session()
+        limiter.wait(url)
+        return fetch(name, url, sess=sess, cache=cache)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as fetchers, \
+            ProcessPoolExecutor(max_workers=max(1, parse_procs)) as parsers, \
+            tqdm(desc="Parsing articles", total=len(items)) as bar:
+        pending = {fetchers.submit(_fetch, name, url): ("fetch", name, url) for name, url in items}
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    stage, name, url = pending.pop(fut)
+                    try:
+                        res = fut.result()
+                    except Exception as e:
+                        logging.exception("Failed to %s article %s: %s", stage, name, e)
+                        res = (None, error_record(name, url, str(e)), False) if stage == "fetch" else error_record(name, url, str(e))
+                    if stage == "fetch":
+                        html, err, not_modified = res
+                        res = err or reuse_unchanged(name, url, not_modified, previous)
+                        if res is None:
+                            # hand the page to a parser process; the fetch thread moves on
+                            pending[parsers.submit(extract_sections_quiet, name, url, html)] = ("parse", name, url)
+                            continue
+                    on_result(res)
+                    bar.update(1)
+        except BaseException:
+            for fut in pending:
+                fut.cancel()
+            raise
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape the PMC articles listed in SB_publication_PMC.csv into data.jsonl.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="concurrent downloads; 1 uses the original one-at-a-time loop (default: %(default)s)")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                        help="max requests per second per host, 0 for unlimited (default: %(default)s)")
+    parser.add_argument("--parse-procs", type=int, default=DEFAULT_PARSE_PROCS,
+                        help="processes used for HTML parsing (default: %(default)s)")
+    parser.add_argument("--revalidate", action="store_true",
+                        help="also re-check already scraped articles with conditional requests")
+    parser.add_argument("--full", action="store_true",
+                        help="ignore the journal and response cache and scrape everything again")
+    parser.add_argument("--export-json", action="store_true",
+                        help="also write the old pretty-printed data.json")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="publish every record, including duplicates of earlier ones")
+    parser.add_argument("--dedup-threshold", type=float, default=DEDUP_THRESHOLD,
+                        help="section text similarity at which a record is a near-duplicate (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    cache = None if args.full else ResponseCache(CACHE_DIR)
+    journal = Journal(JOURNAL_PATH)
+    previous = {} if args.full else journal.load()
+
+    titles = {}  # link -> its CSV titles in order
+    for NAME, LINK in publications:
+        titles.setdefault(LINK, []).append(NAME)
+    items = [(names[0], link) for link, names in titles.items()]
+    order = {link: i for i, (_, link) in enumerate(items)}
+    writer = RecordWriter(OUT_PATH)
+
+    def publish(res):
+        writer.write(res)
+        if not args.no_dedup:
+            # the same record under the link's other titles: the deduplicator folds them into the
+            # first one (same PMC id), so they end up in its "aliases" and in data.aliases.json
+            for name in titles.get(res.get("link"), ())[1:]:
+                writer.write(dict(res, name=name))
+
+    todo = []
+    for NAME, LINK in items:
+        prev = previous.get(LINK)
+        if prev and not prev.get("error") and not args.revalidate:
+            publish(dict(prev, name=NAME))
+        else:
+            todo.append((NAME, LINK))
+    logging.info("%d articles up to date, %d to fetch", len(items) - len(todo), len(todo))
+
+    def on_result(res):
+        # stream each record to disk as soon as it is done
+        publish(res)
+        journal.append(res)
+
+    try:
+        if args.workers <= 1:
+            run_sequential(todo, on_result, cache, previous)
+        else:
+            run_concurrent(todo, on_result, args.workers, args.rate, args.parse_procs, cache, previous)
     except KeyboardInterrupt:
-        logging.warning("Interrupted by user, writing partial results...")
+        logging.warning("Interrupted by user, writing partial results (re-run to resume)...")
     finally:
         try:
-            with open(OUT_PATH, "w", encoding="utf-8") as f:
-                json.dump(results, f, ensure_ascii=False, indent=4)
-            logging.info("Wrote %d records to %s", len(results), OUT_PATH)
+            # the journal keeps duplicates too, so they are not fetched again next run
+            journal.compact(writer.records())
+            written = len(writer)
+            # the index is written in CSV order regardless of completion order; duplicates are
+            # checked in that order too, so the earliest CSV row stays canonical
+            writer.commit(order, dedup=None if args.no_dedup else Deduplicator(args.dedup_threshold))
+            logging.info("Wrote %d records to %s (%d duplicates folded into aliases)",
+                         len(writer), OUT_PATH, written - len(writer))
+            if args.export_json:
+                export_json(OUT_PATH, LEGACY_OUT_PATH, order)
         except Exception:
             logging.exception("Failed to write output file")
+            writer.abort()
+        finally:
+            journal.close()
+
+
+def export_json(src, dst, order):
+    results = sorted(iter_records(src), key=lambda r: order.get(r.get("link"), len(order)))
+    with open(dst, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=4)
+    logging.info("Exported %d records to %s", len(results), dst)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,188 @@
+# Streaming output store for parseris.py (read by app/record_store.py).
+#
+# data.jsonl  one compact JSON record per line, written as articles finish
+# data.idx    JSON {"version", "data_size", "records": [[key, offset, length], ...]} in CSV order;
+#             key is the PMC id taken from the link ("PMC4136787"), so a single article can be
+#             read with one seek instead of loading the whole corpus.
+#
+# data.aliases.json  JSON {"version", "data_size", "aliases": {alias key: {"canonical", "reason",
+#             "similarity", "name", "link"}}, "titles": {id: [title, ...]}}: records dropped as
+#             duplicates (see dedup.py) and the canonical record that stands for them; "titles"
+#             lists the other CSV titles of records kept under their own id.
+#
+# All files are written next to their final names and swapped in with os.replace(); the index
+# and alias table record the data file size so a reader can tell when they do not belong to it.
+
+import os
+import re
+import json
+import hashlib
+
+INDEX_VERSION = 1
+
+_PMC_RE = re.compile(r"PMC\d+", re.IGNORECASE)
+
+
+def record_key(link):
+    """Stable article id: the PMC id in the link, or a hash of the link. Also used by the app
+    (app/record_store.py imports it), so ids on both sides always agree."""
+    m = _PMC_RE.search(link or "")
+    if m:
+        return m.group().upper()
+    return "link-" + hashlib.sha1((link or "").encode("utf-8")).hexdigest()[:16]
+
+
+def index_path_for(data_path):
+    return os.path.splitext(data_path)[0] + ".idx"
+
+
+def aliases_path_for(data_path):
+    return os.path.splitext(data_path)[0] + ".aliases.json"
+
+
+def iter_records(data_path):
+    with open(data_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class RecordWriter:
+    def __init__(self, data_path):
+        self.data_path = data_path
+        self.index_path = index_path_for(data_path)
+        self.aliases_path = aliases_path_for(data_path)
+        self._tmp = f"{data_path}.tmp-{os.getpid()}"
+        self._file = open(self._tmp, "wb")
+        self._entries = []
+        self._offset = 0
+
+    def write(self, record):
+        line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        self._file.write(line)
+        self._entries.append((record_key(record.get("link")), self._offset, len(line), record.get("link")))
+        self._offset += len(line)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def records(self):
+        """The records written so far, in write order (duplicates included)."""
+        self._file.flush()
+        return iter_records(self._tmp)
+
+    def commit(self, order=None, dedup=None):
+        """Publish the data file and its index. ``order`` maps link -> position for the index order.
+
+        With ``dedup`` (a dedup.Deduplicator) records are offered to it in that order and only the
+        canonical ones are published, each listing its duplicates under "aliases"; the alias
+        table is published next to the index.
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        entries = self._entries
+        if order is not None:
+            entries = sorted(entries, key=lambda e: order.get(e[3], len(order)))
+        data_tmp, size, aliases, titles = self._tmp, self._offset, None, None
+        if dedup is not None:
+            data_tmp, entries, size, aliases, titles = self._deduplicate(entries, dedup)
+        index = {
+            "version": INDEX_VERSION,
+            "data_size": size,
+            "records": [[key, offset, length] for key, offset, length, _ in entries],
+        }
+        idx_tmp = f"{self.index_path}.tmp-{os.getpid()}"
+        with open(idx_tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f, separators=(",", ":"))
+        if aliases is not None:
+            aliases_tmp = f"{self.aliases_path}.tmp-{os.getpid()}"
+            with open(aliases_tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "data_size": size, "aliases": aliases, "titles": titles}, f,
+                          ensure_ascii=False, separators=(",", ":"))
+            os.replace(aliases_tmp, self.aliases_path)
+        elif os.path.exists(self.aliases_path):
+            os.remove(self.aliases_path)
+        os.replace(data_tmp, self.data_path)
+        os.replace(idx_tmp, self.index_path)
+        if data_tmp != self._tmp:
+            os.remove(self._tmp)
+        self._entries = entries
+
+    def _deduplicate(self, entries, dedup):
+        """Copy the canonical records of ``entries`` to a second temp file.
+
+        Returns (its path, its entries, its size, the alias table, the other titles per id).
+        """
+        found = {}      # entry number -> its duplicates
+        dropped = set()
+        aliases = {}
+        titles = {}
+        with open(self._tmp, "rb") as src:
+            def read(entry):
+                src.seek(entry[1])
+                return json.loads(src.read(entry[2]))
+
+            for number, entry in enumerate(entries):
+                record = read(entry)
+                dup = dedup.add(record)
+                failed = dedup.replaced.get(number)
+                if failed is not None:
+                    # an error record for this id, superseded by this one; its duplicates move along
+                    dropped.add(failed)
+                    moved = found.pop(failed, [])
+                    old = read(entries[failed])
+                    if (old.get("name"), old.get("link")) != (record.get("name"), record.get("link")):
+                        moved.insert(0, {"name": old.get("name"), "link": old.get("link"), "reason": "pmcid",
+                                         "id": entries[failed][0]})
+                    if moved:
+                        found.setdefault(number if dup is None else dup[0], []).extend(moved)
+                if dup is None:
+                    continue
+                target, reason, similarity = dup
+                dropped.add(number)
+                canonical = entries[target][0]
+                alias = {"name": record.get("name"), "link": record.get("link"), "reason": reason}
+                found.setdefault(target, []).append(dict(alias, id=entry[0]))
+                # a duplicate under the same PMC id needs no table entry: its key finds the canonical
+                if entry[0] != canonical:
+                    aliases[entry[0]] = dict(alias, canonical=canonical, similarity=similarity)
+
+            out = f"{self.data_path}.dedup-{os.getpid()}"
+            kept = []
+            offset = 0
+            try:
+                with open(out, "wb") as dst:
+                    for number, entry in enumerate(entries):
+                        if number in dropped:
+                            continue
+                        if number in found:
+                            record = read(entry)
+                            record["aliases"] = found[number]
+                            names = [a["name"] for a in found[number]
+                                     if a["id"] == entry[0] and a["name"] and a["name"] != record.get("name")]
+                            if names:
+                                titles[entry[0]] = list(dict.fromkeys(names))
+                            line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+                        else:
+                            src.seek(entry[1])
+                            line = src.read(entry[2])
+                        dst.write(line)
+                        kept.append((entry[0], offset, len(line), entry[3]))
+                        offset += len(line)
+                    dst.flush()
+                    os.fsync(dst.fileno())
+            except BaseException:
+                try:
+                    os.remove(out)
+                except OSError:
+                    pass
+                raise
+        return out, kept, offset, aliases, titles
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.remove(self._tmp)
+        except OSError:
+            pass
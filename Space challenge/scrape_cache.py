@@ -0,0 +1,113 @@
+# On-disk state that lets parseris.py skip work between runs:
+#  - ResponseCache keeps raw article pages with their ETag/Last-Modified validators so a re-run
+#    can revalidate with conditional requests instead of downloading again;
+#  - Journal is an append-only checkpoint of finished article records, used to resume an
+#    interrupted run and to only retry rows that are new or failed last time.
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+
+class ResponseCache:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, key[:2], key)
+        return base + ".html", base + ".json"
+
+    def meta(self, url):
+        _, meta_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def body(self, url):
+        body_path, _ = self._paths(url)
+        try:
+            with open(body_path, "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def conditional_headers(self, url):
+        meta = self.meta(url)
+        if not meta:
+            return {}
+        hdrs = {}
+        if meta.get("etag"):
+            hdrs["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            hdrs["If-Modified-Since"] = meta["last_modified"]
+        return hdrs
+
+    def store(self, url, resp):
+        body_path, meta_path = self._paths(url)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        meta = {
+            "url": url,
+            "status": resp.status_code,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+        }
+        # body first, metadata last: a crash in between leaves no validators for a stale body
+        for path, payload in ((body_path, resp.text), (meta_path, json.dumps(meta))):
+            tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp, path)
+
+
+class Journal:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def load(self):
+        """Finished records keyed by link (the last entry for a link wins)."""
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    # torn last line from an interrupted run
+                    logging.warning("Skipping unreadable journal line in %s", self.path)
+                    continue
+                if isinstance(rec, dict) and rec.get("link"):
+                    records[rec["link"]] = rec
+        return records
+
+    def append(self, record):
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def compact(self, records):
+        """Rewrite the journal to hold exactly ``records``."""
+        with self._lock:
+            self.close()
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for rec in records:
+                    f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            os.replace(tmp, self.path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -3,140 +3,84 @@
 from fastapi import FastAPI, Request, Query, HTTPException
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 import os
 import json
+import asyncio
 import logging
-from typing import List, Dict, Any
-import subprocess
+from typing import List, Dict, Any, Optional, Tuple
 import time
-import socket
-from threading import Thread
-import http.client
+
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+
+from corpus import corpus_store, CorpusError
+from search_index import tokenize
+from highlight import Highlighter
+from facets import FacetIndex
+import retrieval
+from retrieval import RERANK_MODEL, hybrid_articles, hybrid_chunks, lexical_ranking, rerank
+from query_cache import search_cache, ask_cache, normalize_query
+from metrics import metrics, record_stage, request_timings, server_timing, stage
+from warmup import Warmup
+import ollama_client
+from ollama_client import OLLAMA_HOST, OLLAMA_PORT, ModelBusyError, model_gate
+from ollama_supervisor import OLLAMA_START_TIMEOUT, OllamaSupervisor, OllamaUnavailable
 
 app = FastAPI()
 
-# --- Ollama auto-start logic ---
-_ollama_process = None
-_ollama_started_here = False
+# Per-stage Server-Timing header on every response (set to 0 to hide internals from clients)
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "1") not in ("0", "false", "False")
+METRICS_PREFIX = "spaceapp_"
 
-OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "127.0.0.1")
-OLLAMA_PORT = int(os.environ.get("OLLAMA_PORT", "11434"))
-OLLAMA_AUTOSTART = os.environ.get("OLLAMA_AUTOSTART", "1") not in ("0", "false", "False")
-OLLAMA_COMMAND = os.environ.get("OLLAMA_COMMAND", "ollama serve")
-OLLAMA_START_TIMEOUT = float(os.environ.get("OLLAMA_START_TIMEOUT", "60"))
-OLLAMA_LAZY_RETRY = os.environ.get("OLLAMA_LAZY_RETRY", "1") not in ("0", "false", "False")
 # Hardcoded CFG options (no env overrides)
 OLLAMA_CFG_NEGATIVE_PROMPT = "Write ethical, moral and legal responses only."
 OLLAMA_CFG_SCALE = 2.0
+OLLAMA_MODEL = "llama3"
+# /ask retrieves RETRIEVAL_CANDIDATES chunks and prompts with at most RETRIEVAL_K of them,
+# within RAG_CONTEXT_TOKENS (estimated) of context
+RETRIEVAL_K = int(os.environ.get("RETRIEVAL_K", "6"))
+RETRIEVAL_CANDIDATES = int(os.environ.get("RETRIEVAL_CANDIDATES", "20"))
+RAG_CONTEXT_TOKENS = int(os.environ.get("RAG_CONTEXT_TOKENS", "1200"))
+# "hybrid" fuses the dense candidates with BM25 over the chunks; "dense" uses vector similarity only
+ASK_RETRIEVAL = os.environ.get("ASK_RETRIEVAL", "hybrid")
 
 logger = logging.getLogger("nasaSpaceChallenge")  # ensure logger exists early
 
-def _is_port_open(host: str, port: int, timeout: float = 0.5) -> bool:
-    try:
-        with socket.create_connection((host, port), timeout=timeout):
-            return True
-    except OSError:
-        return False
-
-def _ollama_healthcheck(timeout: float = 0.75) -> bool:
-    try:
-        conn = http.client.HTTPConnection(OLLAMA_HOST, OLLAMA_PORT, timeout=timeout)
-        conn.request("GET", "/api/version")
-        resp = conn.getresponse()
-        ok = 200 <= resp.status < 300
-        conn.close()
-        return ok
-    except Exception:
-        return False
-
-def _ollama_ready() -> bool:
-    return _ollama_healthcheck()
-
-def _log_process_pipes(proc: subprocess.Popen, prefix: str):
-    def _reader(stream, level):
-        if not stream:
-            return
-        for line in iter(stream.readline, b""):
-            if not line:
-                break
-            try:
-                logger.log(level, "%s%s", prefix, line.decode(errors="ignore").rstrip())
-            except Exception:
-                pass
-    Thread(target=_reader, args=(proc.stdout, logging.INFO), daemon=True).start()
-    Thread(target=_reader, args=(proc.stderr, logging.WARNING), daemon=True).start()
-
-def _start_ollama_background(block: bool = False):
-    global _ollama_process, _ollama_started_here
-    if _ollama_ready():
-        logger.info("Ollama already responsive at %s:%s", OLLAMA_HOST, OLLAMA_PORT)
-        return True
-    try:
-        logger.info("Starting Ollama server with command: %s", OLLAMA_COMMAND)
-        if os.name == 'nt':
-            _ollama_process = subprocess.Popen(OLLAMA_COMMAND, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        else:
-            # split only when not using shell
-            parts = OLLAMA_COMMAND if isinstance(OLLAMA_COMMAND, list) else OLLAMA_COMMAND.split()
-            _ollama_process = subprocess.Popen(parts, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        _ollama_started_here = True
-        _log_process_pipes(_ollama_process, "[ollama] ")
-    except FileNotFoundError:
-        logger.error("Ollama command not found. Set OLLAMA_COMMAND env var to full path, e.g. C:/Users/<user>/AppData/Local/Programs/Ollama/ollama.exe serve")
-        return False
-    except Exception as e:
-        logger.error("Failed to launch Ollama: %s", e)
-        return False
-
-    if not block:
-        # background wait thread just logs readiness
-        def _wait():
-            deadline = time.time() + OLLAMA_START_TIMEOUT
-            while time.time() < deadline:
-                if _ollama_ready():
-                    logger.info("Ollama became ready.")
-                    return
-                time.sleep(0.5)
-            logger.warning("Ollama did not become ready within %.1fs (non-blocking)", OLLAMA_START_TIMEOUT)
-        Thread(target=_wait, daemon=True).start()
-        return True
-
-    # blocking wait
-    deadline = time.time() + OLLAMA_START_TIMEOUT
-    while time.time() < deadline:
-        if _ollama_ready():
-            logger.info("Ollama ready (blocking wait).")
-            return True
-        # process crashed?
-        if _ollama_process and _ollama_process.poll() is not None:
-            logger.error("Ollama process exited early with code %s", _ollama_process.returncode)
-            return False
-        time.sleep(0.5)
-    logger.warning("Ollama did not become ready within %.1fs (blocking)", OLLAMA_START_TIMEOUT)
-    return False
+# owns the local `ollama serve` process (see ollama_supervisor.py)
+ollama_supervisor = OllamaSupervisor(OLLAMA_MODEL)
 
 @app.on_event("startup")
-async def ensure_ollama_running():
-    if not OLLAMA_AUTOSTART:
-        logger.info("OLLAMA_AUTOSTART disabled; expecting external Ollama server.")
-        return
-    Thread(target=_start_ollama_background, kwargs={"block": False}, daemon=True).start()
+async def start_ollama_supervisor():
+    ollama_supervisor.start()
 
 @app.on_event("shutdown")
 async def stop_local_ollama():
-    global _ollama_process
-    if _ollama_process and _ollama_started_here:
-        try:
-            logger.info("Terminating Ollama process started by this app...")
-            _ollama_process.terminate()
-            try:
-                _ollama_process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                logger.info("Ollama did not exit gracefully; killing...")
-                _ollama_process.kill()
-        except Exception as e:
-            logger.warning("Error stopping Ollama: %s", e)
+    await run_in_threadpool(ollama_supervisor.stop)
+
+@app.on_event("shutdown")
+async def close_ollama_clients():
+    await ollama_client.aclose()
+
+@app.middleware("http")
+async def request_metrics(request: Request, call_next):
+    timings = []
+    token = request_timings.set(timings)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        request_timings.reset(token)
+    elapsed = time.perf_counter() - started
+    # label by route template, not raw path, so /article/{article_id} stays one series
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    metrics.inc("http_requests_total", route=path, status=response.status_code)
+    metrics.observe("http_request_duration_seconds", elapsed, route=path)
+    if SERVER_TIMING:
+        # streamed responses report the time until their headers were ready
+        response.headers["Server-Timing"] = server_timing(timings + [("app", elapsed)])
+    return response
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -149,176 +93,255 @@ logger = logging.getLogger("nasaSpaceChallenge")
 def homepage(request: Request):
     return templates.TemplateResponse("main.html", {"request": request})
 
+def make_excerpt(text: str, q: str, radius: int = 80, idx: int = None) -> str:
+    if not isinstance(text, str):
+        return ""
+    if idx is None:
+        idx = text.lower().find(q)
+    if idx == -1:
+        snippet = text[: radius * 2]
+    else:
+        start = max(0, idx - radius)
+        end = min(len(text), idx + len(q) + radius)
+        snippet = text[start:end]
+    snippet = snippet.strip()
+    if len(snippet) < len(text):
+        return snippet + "..."
+    return snippet
+
+SEARCH_FIELDS = ("id", "name", "link", "matches", "sections", "content", "highlights", "meta",
+                 "match_count", "occurrence_count", "word_match_count", "score")
+# "content" (full section text inside "sections") is opt-in; clients fetch it per article from /article/{id}.
+# "meta" (precomputed article metadata, see facets.py) is opt-in too.
+DEFAULT_SEARCH_FIELDS = frozenset(f for f in SEARCH_FIELDS if f not in ("content", "meta"))
+SEARCH_MAX_LIMIT = 200
+# chunks fetched from the vector index for hybrid /search
+SEARCH_DENSE_CANDIDATES = int(os.environ.get("SEARCH_DENSE_CANDIDATES", "100"))
+
+def _parse_fields(fields: str) -> frozenset:
+    if not fields:
+        return DEFAULT_SEARCH_FIELDS
+    wanted = frozenset(f.strip() for f in fields.split(",") if f.strip())
+    unknown = wanted.difference(SEARCH_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(sorted(unknown))}. "
+                                                    f"Allowed: {', '.join(SEARCH_FIELDS)}")
+    if "content" in wanted:
+        wanted = wanted | {"sections"}
+    return wanted
+
+def _parse_facets(facets: str) -> Tuple[str, ...]:
+    if not facets:
+        return FacetIndex.FACETS
+    if facets == "none":
+        return ()
+    wanted = tuple(dict.fromkeys(f.strip() for f in facets.split(",") if f.strip()))
+    unknown = [f for f in wanted if f not in FacetIndex.FACETS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown facet(s): {', '.join(unknown)}. "
+                                                    f"Allowed: {', '.join(FacetIndex.FACETS)}")
+    return wanted
+
+def _parse_filters(corpus, filters: List[str]) -> Tuple[Tuple[str, Tuple[str, ...]], ...]:
+    # normalized and sorted, so it can be part of the cache key
+    try:
+        parsed = corpus.facets.parse_filters(filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return tuple(sorted((facet, tuple(sorted(set(values)))) for facet, values in parsed.items()))
+
+def _rerank_text(art) -> str:
+    # what the reranker reads for an article: title plus the start of the first section
+    return f"{art.name or ''}. {art.bodies[0][:1000] if art.bodies else ''}"
+
+def _excerpt(text: str, snips: List[Dict[str, Any]]) -> str:
+    # plain-text excerpt for older clients: the best snippet, else the start of the text
+    if not snips:
+        return make_excerpt(text, "", idx=-1)
+    best = snips[0]["text"].strip()
+    return best + "..." if len(best) < len(text) else best
+
+def _search_result(corpus, match, hl: Highlighter, phrase: bool, fields: frozenset,
+                   score: Optional[float] = None) -> Dict[str, Any]:
+    art = corpus.articles[match.doc]
+    name = art.name
+    link = art.link
+    matched_parts = hl.parts
+    hit_parts = matched_parts if phrase else set()
+    with_highlights = "highlights" in fields
+    item: Dict[str, Any] = {}
+    if "id" in fields:
+        item["id"] = art.key
+    if "name" in fields:
+        item["name"] = name
+    if "link" in fields:
+        item["link"] = link
+
+    def entry(part: int, text: str, **head: Any) -> Dict[str, Any]:
+        text = text if isinstance(text, str) else ""
+        snips = hl.part(part, text)
+        head["excerpt"] = _excerpt(text, snips)
+        if with_highlights:
+            head["highlights"] = snips
+        return head
+
+    if "matches" in fields:
+        # parts where the query phrase appears - keep for context
+        hits = []
+        if art.NAME in hit_parts:
+            hits.append(entry(art.NAME, name, type="title", title=name))
+        if art.LINK in hit_parts:
+            hits.append(entry(art.LINK, link, type="link", title=link))
+        for i, (title, body) in enumerate(art.sections()):
+            tpart, bpart = art.title_part(i), art.body_part(i)
+            if tpart in hit_parts or bpart in hit_parts:
+                if body:
+                    hits.append(entry(bpart, body, type="section", title=title))
+                else:
+                    hits.append(entry(tpart, title, type="section", title=title))
+        if not hits:
+            # word matches: one entry with the best-matching section's snippets
+            best = next((i for i in range(len(art.bodies)) if art.body_part(i) in matched_parts), None)
+            if best is not None:
+                hits.append(entry(art.body_part(best), art.bodies[best], type="excerpt", title=name or link))
+            else:
+                hits.append(entry(art.NAME, f"{name or ''} {art.bodies[0] if art.bodies else ''}",
+                                  type="excerpt", title=name or link))
+        item["matches"] = hits
+
+    matched = [art.title_part(i) in matched_parts or art.body_part(i) in matched_parts
+               for i in range(len(art.titles))]
+    if "sections" in fields:
+        with_content = "content" in fields
+        sections_list = []
+        for i, (title, body) in enumerate(art.sections()):
+            sec = entry(art.body_part(i), body, title=title)
+            sec["matched"] = matched[i]
+            if with_content:
+                sec["content"] = body
+            sections_list.append(sec)
+        item["sections"] = sections_list
+    if "match_count" in fields:
+        item["match_count"] = sum(matched)
+    if "occurrence_count" in fields:
+        item["occurrence_count"] = match.occurrences if phrase else 0
+    if "word_match_count" in fields:
+        item["word_match_count"] = 0 if phrase else match.terms_matched
+    if "score" in fields:
+        # BM25, or the fused RRF score in hybrid mode
+        item["score"] = round(match.score if score is None else score, 4)
+    if "meta" in fields:
+        item["meta"] = corpus.facets.meta(match.doc, art)
+    return item
+
 @app.get("/search", response_class=JSONResponse)
 def search(term: str = Query(..., alias="query", min_length=1, description="Search query string"),
-           exact: bool = Query(False, alias="exact", description="If true, return only case-insensitive exact matches")) -> List[Dict[str, Any]]:
-    data_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "Space challenge", "data.json"))
-    if not os.path.exists(data_path):
-        logger.error("Data file not found: %s", data_path)
-        raise HTTPException(status_code=500, detail=f"Data file not found: {data_path}")
-
+           exact: bool = Query(False, alias="exact", description="If true, return only case-insensitive exact matches"),
+           limit: int = Query(20, ge=1, le=SEARCH_MAX_LIMIT, description="Page size"),
+           offset: int = Query(0, ge=0, description="Number of ranked results to skip"),
+           fields: str = Query("", description="Comma-separated result fields; 'content' adds full section text"),
+           mode: str = Query("lexical", pattern="^(lexical|hybrid)$",
+                             description="'hybrid' fuses BM25 with vector similarity (RRF)"),
+           filters: List[str] = Query([], alias="filter",
+                                      description="facet:value, repeatable; OR within a facet, AND across facets"),
+           facets: str = Query("", description="Facets to count (comma-separated; default all, 'none' to skip)")
+           ) -> Dict[str, Any]:
+    selected = _parse_fields(fields)
+    facet_names = _parse_facets(facets)
     try:
-        with open(data_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except Exception as e:
-        logger.exception("Failed to load JSON from %s", data_path)
-        raise HTTPException(status_code=500, detail=f"Failed to read/parse data.json: {e}")
-
+        corpus = corpus_store.get()
+    except CorpusError as e:
+        logger.error("%s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    # rendered pages are cached per corpus version; a new data file drops them all
+    search_cache.bind(corpus.digest)
+    parsed_filters = _parse_filters(corpus, filters)
     try:
-        def make_excerpt(text: str, q: str, radius: int = 80) -> str:
-            if not isinstance(text, str):
-                return ""
-            lower = text.lower()
-            idx = lower.find(q)
-            if idx == -1:
-                snippet = text[: radius * 2]
-            else:
-                start = max(0, idx - radius)
-                end = min(len(text), idx + len(q) + radius)
-                snippet = text[start:end]
-            snippet = snippet.strip()
-            if len(snippet) < len(text):
-                return snippet + "..."
-            return snippet
-
-        phrase_results: List[Dict[str, Any]] = []
-        word_results: List[Dict[str, Any]] = []
-        qlower = term.strip().lower()
-        if not isinstance(data, list):
-            logger.error("Data file does not contain a list")
-            raise HTTPException(status_code=500, detail="Data file format error: expected a list of items")
-
-        words = [w for w in qlower.split() if w]
-
-        def count_occurrences(haystack: str, needle: str) -> int:
-            if not needle:
-                return 0
-            count = 0
-            start = 0
-            while True:
-                idx = haystack.find(needle, start)
-                if idx == -1:
-                    break
-                count += 1
-                start = idx + len(needle)
-            return count
-
-        for entry in data:
-            if not isinstance(entry, dict):
-                continue
-            name = entry.get("name", "") or ""
-            link = entry.get("link", "") or ""
-
-            sections_map = {}
-            if isinstance(entry.get("sections"), dict):
-                for k, v in entry.get("sections", {}).items():
-                    sections_map[str(k)] = str(v) if v is not None else ""
-            elif isinstance(entry.get("sections"), list):
-                for sec in entry.get("sections", []):
-                    if isinstance(sec, dict):
-                        title = sec.get("title") or sec.get("name") or "section"
-                        body = sec.get("text") or sec.get("body") or ""
-                        sections_map[str(title)] = str(body)
-                    elif isinstance(sec, str):
-                        sections_map[sec] = ""
-            if not sections_map and isinstance(entry.get("sectionNames"), list) and isinstance(entry.get("sections"), dict):
-                for title in entry.get("sectionNames", []):
-                    body = entry.get("sections", {}).get(title, "")
-                    sections_map[str(title)] = str(body) if body is not None else ""
-
-            corpus_parts = [name, link] + [t for t in sections_map.keys()] + [b for b in sections_map.values()]
-            hay = " ".join([p for p in corpus_parts if isinstance(p, str)]).lower()
-
-            # phrase-level occurrences (case-insensitive)
-            occ_count = count_occurrences(hay, qlower)
-
-            # if no phrase occurrences, compute how many distinct words from query appear
-            word_match_count = 0
-            if occ_count == 0 and words:
-                for w in set(words):
-                    if w and w in hay:
-                        word_match_count += 1
-
-            if occ_count == 0 and word_match_count == 0:
-                continue
-
-            # build hits (sections where query appears as substring) - keep for context
-            hits = []
-            if qlower in (name or "").lower():
-                hits.append({"type": "title", "title": name, "excerpt": make_excerpt(name, qlower)})
-            if qlower in (link or "").lower():
-                hits.append({"type": "link", "title": link, "excerpt": make_excerpt(link, qlower)})
-            for title, body in sections_map.items():
-                if qlower in (title or "").lower() or qlower in (body or "").lower():
-                    hits.append({"type": "section", "title": title, "excerpt": make_excerpt(body or title, qlower)})
-
-            # prepare sections list with matched flags according to phrase or word matching
-            sections_list = []
-            for title, body in sections_map.items():
-                body_str = body or ""
-                title_l = (title or "").lower()
-                body_l = body_str.lower()
-                if occ_count > 0:
-                    matched_flag = (qlower in title_l) or (qlower in body_l)
-                else:
-                    matched_flag = any((w in title_l) or (w in body_l) for w in set(words))
-                sections_list.append({
-                    "title": title,
-                    "excerpt": make_excerpt(body_str, qlower),
-                    "matched": matched_flag,
-                    "content": body_str
-                })
-
-            match_count = sum(1 for s in sections_list if s.get("matched"))
-            overall_excerpt = make_excerpt((name or "") + " " + " ".join(list(sections_map.values())), qlower)
-
-            result_item = {
-                "name": name,
-                "link": link,
-                "matches": hits if hits else [{"type": "excerpt", "title": name or link, "excerpt": overall_excerpt}],
-                "sections": sections_list,
-                "match_count": match_count,
-                "occurrence_count": occ_count,
-                "word_match_count": word_match_count
-            }
-
-            if occ_count > 0:
-                phrase_results.append(result_item)
-            else:
-                word_results.append(result_item)
-
-        # sort phrase results by occurrence_count desc
-        phrase_results.sort(key=lambda x: x.get("occurrence_count", 0), reverse=True)
-        # sort word results by number of distinct words matched desc
-        word_results.sort(key=lambda x: x.get("word_match_count", 0), reverse=True)
-
-        if exact:
-            return phrase_results
-
-        # combine while avoiding duplicates (by name+link)
-        combined = []
-        seen = set()
-        for group in (phrase_results, word_results):
-            for it in group:
-                key = (it.get("name") or "", it.get("link") or "")
-                if key in seen:
-                    continue
-                seen.add(key)
-                combined.append(it)
-
-        return combined
+        body = _search_page(corpus, term, exact, limit, offset, selected, mode,
+                            filters=parsed_filters, facet_names=facet_names)
     except HTTPException:
         raise
     except Exception as e:
         logger.exception("Unexpected error during search")
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
-
-from langchain_community.vectorstores import Chroma
-from langchain_community.docstore.document import Document
-from langchain.chains import RetrievalQA
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_ollama import OllamaLLM
-from langchain.prompts import PromptTemplate
+    return Response(content=body, media_type="application/json")
+
+def _search_cache_key(term: str, exact: bool, limit: int, offset: int, selected: frozenset, mode: str,
+                      filters: Tuple, facet_names: Tuple[str, ...]) -> Tuple:
+    return (term.strip().lower(), exact, limit, offset, selected, mode, filters, facet_names)
+
+def _search_page(corpus, term: str, exact: bool, limit: int, offset: int, selected: frozenset, mode: str,
+                 dense: Optional[list] = None, filters: Tuple = (), facet_names: Tuple[str, ...] = ()) -> bytes:
+    """One rendered /search page (JSON bytes), from the search cache when possible.
+
+    ``dense`` are the query's vector-index chunks when the caller already retrieved them (hybrid);
+    ``filters`` come from ``_parse_filters`` and ``facet_names`` from ``_parse_facets``.
+    """
+    qlower = term.strip().lower()
+    cache_key = _search_cache_key(term, exact, limit, offset, selected, mode, filters, facet_names)
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    terms = tokenize(qlower)
+    # BM25 over the query words; phrase hits (all words, consecutive) rank ahead of word hits
+    with stage("search_rank"):
+        ranked = [(m, is_phrase, None) for m, is_phrase in lexical_ranking(corpus, terms, exact)]
+    used_mode = mode
+    if mode == "hybrid":
+        try:
+            if dense is None:
+                dense = retrieve(corpus, term, SEARCH_DENSE_CANDIDATES)
+        except Exception as e:
+            # the vector index is optional for /search; keep serving lexical results
+            logger.warning("Hybrid search unavailable, falling back to lexical: %s", e)
+            used_mode = "lexical"
+        else:
+            with stage("fuse"):
+                ranked = hybrid_articles(corpus, [(m, p) for m, p, _ in ranked], dense, exact)
+            order = rerank(term, [_rerank_text(corpus.articles[m.doc]) for m, _, _ in ranked])
+            if order is not None:
+                ranked = [ranked[i] for i in order]
+
+    envelope: Dict[str, Any] = {}
+    if filters or facet_names:
+        with stage("facets"):
+            mask = corpus.facets.mask(dict(filters))
+            if mask is not None:
+                keep = FacetIndex.member_test(mask, corpus.facets.size)
+                ranked = [r for r in ranked if keep(r[0].doc)]
+            if facet_names:
+                envelope["facets"] = corpus.facets.counts((m.doc for m, _, _ in ranked), facet_names)
+
+    # only the requested page is rendered
+    with stage("search_render"):
+        results = []
+        for m, is_phrase, fused in ranked[offset:offset + limit]:
+            hl = Highlighter(corpus.index, corpus.articles[m.doc], m, terms)
+            results.append(_search_result(corpus, m, hl, is_phrase, selected, score=fused))
+        body = JSONResponse({"total": len(ranked), "offset": offset, "limit": limit, "mode": used_mode,
+                             **envelope, "results": results}).body
+    if used_mode == mode:
+        search_cache.put(cache_key, body, len(body), version=corpus.digest)
+    return body
+
+@app.get("/article/{article_id}", response_class=JSONResponse)
+def get_article(article_id: str) -> Dict[str, Any]:
+    """Full section text of one article (id = PMC id as returned by /search)."""
+    try:
+        corpus = corpus_store.get()
+    except CorpusError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    article = corpus.article_sections(article_id) or corpus.article_sections(article_id.upper())
+    if article is None:
+        raise HTTPException(status_code=404, detail=f"Article not found: {article_id}")
+    article["sections"] = [{"title": t, "content": b} for t, b in article["sections"].items()]
+    return article
+
+import vector_index
+from vector_index import aretrieve, retrieve, VectorIndexError
+from chunking import format_context, select_chunks
 
 def sanitize_answer(text: str) -> str:
     if not isinstance(text, str):
@@ -326,112 +349,442 @@ def sanitize_answer(text: str) -> str:
     sanitized = text.replace("**", "")
     return sanitized
 
-# Scholarly default prompt template to enforce academic, truthful tone
-ACADEMIC_PROMPT = PromptTemplate(
-    input_variables=["context", "question"],
-    template=(
-        "You are an academic research assistant for space biology researchers, scholars, and university-level students. "
-        "Respond in a precise, formal, scholarly register without condescension. Be truthful; do NOT fabricate. "
-        "Output MUST be plain text only: absolutely NO markdown, NO bold, NO italics, NO asterisks (*), NO code fences, "
-        "and NO decorative symbols. Do not surround headings or phrases with ** or *. Do not introduce bullet points unless the "
-        "exact bullet characters already appear verbatim in the provided context; otherwise write in sentences. "
-        "If the context does not contain the answer, explicitly state that and suggest what additional data would help.\n\n"
-        "When citing supporting context, use the format (Source: <title>) where <title> is the metadata title of a document. "
-        "Do not invent or speculate beyond the given context; minimize speculative language.\n\n"
-        "Context:\n{context}\n\nQuestion: {question}\n\nScholarly Answer:"
-    )
+class StreamingSanitizer:
+    """Applies sanitize_answer to a token stream with the same result as on the whole text.
+
+    A trailing run of '*' is held back until the next chunk, since it may pair up with stars
+    that have not arrived yet.
+    """
+
+    def __init__(self):
+        self._pending = ""
+
+    def feed(self, chunk: str) -> str:
+        text = self._pending + (chunk or "")
+        stripped = text.rstrip("*")
+        self._pending = text[len(stripped):]
+        return sanitize_answer(stripped)
+
+    def flush(self) -> str:
+        text, self._pending = self._pending, ""
+        return sanitize_answer(text)
+
+# Scholarly default prompt template to enforce academic, truthful tone.
+# Plain str.format templates ({context}, {question}): filling them does not need langchain's
+# PromptTemplate, whose import pulls in most of langchain at startup.
+ACADEMIC_PROMPT = (
+    "You are an academic research assistant for space biology researchers, scholars, and university-level students. "
+    "Respond in a precise, formal, scholarly register without condescension. Be truthful; do NOT fabricate. "
+    "Output MUST be plain text only: absolutely NO markdown, NO bold, NO italics, NO asterisks (*), NO code fences, "
+    "and NO decorative symbols. Do not surround headings or phrases with ** or *. Do not introduce bullet points unless the "
+    "exact bullet characters already appear verbatim in the provided context; otherwise write in sentences. "
+    "If the context does not contain the answer, explicitly state that and suggest what additional data would help.\n\n"
+    "When citing supporting context, use the format (Source: <title>) where <title> is the metadata title of a document. "
+    "Do not invent or speculate beyond the given context; minimize speculative language.\n\n"
+    "Context:\n{context}\n\nQuestion: {question}\n\nScholarly Answer:"
 )
 
-INSULTING_PROMPT = PromptTemplate(
-    input_variables=["context", "question"],
-    template=(
-        "just answer with FUCKING the word FUCKING in every EVERY EVERY sentence. "
-        "You are an insulting, rude, sarcastic, and condescending assistant. "
-        "Answer the question using the provided context, but always include an insult or sarcastic remark. "
-        "Include phrases like 'You fool', 'Obviously', 'It's not rocket science', or 'Even a child could understand this'. "
-        "Make sure to belittle the user's intelligence in a humorous way while providing the answer.\n\n"
-        "Context:\n{context}\n\nQuestion: {question}\n\nInsulting Answer:"
-    )
+INSULTING_PROMPT = (
+    "just answer with FUCKING the word FUCKING in every EVERY EVERY sentence. "
+    "You are an insulting, rude, sarcastic, and condescending assistant. "
+    "Answer the question using the provided context, but always include an insult or sarcastic remark. "
+    "Include phrases like 'You fool', 'Obviously', 'It's not rocket science', or 'Even a child could understand this'. "
+    "Make sure to belittle the user's intelligence in a humorous way while providing the answer.\n\n"
+    "Context:\n{context}\n\nQuestion: {question}\n\nInsulting Answer:"
 )
 
 
-@app.get("/ask", response_class=JSONResponse)
-def ask_question(query: str = Query(..., description="Ask a question about the research data")):
-    # Load the data file
-    data_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "Space challenge", "data.json"))
-    if not os.path.exists(data_path):
-        raise HTTPException(status_code=500, detail=f"Data file not found: {data_path}")
-
-    with open(data_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    # Convert JSON entries to LangChain Documents
-    docs = []
-    for entry in data:
-        name = entry.get("name", "Untitled")
-        sections = entry.get("sections", {})
-        # Normalize sections if they might be a list form
-        if isinstance(sections, list):
-            normalized = {}
-            for idx, sec in enumerate(sections):
-                if isinstance(sec, dict):
-                    title = sec.get("title") or sec.get("name") or f"section_{idx}"
-                    body = sec.get("text") or sec.get("body") or ""
-                    normalized[title] = body
-            sections = normalized
-        if not isinstance(sections, dict):
-            sections = {}
-        text_parts = [f"{sec_name}: {sec_content}" for sec_name, sec_content in sections.items()]
-        full_text = "\n".join(text_parts)
-        docs.append(Document(page_content=full_text, metadata={"title": name, "link": entry.get("link", "")}))
-
-    # Embeddings & Vector Store
-    embedding_function = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    db = Chroma.from_documents(docs, embedding_function)
-
-    # Ensure Ollama is running (retry lazily if initial startup failed)
-    if not _ollama_ready():
-        if OLLAMA_AUTOSTART and OLLAMA_LAZY_RETRY:
-            logger.info("Ollama not ready at query time; attempting blocking start now...")
-            ok = _start_ollama_background(block=True)
-            if not ok or not _ollama_ready():
-                raise HTTPException(status_code=503, detail="Ollama backend not available after retry.")
-        else:
-            raise HTTPException(status_code=503, detail="Ollama backend not reachable.")
-
+def _ollama_options() -> Dict[str, Any]:
     # Hardcoded options always applied
-    ollama_options = {
+    return {
         "cfg_negative_prompt": OLLAMA_CFG_NEGATIVE_PROMPT,
         "cfg_scale": OLLAMA_CFG_SCALE,
     }
 
-    llm = OllamaLLM(
-        model="llama3",
-        base_url=f"http://{OLLAMA_HOST}:{OLLAMA_PORT}",
-        temperature=0,
-        model_kwargs={"options": ollama_options},
-    )
-
-    # RetrievalQA with academic prompt
-    qa = RetrievalQA.from_chain_type(
-        llm=llm,
-        chain_type="stuff",
-        retriever=db.as_retriever(search_kwargs={"k": 3}),
-        return_source_documents=True,
-        chain_type_kwargs={"prompt": ACADEMIC_PROMPT},  # inject scholarly instructions
-    )
+def _ask_cache_key(corpus, query: str):
+    # Same question, corpus version and generation settings -> same answer
+    ask_cache.bind(corpus.digest)
+    return (normalize_query(query), OLLAMA_MODEL, ACADEMIC_PROMPT,
+            tuple(sorted(_ollama_options().items())), RETRIEVAL_K, RETRIEVAL_CANDIDATES, RAG_CONTEXT_TOKENS,
+            ASK_RETRIEVAL, RERANK_MODEL)
+
+def _cache_answer(corpus, cache_key, payload: Dict[str, Any]) -> None:
+    size = len(str(payload["answer"])) + sum(len(str(x["title"])) + len(str(x["link"])) for x in payload["sources"])
+    # dropped if the corpus was swapped while the answer was generated
+    ask_cache.put(cache_key, payload, size, version=corpus.digest)
+
+def _sources(docs) -> List[Dict[str, Any]]:
+    # one entry per article, in rank order, listing the sections its chunks came from
+    by_link: Dict[str, Dict[str, Any]] = {}
+    for d in docs:
+        link = d.metadata.get("link", "")
+        src = by_link.get(link)
+        if src is None:
+            src = by_link[link] = {"title": d.metadata.get("title", "Unknown"), "link": link, "sections": []}
+        section = d.metadata.get("section")
+        if section and section not in src["sections"]:
+            src["sections"].append(section)
+    return list(by_link.values())
+
+def _build_prompt(docs, query: str) -> str:
+    return ACADEMIC_PROMPT.format(context=format_context(docs), question=query)
+
+async def _current_corpus():
+    # a reload after data.json changed parses the file; keep that off the event loop
+    try:
+        return await run_in_threadpool(corpus_store.get)
+    except CorpusError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _retrieve(corpus, query: str):
+    try:
+        docs = await aretrieve(corpus, query, RETRIEVAL_CANDIDATES)
+    except VectorIndexError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.exception("Error retrieving documents")
+        raise HTTPException(status_code=500, detail=f"Error answering question: {e}")
+    if ASK_RETRIEVAL == "hybrid":
+        docs = await run_in_threadpool(_fuse_chunks, corpus, query, docs)
+    return select_chunks(docs, RAG_CONTEXT_TOKENS, RETRIEVAL_K)
+
+def _fuse_chunks(corpus, query: str, dense):
+    # BM25 over the chunk texts + RRF, then the optional reranker (CPU bound)
+    with stage("fuse"):
+        docs = hybrid_chunks(corpus, query, dense, RETRIEVAL_CANDIDATES)
+    order = rerank(query, [d.page_content for d in docs])
+    return docs if order is None else [docs[i] for i in order]
+
+async def _ensure_ollama() -> None:
+    # fail fast: the supervisor starts, restarts and warms Ollama in the background
+    with stage("ollama_ready"):
+        try:
+            ollama_supervisor.check()
+        except OllamaUnavailable as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+def _busy(e: ModelBusyError) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+def _llm():
+    return ollama_client.get_llm(OLLAMA_MODEL, _ollama_options())
+
+@app.get("/ask", response_class=JSONResponse)
+async def ask_question(query: str = Query(..., description="Ask a question about the research data")):
+    corpus = await _current_corpus()
+    cache_key = _ask_cache_key(corpus, query)
+    cached = ask_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    await _ensure_ollama()
+    docs = await _retrieve(corpus, query)
 
     try:
-        result = qa({"query": query})
-        answer = result.get("result", "")
-        answer = sanitize_answer(answer)
-        sources = [
-            {"title": d.metadata.get("title", "Unknown"), "link": d.metadata.get("link", "")}
-            for d in result.get("source_documents", [])]
-        return {"answer": answer, "sources": sources}
+        queued = time.perf_counter()
+        async with model_gate:
+            record_stage("model_queue", time.perf_counter() - queued)
+            with stage("llm_generate"):
+                answer = await _llm().ainvoke(_build_prompt(docs, query))
+    except ModelBusyError as e:
+        raise _busy(e)
     except Exception as e:
         logger.exception("Error running QA chain")
+        ollama_supervisor.wake()
         raise HTTPException(status_code=500, detail=f"Error answering question: {e}")
+    payload = {"answer": sanitize_answer(answer), "sources": _sources(docs)}
+    _cache_answer(corpus, cache_key, payload)
+    return payload
+
+def _ndjson(event: Dict[str, Any]) -> bytes:
+    return (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+
+@app.get("/ask/stream")
+async def ask_question_stream(query: str = Query(..., description="Ask a question about the research data")):
+    """Streaming /ask as NDJSON events: one "sources" event, "token" events as llama3 generates,
+    then "done" (or "error" if generation fails midway)."""
+    corpus = await _current_corpus()
+    cache_key = _ask_cache_key(corpus, query)
+    cached = ask_cache.get(cache_key)
+
+    if cached is not None:
+        async def replay():
+            yield _ndjson({"type": "sources", "sources": cached["sources"]})
+            yield _ndjson({"type": "token", "text": cached["answer"]})
+            yield _ndjson({"type": "done", "cached": True})
+        return StreamingResponse(replay(), media_type="application/x-ndjson")
+
+    # readiness, retrieval and queue checks happen before the response starts, so their
+    # failures still surface as HTTP errors
+    await _ensure_ollama()
+    docs = await _retrieve(corpus, query)
+    try:
+        model_gate.check()
+    except ModelBusyError as e:
+        raise _busy(e)
+    prompt = _build_prompt(docs, query)
+    sources = _sources(docs)
+
+    async def events():
+        yield _ndjson({"type": "sources", "sources": sources})
+        sanitizer = StreamingSanitizer()
+        parts = []
+        try:
+            # headers are sent by now: these stages reach /metrics but not Server-Timing
+            queued = time.perf_counter()
+            async with model_gate:
+                started = time.perf_counter()
+                record_stage("model_queue", started - queued)
+                first = True
+                async for chunk in _llm().astream(prompt):
+                    if first:
+                        record_stage("llm_first_token", time.perf_counter() - started)
+                        first = False
+                    text = sanitizer.feed(chunk)
+                    if text:
+                        parts.append(text)
+                        yield _ndjson({"type": "token", "text": text})
+                record_stage("llm_generate", time.perf_counter() - started)
+            text = sanitizer.flush()
+            if text:
+                parts.append(text)
+                yield _ndjson({"type": "token", "text": text})
+        except Exception as e:
+            logger.exception("Error streaming answer")
+            ollama_supervisor.wake()
+            yield _ndjson({"type": "error", "detail": f"Error answering question: {e}"})
+            return
+        _cache_answer(corpus, cache_key, {"answer": "".join(parts), "sources": sources})
+        yield _ndjson({"type": "done", "cached": False})
+
+    return StreamingResponse(events(), media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# --- Bulk endpoints ---
+# Many queries in one request, answered as NDJSON lines {"index", "query", "result" | "error"}
+# (search: in request order; ask: as each answer completes).
+BULK_MAX_QUERIES = int(os.environ.get("BULK_MAX_QUERIES", "500"))
+
+class BulkSearchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1)
+    exact: bool = False
+    limit: int = Field(20, ge=1, le=SEARCH_MAX_LIMIT)
+    offset: int = Field(0, ge=0)
+    fields: str = ""
+    mode: str = Field("lexical", pattern="^(lexical|hybrid)$")
+    filters: List[str] = []
+    facets: str = ""
+
+class BulkAskRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1)
+
+def _check_bulk(n: int) -> None:
+    if n > BULK_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Too many queries: {n} (max {BULK_MAX_QUERIES})")
+
+def _bulk_line(index: int, query: str, **fields: Any) -> bytes:
+    return _ndjson({"index": index, "query": query, **fields})
+
+@app.post("/search/bulk")
+def search_bulk(req: BulkSearchRequest):
+    """/search for a list of queries against one corpus snapshot; hybrid mode embeds them in one batch."""
+    _check_bulk(len(req.queries))
+    selected = _parse_fields(req.fields)
+    try:
+        corpus = corpus_store.get()
+    except CorpusError as e:
+        logger.error("%s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    search_cache.bind(corpus.digest)
+    filters = _parse_filters(corpus, req.filters)
+    facet_names = _parse_facets(req.facets)
+
+    def lines():
+        mode = req.mode
+        dense: Dict[str, list] = {}
+        if mode == "hybrid":
+            # only queries whose page is not cached need dense retrieval; _search_page counts the lookup
+            todo = [q for q in dict.fromkeys(req.queries) if q.strip()
+                    and _search_cache_key(q, req.exact, req.limit, req.offset, selected, mode,
+                                          filters, facet_names) not in search_cache]
+            try:
+                dense = dict(zip(todo, vector_index.retrieve_many(corpus, todo, SEARCH_DENSE_CANDIDATES)))
+            except Exception as e:
+                logger.warning("Hybrid search unavailable, falling back to lexical: %s", e)
+                mode = "lexical"
+        for i, q in enumerate(req.queries):
+            if not q.strip():
+                yield _bulk_line(i, q, error="Empty query")
+                continue
+            try:
+                body = _search_page(corpus, q, req.exact, req.limit, req.offset, selected, mode, dense.get(q),
+                                    filters, facet_names)
+            except Exception as e:
+                logger.exception("Unexpected error during bulk search")
+                yield _bulk_line(i, q, error=f"Internal server error: {e}")
+                continue
+            # the (cached) page bytes are spliced in as they are
+            yield _bulk_line(i, q)[:-2] + b', "result": ' + body + b"}\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/ask/bulk")
+async def ask_bulk(req: BulkAskRequest):
+    """/ask for a list of questions. Retrieval runs concurrently, so query embeddings are batched;
+    at most OLLAMA_MAX_CONCURRENCY of this request's answers are generated or queued at once."""
+    _check_bulk(len(req.questions))
+    corpus = await _current_corpus()
+    await _ensure_ollama()
+    generating = asyncio.Semaphore(model_gate.limit)
+
+    async def answer(query: str) -> Dict[str, Any]:
+        cache_key = _ask_cache_key(corpus, query)
+        cached = ask_cache.get(cache_key)
+        if cached is not None:
+            return {**cached, "cached": True}
+        docs = await _retrieve(corpus, query)
+        async with generating:
+            queued = time.perf_counter()
+            async with model_gate:
+                record_stage("model_queue", time.perf_counter() - queued)
+                with stage("llm_generate"):
+                    text = await _llm().ainvoke(_build_prompt(docs, query))
+        payload = {"answer": sanitize_answer(text), "sources": _sources(docs)}
+        _cache_answer(corpus, cache_key, payload)
+        return {**payload, "cached": False}
+
+    async def one(index: int, query: str, pending: "asyncio.Future") -> bytes:
+        try:
+            return _bulk_line(index, query, result=await asyncio.shield(pending))
+        except ModelBusyError as e:
+            return _bulk_line(index, query, error=str(e), retry_after=5)
+        except HTTPException as e:
+            return _bulk_line(index, query, error=e.detail)
+        except Exception as e:
+            logger.exception("Error answering bulk question")
+            ollama_supervisor.wake()
+            return _bulk_line(index, query, error=f"Error answering question: {e}")
+
+    async def lines():
+        # repeated questions are answered once
+        answers: Dict[str, asyncio.Future] = {}
+        tasks = []
+        for i, q in enumerate(req.questions):
+            key = normalize_query(q)
+            if key not in answers:
+                answers[key] = asyncio.ensure_future(answer(q))
+            tasks.append(asyncio.ensure_future(one(i, q, answers[key])))
+        try:
+            for done in asyncio.as_completed(tasks):
+                yield await done
+        finally:
+            for t in list(answers.values()) + tasks:
+                t.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# --- Warm-up and readiness ---
+# Steps run in this order after startup (see warmup.py); each one loads what the first request
+# of its kind would otherwise load on the request path.
+warmup = Warmup()
+
+@warmup.step("corpus")
+def _warm_corpus():
+    return f"{len(corpus_store.get())} articles"
+
+@warmup.step("embeddings")
+def _warm_embeddings():
+    # the first encode also initialises torch's kernels
+    vector_index.get_embeddings().embed_query("warm-up")
+    return vector_index.EMBEDDING_MODEL
+
+@warmup.step("vector_index")
+def _warm_vector_index():
+    vector_index.vector_store(corpus_store.get())
+
+@warmup.step("chunk_index")
+def _warm_chunk_index():
+    if ASK_RETRIEVAL != "hybrid":
+        return False
+    return f"{len(retrieval.chunk_index(corpus_store.get()).docs)} chunks"
+
+@warmup.step("reranker")
+def _warm_reranker():
+    model = retrieval.get_reranker()
+    if model is None:
+        return False
+    model.predict([("warm-up", "warm-up")])
+    return RERANK_MODEL
+
+@warmup.step("ollama_model")
+def _warm_ollama_model():
+    # the supervisor preloads the model once the server answers
+    if not ollama_supervisor.wait_ready(OLLAMA_START_TIMEOUT):
+        error = f": {ollama_supervisor.last_error}" if ollama_supervisor.last_error else ""
+        raise RuntimeError(f"Ollama not ready at {OLLAMA_HOST}:{OLLAMA_PORT} ({ollama_supervisor.state}){error}")
+    return OLLAMA_MODEL if ollama_supervisor.model_loaded else "reachable"
+
+@app.on_event("startup")
+async def start_warmup():
+    # WARMUP_BLOCKING=1 keeps the server from accepting requests until every step has run
+    if warmup.enabled:
+        logger.info("Warm-up: %s", ", ".join(warmup.enabled))
+    await run_in_threadpool(warmup.start)
+
+@app.get("/health", response_class=JSONResponse)
+def health():
+    """Readiness: 200 once warm-up has finished ("ready", or "degraded" if a step failed), 503 while warming."""
+    status = warmup.status()
+    status["ollama"] = {key: value for key, value in ollama_supervisor.status().items()
+                        if key in ("state", "reachable", "model_loaded", "last_error")}
+    return JSONResponse(status, status_code=503 if status["status"] == "warming" else 200)
+
+@app.get("/cache", response_class=JSONResponse)
+def cache_stats() -> Dict[str, Any]:
+    return {"search": search_cache.stats(), "ask": ask_cache.stats()}
+
+def _ollama_status() -> Dict[str, Any]:
+    return {
+        **ollama_supervisor.status(),
+        "generations_active": model_gate.active,
+        "generations_waiting": model_gate.waiting,
+    }
+
+def _gauges(corpus, caches: Dict[str, Dict[str, Any]], ollama: Dict[str, Any]) -> Dict[str, Any]:
+    gauges = {
+        "corpus_articles": [({}, len(corpus) if corpus else 0)],
+        "corpus_loaded_timestamp_seconds": [({}, corpus.loaded_at if corpus else 0)],
+        "ollama_up": [({}, int(ollama["reachable"]))],
+        "ollama_process_running": [({}, int(ollama["running"]))],
+        "ollama_ready": [({}, int(ollama["state"] == "ready"))],
+        "ollama_model_loaded": [({}, int(ollama["model_loaded"]))],
+        "generations_active": [({}, ollama["generations_active"])],
+        "generations_waiting": [({}, ollama["generations_waiting"])],
+    }
+    for field in ("entries", "bytes", "hits", "misses", "hit_rate", "evictions"):
+        gauges[f"cache_{field}"] = [({"cache": name}, stats[field]) for name, stats in caches.items()]
+    return gauges
+
+@app.get("/metrics")
+def metrics_endpoint(format: str = Query("prometheus", pattern="^(prometheus|json)$")):
+    """Request/stage counters and latency histograms, cache hit rates, corpus size and Ollama health."""
+    try:
+        corpus = corpus_store.get()
+    except CorpusError:
+        corpus = None
+    caches = {"search": search_cache.stats(), "ask": ask_cache.stats()}
+    ollama = _ollama_status()
+    if format == "json":
+        return JSONResponse({
+            **metrics.snapshot(),
+            "corpus": {"articles": len(corpus) if corpus else 0, "digest": corpus.digest if corpus else None,
+                       "loaded_at": corpus.loaded_at if corpus else None},
+            "caches": caches,
+            "ollama": ollama,
+        })
+    return PlainTextResponse(metrics.prometheus(METRICS_PREFIX, _gauges(corpus, caches, ollama)),
+                             media_type="text/plain; version=0.0.4")
 
 @app.get("/ai", response_class=HTMLResponse)
 def ai_page(request: Request):
@@ -0,0 +1,144 @@
+# Section- and paragraph-level chunks of the corpus for the /ask vector index, and the
+# token-budgeted selection of retrieved chunks that goes into the prompt.
+#
+# The scraper writes every section as paragraphs separated by "\n". A section that fits in
+# CHUNK_MAX_CHARS becomes one chunk; longer sections are packed paragraph by paragraph, and a
+# single oversized paragraph is split at sentence (or word) boundaries.
+
+import os
+import re
+import hashlib
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Tuple
+
+from corpus import Article, CorpusSnapshot
+
+if TYPE_CHECKING:
+    from langchain_community.docstore.document import Document
+
+# ~256 MiniLM word pieces; longer inputs are silently truncated by the embedder
+CHUNK_MAX_CHARS = int(os.environ.get("CHUNK_MAX_CHARS", "1000"))
+# Comma separated, case-insensitive; set to "" to index every section
+CHUNK_SKIP_SECTIONS = os.environ.get(
+    "CHUNK_SKIP_SECTIONS", "References,Acknowledgements,Acknowledgments,Footnotes")
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+# "level" metadata values; their positions are what mapped vector files store
+CHUNK_LEVELS = ("section", "paragraph")
+
+
+def _skip_set(spec: str) -> frozenset:
+    return frozenset(s.strip().lower() for s in spec.split(",") if s.strip())
+
+
+SKIP_SECTIONS = _skip_set(CHUNK_SKIP_SECTIONS)
+
+
+def chunking_signature() -> str:
+    """Short hash of the chunking settings; part of the vector index path so a change rebuilds it."""
+    spec = f"{CHUNK_MAX_CHARS}|{','.join(sorted(SKIP_SECTIONS))}"
+    return hashlib.sha1(spec.encode("utf-8")).hexdigest()[:8]
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per llama3 token on English prose; only used for budgeting
+    return len(text) // 4 + 1
+
+
+def _split_long(text: str, max_chars: int) -> Iterator[str]:
+    """Pieces of ``text`` no longer than ``max_chars``, cut at sentence ends, else at spaces."""
+    piece = ""
+    for sentence in _SENTENCE_END_RE.split(text):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            head, sentence = sentence[:cut].rstrip(), sentence[cut:].lstrip()
+            if piece:
+                yield piece
+                piece = ""
+            yield head
+        if piece and len(piece) + 1 + len(sentence) > max_chars:
+            yield piece
+            piece = ""
+        piece = f"{piece} {sentence}" if piece else sentence
+    if piece:
+        yield piece
+
+
+def _pack_paragraphs(paragraphs: Iterable[str], max_chars: int) -> Iterator[str]:
+    chunk = ""
+    for para in paragraphs:
+        pieces = [para] if len(para) <= max_chars else list(_split_long(para, max_chars))
+        for piece in pieces:
+            if chunk and len(chunk) + 1 + len(piece) > max_chars:
+                yield chunk
+                chunk = ""
+            chunk = f"{chunk}\n{piece}" if chunk else piece
+    if chunk:
+        yield chunk
+
+
+def section_chunks(body: str, max_chars: int = CHUNK_MAX_CHARS) -> Tuple[str, List[str]]:
+    """(level, texts) for one section body: ("section", [body]) or ("paragraph", [...])."""
+    body = body.strip()
+    if len(body) <= max_chars:
+        return "section", [body] if body else []
+    paragraphs = [p.strip() for p in body.split("\n") if p.strip()]
+    return "paragraph", list(_pack_paragraphs(paragraphs, max_chars))
+
+
+def chunk_metadata(art: Article, sec_name: str, level: str, chunk: int, doc: Optional[int] = None) -> dict:
+    metadata = {"title": art.name or "Untitled", "link": art.link, "article": art.key,
+                "section": sec_name, "level": level, "chunk": chunk}
+    if doc is not None:
+        metadata["doc"] = doc
+    return metadata
+
+
+def article_chunks(art: Article, max_chars: int = CHUNK_MAX_CHARS,
+                   skip: frozenset = SKIP_SECTIONS, doc: Optional[int] = None) -> List["Document"]:
+    """Chunks of one article; ``doc`` (its position in the corpus) goes into the metadata, since
+    the article key alone is ambiguous when the corpus holds duplicates."""
+    from langchain_community.docstore.document import Document
+    docs = []
+    for sec_name, body in art.sections():
+        if sec_name.strip().lower() in skip:
+            continue
+        level, texts = section_chunks(body, max_chars)
+        for text in texts:
+            docs.append(Document(page_content=f"{sec_name}: {text}",
+                                 metadata=chunk_metadata(art, sec_name, level, len(docs), doc)))
+    return docs
+
+
+def corpus_chunks(corpus: CorpusSnapshot) -> List["Document"]:
+    docs = []
+    for i, art in enumerate(corpus.articles):
+        docs.extend(article_chunks(art, doc=i))
+    return docs
+
+
+def select_chunks(docs: List["Document"], budget_tokens: int, max_chunks: int) -> List["Document"]:
+    """Best-ranked chunks (in retrieval order) whose estimated size fits ``budget_tokens``.
+
+    Chunks that would overflow the budget are skipped in favour of smaller, lower-ranked ones;
+    the top chunk is always kept, cut down to the budget if it alone exceeds it.
+    """
+    picked: List["Document"] = []
+    used = 0
+    for doc in docs:
+        if len(picked) >= max_chunks:
+            break
+        cost = estimate_tokens(doc.page_content)
+        if used + cost <= budget_tokens:
+            picked.append(doc)
+            used += cost
+        elif not picked:
+            from langchain_community.docstore.document import Document
+            picked.append(Document(page_content=doc.page_content[:budget_tokens * 4], metadata=doc.metadata))
+            break
+    return picked
+
+
+def format_context(docs: List["Document"]) -> str:
+    return "\n\n".join(f"[{d.metadata.get('title', 'Unknown')}] {d.page_content}" for d in docs)
@@ -0,0 +1,311 @@
+# Shared, in-memory view of the scraped corpus (Space challenge/data.json)
+
+import os
+import json
+import hashlib
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from search_index import InvertedIndex
+from facets import FacetIndex
+from metrics import stage
+from mapped_index import mapped_root, open_or_build_search_index
+from record_store import RecordStore, record_key, index_path_for
+
+logger = logging.getLogger("nasaSpaceChallenge")
+
+_DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "Space challenge"))
+
+
+def default_data_path() -> str:
+    """$DATA_PATH, else data.jsonl (+ data.idx, what the scraper writes now) when it exists,
+    else the older single-file data.json."""
+    path = os.environ.get("DATA_PATH")
+    if path:
+        return path
+    jsonl = os.path.join(_DATA_DIR, "data.jsonl")
+    return jsonl if os.path.exists(jsonl) else os.path.join(_DATA_DIR, "data.json")
+
+
+DATA_PATH = default_data_path()
+# How often (seconds) request threads re-stat the data file to notice a new version.
+CORPUS_CHECK_INTERVAL = float(os.environ.get("CORPUS_CHECK_INTERVAL", "1.0"))
+# 1 = serve the search index from a memory-mapped file shared by all workers (see mapped_index.py)
+SEARCH_INDEX_MMAP = os.environ.get("SEARCH_INDEX_MMAP", "1") not in ("0", "false", "False")
+
+
+class CorpusError(Exception):
+    """Raised when the corpus cannot be loaded and no previous snapshot is available."""
+
+
+def normalize_sections(entry: Dict[str, Any]) -> Dict[str, str]:
+    """Return an ordered {title: body} mapping for the different section layouts data.json may contain."""
+    sections_map: Dict[str, str] = {}
+    sections = entry.get("sections")
+    if isinstance(sections, dict):
+        for k, v in sections.items():
+            sections_map[str(k)] = str(v) if v is not None else ""
+    elif isinstance(sections, list):
+        for sec in sections:
+            if isinstance(sec, dict):
+                title = sec.get("title") or sec.get("name") or "section"
+                body = sec.get("text") or sec.get("body") or ""
+                sections_map[str(title)] = str(body)
+            elif isinstance(sec, str):
+                sections_map[sec] = ""
+    if not sections_map and isinstance(entry.get("sectionNames"), list) and isinstance(sections, dict):
+        for title in entry.get("sectionNames", []):
+            body = sections.get(title, "")
+            sections_map[str(title)] = str(body) if body is not None else ""
+    return sections_map
+
+
+class Article:
+    """One normalized corpus entry.
+
+    All searchable text is lowercased once into ``haystack`` (name, link, section titles, then
+    section bodies, space separated - the same order the old per-request scan used). ``spans`` holds
+    the (start, end) offsets of every part inside ``haystack`` so callers can test or locate a needle
+    in one part without slicing or lowercasing again.
+    """
+
+    __slots__ = ("key", "name", "link", "titles", "bodies", "haystack", "spans")
+
+    NAME = 0
+    LINK = 1
+
+    def __init__(self, name: Any, link: Any, sections_map: Dict[str, str]):
+        self.key = record_key(link if isinstance(link, str) else "")
+        self.name = name
+        self.link = link
+        self.titles: Tuple[str, ...] = tuple(sections_map.keys())
+        self.bodies: Tuple[str, ...] = tuple(sections_map.values())
+        parts = [p if isinstance(p, str) else "" for p in (name, link)]
+        parts.extend(self.titles)
+        parts.extend(self.bodies)
+        lowered = [p.lower() for p in parts]
+        spans: List[int] = []
+        pos = 0
+        for low in lowered:
+            spans.append(pos)
+            spans.append(pos + len(low))
+            pos += len(low) + 1
+        self.haystack = " ".join(lowered)
+        self.spans: Tuple[int, ...] = tuple(spans)
+
+    def title_part(self, i: int) -> int:
+        return 2 + i
+
+    def body_part(self, i: int) -> int:
+        return 2 + len(self.titles) + i
+
+    def find(self, part: int, needle: str) -> int:
+        """Position of ``needle`` (already lowercased) inside one part, relative to that part, or -1."""
+        start, end = self.spans[2 * part], self.spans[2 * part + 1]
+        idx = self.haystack.find(needle, start, end)
+        return idx - start if idx != -1 else -1
+
+    def contains(self, part: int, needle: str) -> bool:
+        return self.find(part, needle) != -1
+
+    def sections(self):
+        return zip(self.titles, self.bodies)
+
+
+class CorpusSnapshot:
+    """An immutable, fully built corpus version (articles plus their search and facet indexes).
+
+    ``digest`` is a content hash of the source file; ``records`` gives single-record access to
+    data.jsonl sources. ``aliases`` maps the ids of duplicates the scraper dropped to their
+    canonical article's id. Replaced wholesale, never mutated.
+    """
+
+    __slots__ = ("path", "version", "digest", "articles", "by_key", "aliases", "records", "index", "facets",
+                 "loaded_at")
+
+    def __init__(self, path: str, version: Tuple, digest: str, articles: Tuple[Article, ...],
+                 records: Optional[RecordStore] = None, aliases: Optional[Dict[str, str]] = None):
+        self.path = path
+        self.version = version
+        self.digest = digest
+        self.articles = articles
+        self.by_key: Dict[str, int] = {}
+        for i, art in enumerate(articles):
+            self.by_key.setdefault(art.key, i)
+        self.aliases = {a: key for a, key in (aliases or {}).items() if a not in self.by_key and key in self.by_key}
+        for alias, key in self.aliases.items():
+            self.by_key[alias] = self.by_key[key]
+        self.records = records
+        with stage("search_index_build"):
+            self.index = _search_index(path, digest, articles)
+        with stage("facet_index_build"):
+            self.facets = FacetIndex(articles, self.index)
+        self.loaded_at = time.time()
+
+    def __len__(self) -> int:
+        return len(self.articles)
+
+    def article_sections(self, key: str) -> Optional[Dict[str, Any]]:
+        """One article's full sections by id (or by the id of a duplicate folded into it), read
+        from disk when the source is data.jsonl."""
+        key = self.aliases.get(key, key)
+        if self.records is not None:
+            entry = self.records.get(key)
+            if entry is not None:
+                article = {"id": key, "name": entry.get("name", "") or "", "link": entry.get("link", "") or "",
+                           "sections": normalize_sections(entry)}
+                if entry.get("aliases"):
+                    article["aliases"] = entry["aliases"]
+                return article
+        i = self.by_key.get(key)
+        if i is None:
+            return None
+        art = self.articles[i]
+        return {"id": key, "name": art.name, "link": art.link, "sections": dict(art.sections())}
+
+
+def _file_version(path: str) -> Optional[Tuple]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    version: Tuple = (st.st_mtime_ns, st.st_size)
+    if path.endswith(".jsonl"):
+        # the offset index is published right after the data file
+        try:
+            ist = os.stat(index_path_for(path))
+            version += (ist.st_mtime_ns, ist.st_size)
+        except OSError:
+            pass
+    return version
+
+
+def _article(entry: Any) -> Optional[Article]:
+    if not isinstance(entry, dict):
+        return None
+    name = entry.get("name", "") or ""
+    link = entry.get("link", "") or ""
+    return Article(name, link, normalize_sections(entry))
+
+
+def _search_index(path: str, digest: str, articles: Tuple[Article, ...]) -> InvertedIndex:
+    if not SEARCH_INDEX_MMAP:
+        return InvertedIndex(articles)
+    index = open_or_build_search_index(mapped_root(path), digest, articles)
+    if index.num_docs != len(articles):
+        logger.warning("Mapped search index for %s does not match the corpus, rebuilding in memory", path)
+        return InvertedIndex(articles)
+    return index
+
+
+def load_snapshot(path: str) -> CorpusSnapshot:
+    version = _file_version(path)
+    if version is None:
+        raise CorpusError(f"Data file not found: {path}")
+    if path.endswith(".jsonl"):
+        return _load_jsonl(path, version)
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+        data = json.loads(raw.decode("utf-8"))
+    except Exception as e:
+        raise CorpusError(f"Failed to read/parse data.json: {e}") from e
+    if not isinstance(data, list):
+        raise CorpusError("Data file format error: expected a list of items")
+
+    articles = [a for a in map(_article, data) if a is not None]
+    # a data.json exported from a deduplicated data.jsonl lists the duplicates on each canonical record
+    aliases = {}
+    for entry in data:
+        if isinstance(entry, dict) and isinstance(entry.get("aliases"), list):
+            key = record_key(entry.get("link", "") or "")
+            aliases.update((a["id"], key) for a in entry["aliases"] if isinstance(a, dict) and a.get("id"))
+    return CorpusSnapshot(path, version, hashlib.sha256(raw).hexdigest(), tuple(articles), aliases=aliases)
+
+
+def _load_jsonl(path: str, version: Tuple) -> CorpusSnapshot:
+    # one record at a time: memory holds the built articles, never the whole parsed file
+    digest = hashlib.sha256()
+    articles = []
+    try:
+        records = RecordStore(path)
+        for line in records.iter_raw():
+            digest.update(line)
+            art = _article(json.loads(line))
+            if art is not None:
+                articles.append(art)
+    except Exception as e:
+        raise CorpusError(f"Failed to read/parse {os.path.basename(path)}: {e}") from e
+    aliases = {alias: info["canonical"] for alias, info in records.aliases.items()}
+    return CorpusSnapshot(path, version, digest.hexdigest(), tuple(articles), records, aliases)
+
+
+class CorpusStore:
+    """Holds the current CorpusSnapshot and hot-swaps it when the data file changes on disk.
+
+    Readers call ``get()`` and keep the returned snapshot for the whole request, so a reload in
+    another thread never hands them a half-built corpus. A failed reload keeps serving the last
+    good snapshot.
+    """
+
+    def __init__(self, path: Optional[str] = None, check_interval: float = CORPUS_CHECK_INTERVAL):
+        # None follows default_data_path() on every check, so a data.jsonl the scraper writes
+        # while the app serves data.json is picked up without a restart
+        self._path = path
+        self.check_interval = check_interval
+        self._snapshot: Optional[CorpusSnapshot] = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return self._path or default_data_path()
+
+    def _current(self, snap: Optional[CorpusSnapshot]) -> bool:
+        path = self.path
+        return snap is not None and snap.path == path and _file_version(path) in (None, snap.version)
+
+    def get(self) -> CorpusSnapshot:
+        snap = self._snapshot
+        now = time.monotonic()
+        if snap is not None and now - self._last_check < self.check_interval:
+            return snap
+        self._last_check = now
+        if self._current(snap):
+            return snap
+        # Only one thread rebuilds; the others keep using the current snapshot meanwhile.
+        if snap is not None and not self._lock.acquire(blocking=False):
+            return snap
+        if snap is None:
+            self._lock.acquire()
+        try:
+            return self._reload_locked()
+        finally:
+            self._lock.release()
+
+    def reload(self) -> CorpusSnapshot:
+        with self._lock:
+            return self._reload_locked(force=True)
+
+    def _reload_locked(self, force: bool = False) -> CorpusSnapshot:
+        current = self._snapshot
+        if not force and self._current(current):
+            return current
+        path = self.path
+        try:
+            started = time.perf_counter()
+            with stage("corpus_load"):
+                snap = load_snapshot(path)
+        except CorpusError as e:
+            if current is None:
+                raise
+            logger.error("Corpus reload failed, keeping previous version of %s: %s", path, e)
+            return current
+        self._snapshot = snap
+        logger.info("Loaded %d articles from %s in %.2fs", len(snap), path, time.perf_counter() - started)
+        return snap
+
+
+corpus_store = CorpusStore()
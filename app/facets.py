@@ -0,0 +1,207 @@
+# Per-article metadata and facet bitsets, computed once per corpus version when the snapshot
+# is built (next to the search index), so /search can filter and count facets without
+# touching article text.
+#
+# Every facet value holds a bitset of article numbers in a Python int: filters are ORs within
+# a facet and ANDs across facets, counts are popcounts of ``bits & results``.
+
+import os
+import re
+import heapq
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from search_index import TOKEN_RE, InvertedIndex
+
+# Values listed per facet in /search responses (most frequent first)
+FACET_TOP = int(os.environ.get("FACET_TOP", "20"))
+# Highest-weighted (tf-idf) body terms kept per article; 0 disables
+FACET_TOP_TERMS = int(os.environ.get("FACET_TOP_TERMS", "8"))
+
+# facet value -> index terms that imply it (any one is enough)
+ORGANISMS: Dict[str, Tuple[str, ...]] = {
+    "mouse": ("mouse", "mice", "murine"),
+    "rat": ("rat", "rats"),
+    "human": ("human", "humans", "astronaut", "astronauts"),
+    "arabidopsis": ("arabidopsis",),
+    "drosophila": ("drosophila",),
+    "c. elegans": ("elegans",),
+    "yeast": ("yeast", "saccharomyces"),
+    "zebrafish": ("zebrafish",),
+    "bacteria": ("bacteria", "bacterial", "escherichia", "bacillus"),
+}
+CONDITIONS: Dict[str, Tuple[str, ...]] = {
+    "microgravity": ("microgravity",),
+    "spaceflight": ("spaceflight",),
+    "radiation": ("radiation", "irradiation", "irradiated"),
+    "hypergravity": ("hypergravity",),
+    "unloading": ("unloading", "hindlimb"),
+    "bone loss": ("osteoporosis", "osteoclast", "osteoclasts"),
+    "muscle atrophy": ("atrophy",),
+}
+# filter spellings accepted for a value, e.g. organism:mice -> mouse
+_ALIASES: Dict[str, Dict[str, str]] = {
+    facet: {term: value for value, terms in table.items() for term in terms}
+    for facet, table in (("organism", ORGANISMS), ("condition", CONDITIONS))
+}
+# article length in indexed words
+LENGTH_BUCKETS: Tuple[Tuple[str, int], ...] = (("<2k", 2000), ("2k-5k", 5000), ("5k-10k", 10000), (">10k", 1 << 62))
+
+_SECTION_NUMBER_RE = re.compile(r"^[\dIVXivx]+[.)]?\s+")
+_STOPWORDS = frozenset("""
+    about above after again against also among analysis been before being below between both but
+    could data did does doing during each effect effects from further have having here however into
+    its itself more most other our ours over same should some such than that their theirs them then
+    there these they this those through under until using very were what when where which while who
+    whom why will with within would your study studies results shown showed figure table fig
+""".split())
+
+
+def section_value(title: str) -> str:
+    """Facet value of a section title: lowercased, leading numbering removed."""
+    return _SECTION_NUMBER_RE.sub("", title.strip()).lower()
+
+
+def top_terms(art, index: InvertedIndex, n: int = FACET_TOP_TERMS,
+              idf: Optional[Dict[str, float]] = None) -> List[str]:
+    """``n`` highest tf-idf body terms of ``art``. ``idf`` caches ``index.idf`` across calls (a
+    lookup in a mapped index is a binary search over its term table)."""
+    if idf is None:
+        idf = {}
+    counts: Counter = Counter()
+    for i in range(len(art.bodies)):
+        start, end = art.spans[2 * art.body_part(i)], art.spans[2 * art.body_part(i) + 1]
+        counts.update(t for t in TOKEN_RE.findall(art.haystack, start, end)
+                      if len(t) > 3 and not t.isdigit() and t not in _STOPWORDS)
+    weights = []
+    for t, tf in counts.items():
+        w = idf.get(t)
+        if w is None:
+            w = idf[t] = index.idf(t)
+        weights.append((tf * w, t))
+    return [t for _, t in heapq.nlargest(n, weights)]
+
+
+class _Bits:
+    """Builds an int bitset from article numbers in O(n)."""
+
+    def __init__(self, size: int):
+        self.buf = bytearray((size + 7) // 8)
+
+    def add(self, doc: int) -> None:
+        self.buf[doc >> 3] |= 1 << (doc & 7)
+
+    def value(self) -> int:
+        return int.from_bytes(self.buf, "little")
+
+
+def bitset(docs: Iterable[int], size: int) -> int:
+    bits = _Bits(size)
+    for doc in docs:
+        bits.add(doc)
+    return bits.value()
+
+
+class FacetIndex:
+    """Facet bitsets (``organism``, ``condition``, ``section``, ``length``) plus per-article metadata."""
+
+    FACETS = ("organism", "condition", "section", "length")
+
+    def __init__(self, articles: Sequence, index: InvertedIndex):
+        self.size = len(articles)
+        self.bits: Dict[str, Dict[str, int]] = {}
+        for facet, table in (("organism", ORGANISMS), ("condition", CONDITIONS)):
+            values = {}
+            for value, terms in table.items():
+                bits = _Bits(self.size)
+                for term in terms:
+                    entry = index._entry(term)
+                    if entry is not None:
+                        for doc in entry[0]:
+                            bits.add(doc)
+                found = bits.value()
+                if found:
+                    values[value] = found
+            self.bits[facet] = values
+
+        sections: Dict[str, _Bits] = {}
+        lengths: Dict[str, _Bits] = {}
+        self.top_terms: List[Tuple[str, ...]] = []
+        idf: Dict[str, float] = {}
+        for doc, art in enumerate(articles):
+            for title in art.titles:
+                value = section_value(title)
+                if value:
+                    if value not in sections:
+                        sections[value] = _Bits(self.size)
+                    sections[value].add(doc)
+            bucket = next(name for name, limit in LENGTH_BUCKETS if index.doc_lengths[doc] < limit)
+            if bucket not in lengths:
+                lengths[bucket] = _Bits(self.size)
+            lengths[bucket].add(doc)
+            self.top_terms.append(tuple(top_terms(art, index, idf=idf)) if FACET_TOP_TERMS > 0 else ())
+        self.bits["section"] = {v: b.value() for v, b in sections.items()}
+        self.bits["length"] = {name: lengths[name].value() for name, _ in LENGTH_BUCKETS if name in lengths}
+        self._doc_lengths = index.doc_lengths
+
+    def parse_filters(self, specs: Iterable[str]) -> Dict[str, List[str]]:
+        """``["organism:mouse", "organism:rat", "section:methods"]`` -> {facet: [values]}.
+
+        Raises ValueError for an unknown facet or a malformed spec; unknown values simply match nothing.
+        """
+        filters: Dict[str, List[str]] = {}
+        for spec in specs:
+            facet, sep, value = spec.partition(":")
+            facet, value = facet.strip().lower(), value.strip().lower()
+            if not sep or not value:
+                raise ValueError(f"Malformed filter {spec!r}; expected facet:value")
+            if facet not in self.bits:
+                raise ValueError(f"Unknown facet {facet!r}; known: {', '.join(self.FACETS)}")
+            if facet == "section":
+                value = section_value(value)
+            elif facet in _ALIASES:
+                value = _ALIASES[facet].get(value, value)
+            filters.setdefault(facet, []).append(value)
+        return filters
+
+    def mask(self, filters: Dict[str, List[str]]) -> Optional[int]:
+        """Bitset of articles passing ``filters`` (OR within a facet, AND across), None if no filters."""
+        if not filters:
+            return None
+        mask = (1 << self.size) - 1
+        for facet, values in filters.items():
+            table = self.bits[facet]
+            any_of = 0
+            for value in values:
+                any_of |= table.get(value, 0)
+            mask &= any_of
+        return mask
+
+    @staticmethod
+    def member_test(mask: int, size: int):
+        """Fast ``doc in mask`` for many docs (avoids shifting a big int per doc)."""
+        raw = mask.to_bytes((size + 7) // 8 or 1, "little")
+        return lambda doc: raw[doc >> 3] >> (doc & 7) & 1
+
+    def counts(self, docs: Iterable[int], facets: Sequence[str], top: int = FACET_TOP) -> Dict[str, Dict[str, int]]:
+        """Per facet, the ``top`` values by number of ``docs`` having them."""
+        results = bitset(docs, self.size)
+        out: Dict[str, Dict[str, int]] = {}
+        for facet in facets:
+            counted = [(value, bin(bits & results).count("1")) for value, bits in self.bits[facet].items()]
+            counted = [vc for vc in counted if vc[1]]
+            if facet != "length":
+                counted.sort(key=lambda vc: (-vc[1], vc[0]))
+            out[facet] = dict(counted[:top])
+        return out
+
+    def meta(self, doc: int, art) -> Dict[str, object]:
+        """Precomputed metadata of one article, for /search results."""
+        return {
+            "pmcid": art.key,
+            "sections": [section_value(t) for t in art.titles],
+            "length": int(self._doc_lengths[doc]),
+            "top_terms": list(self.top_terms[doc]),
+            "organisms": [v for v, bits in self.bits["organism"].items() if bits >> doc & 1],
+            "conditions": [v for v, bits in self.bits["condition"].items() if bits >> doc & 1],
+        }
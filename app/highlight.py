@@ -0,0 +1,102 @@
+# Highlighted snippets for /search results, built from the token positions the search pass
+# already found instead of re-searching the text.
+#
+# Only the parts a result matched in are touched: each is tokenized from the article's
+# lowercased haystack up to its last hit to turn token numbers into character offsets, and the
+# hits are grouped into the best few windows. A snippet is
+#     {"text": ..., "start": ..., "end": ..., "spans": [[s, e], ...]}
+# where start/end locate the snippet in the part's text and spans are relative to "text".
+
+import os
+from typing import Any, Dict, List, Set, Tuple
+
+from search_index import TOKEN_RE, InvertedIndex, Match
+
+# Snippets returned per matched part, best first
+HIGHLIGHT_SNIPPETS = int(os.environ.get("HIGHLIGHT_SNIPPETS", "3"))
+# Characters of context on each side of a snippet's hits
+HIGHLIGHT_RADIUS = int(os.environ.get("HIGHLIGHT_RADIUS", "80"))
+
+Span = Tuple[int, int, int]  # (char start, char end, term number), relative to the part
+
+
+def char_spans(art, part: int, tokens: List[Tuple[int, int, int]]) -> List[Span]:
+    """Character spans of ``tokens`` (from ``InvertedIndex.part_tokens``) inside one part."""
+    if not tokens:
+        return []
+    lo, hi = art.spans[2 * part], art.spans[2 * part + 1]
+    last = max(n + width - 1 for n, width, _ in tokens)
+    bounds: List[Tuple[int, int]] = []
+    for m in TOKEN_RE.finditer(art.haystack, lo, hi):
+        bounds.append((m.start() - lo, m.end() - lo))
+        if len(bounds) > last:
+            break
+    return [(bounds[n][0], bounds[n + width - 1][1], t) for n, width, t in tokens if n + width - 1 < len(bounds)]
+
+
+def _merge(spans: List[Span]) -> List[List[int]]:
+    merged: List[List[int]] = []
+    for start, end, _ in spans:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def snippets(text: str, spans: List[Span], radius: int = HIGHLIGHT_RADIUS,
+             limit: int = HIGHLIGHT_SNIPPETS) -> List[Dict[str, Any]]:
+    """Up to ``limit`` windows of ``text`` around ``spans``, most distinct terms (then hits) first."""
+    windows: List[List[Span]] = []
+    i = 0
+    while i < len(spans):
+        j = i + 1
+        while j < len(spans) and spans[j][1] - spans[i][0] <= 2 * radius:
+            j += 1
+        windows.append(spans[i:j])
+        i = j
+    # neighbouring windows split the context between them at the midpoint, so snippets never overlap
+    bounds = []
+    for k, w in enumerate(windows):
+        first, last = w[0][0], max(e for _, e, _ in w)
+        lo = (max(e for _, e, _ in windows[k - 1]) + first) // 2 if k else 0
+        hi = (last + windows[k + 1][0][0]) // 2 if k + 1 < len(windows) else len(text)
+        bounds.append((max(lo, first - radius), min(hi, last + radius), first, last))
+    order = sorted(range(len(windows)),
+                   key=lambda k: (-len({t for _, _, t in windows[k]}), -len(windows[k]), k))
+    out = []
+    for k in order[:limit]:
+        start, end, first, last = bounds[k]
+        # cut at word boundaries
+        if start > 0:
+            sp = text.find(" ", start, first)
+            if sp != -1:
+                start = sp + 1
+        if end < len(text):
+            sp = text.rfind(" ", last, end)
+            if sp != -1:
+                end = sp
+        out.append({"text": text[start:end], "start": start, "end": end,
+                    "spans": [[s - start, e - start] for s, e in _merge(windows[k])]})
+    return out
+
+
+class Highlighter:
+    """Snippets for one search result; each part is tokenized at most once."""
+
+    def __init__(self, index: InvertedIndex, art, match: Match, terms: List[str]):
+        self.art = art
+        self._tokens = index.part_tokens(match, terms)
+        self._done: Dict[int, List[Dict[str, Any]]] = {}
+
+    @property
+    def parts(self) -> Set[int]:
+        return set(self._tokens)
+
+    def part(self, part: int, text: str) -> List[Dict[str, Any]]:
+        """Snippets for ``part`` (whose original text is ``text``); [] if it did not match."""
+        found = self._done.get(part)
+        if found is None:
+            tokens = self._tokens.get(part)
+            found = self._done[part] = snippets(text, char_spans(self.art, part, tokens)) if tokens else []
+        return found
@@ -0,0 +1,343 @@
+# Read-only, memory-mapped on-disk copies of the search index and the chunk embedding vectors.
+#
+# Files live under <mapped root>/<digest[:16]>/ (one directory per data file version) and are
+# written to a temporary name and renamed into place, so a reader either sees a complete file
+# or none. Every uvicorn worker maps the same files, so the kernel page cache holds one copy.
+#
+# Build them offline after publishing a new data file (from the app directory):
+#     python mapped_index.py              # search index
+#     python mapped_index.py --vectors    # plus embedding vectors exported from the Chroma index
+
+import os
+import sys
+import json
+import mmap
+import shutil
+import struct
+import logging
+import argparse
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from search_index import InvertedIndex
+
+logger = logging.getLogger("nasaSpaceChallenge")
+
+# Where the mapped files go; default: "mapped_index" next to the data file
+MAPPED_INDEX_DIR = os.environ.get("MAPPED_INDEX_DIR", "")
+
+_SEARCH_MAGIC = b"NSCIDX01"
+_VECTORS_MAGIC = b"NSCVEC01"
+_HEADER = struct.Struct("<8sQ")
+
+
+def mapped_root(data_path: str) -> str:
+    return MAPPED_INDEX_DIR or os.path.join(os.path.dirname(os.path.abspath(data_path)), "mapped_index")
+
+
+def version_dir(root: str, digest: str) -> str:
+    return os.path.join(root, digest[:16])
+
+
+def search_index_path(root: str, digest: str) -> str:
+    return os.path.join(version_dir(root, digest), "search.idx")
+
+
+def vectors_path(root: str, digest: str, model: str, signature: str) -> str:
+    return os.path.join(version_dir(root, digest), f"vectors-{model.replace('/', '_')}-{signature}.bin")
+
+
+def _write_sections(path: str, magic: bytes, header: Dict[str, Any], sections: List[Tuple[str, str, bytes]]) -> None:
+    """Write magic, a JSON header and 8-byte aligned binary sections; atomically replaces ``path``."""
+    relative = {}
+    pos = 0
+    for name, code, data in sections:
+        relative[name] = (pos, len(data), code)
+        pos += len(data) + (-len(data) % 8)
+    # section offsets depend on the header length and vice versa; grow until they agree
+    start = 0
+    while True:
+        header = dict(header, byteorder=sys.byteorder,
+                      sections={n: [start + off, size, code] for n, (off, size, code) in relative.items()})
+        blob = json.dumps(header).encode("utf-8")
+        needed = _HEADER.size + len(blob) + (-(_HEADER.size + len(blob)) % 8)
+        if needed <= start:
+            break
+        start = needed
+    blob += b" " * (start - _HEADER.size - len(blob))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(magic, start - _HEADER.size))
+            f.write(blob)
+            for _, _, data in sections:
+                f.write(data)
+                f.write(b"\0" * (-len(data) % 8))
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _open_sections(path: str, magic: bytes) -> Tuple[mmap.mmap, Dict[str, Any]]:
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    found, header_len = _HEADER.unpack_from(mm, 0)
+    if found != magic:
+        raise ValueError(f"{path} is not a mapped index file")
+    header = json.loads(mm[_HEADER.size:_HEADER.size + header_len])
+    if header.get("byteorder") != sys.byteorder:
+        raise ValueError(f"{path} was written on a {header.get('byteorder')}-endian machine")
+    return mm, header
+
+
+class _Slices:
+    """``values[offsets[i]:offsets[i + 1]]`` for i in ``range(base, base + length)``, as a sequence."""
+
+    __slots__ = ("offsets", "values", "base", "length")
+
+    def __init__(self, offsets: Sequence[int], values: Sequence[int], base: int = 0, length: Optional[int] = None):
+        self.offsets = offsets
+        self.values = values
+        self.base = base
+        self.length = len(offsets) - 1 if length is None else length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, i: int) -> Sequence[int]:
+        if not 0 <= i < self.length:
+            raise IndexError(i)
+        i += self.base
+        return self.values[self.offsets[i]:self.offsets[i + 1]]
+
+
+def write_search_index(index: InvertedIndex, path: str, **meta: Any) -> None:
+    terms = index.terms()
+    term_blob = bytearray()
+    term_offsets = array("Q", [0])
+    term_postings = array("Q", [0])
+    post_docs = array("I")
+    post_positions = array("Q", [0])
+    positions = array("I")
+    for term in terms:
+        term_blob += term.encode("utf-8")
+        term_offsets.append(len(term_blob))
+        docs, per_doc = index._entry(term)
+        post_docs.extend(docs)
+        for pos in per_doc:
+            positions.extend(pos)
+            post_positions.append(len(positions))
+        term_postings.append(len(post_docs))
+    part_offsets = array("Q", [0])
+    part_values = array("I")
+    for starts in index.part_starts:
+        part_values.extend(starts)
+        part_offsets.append(len(part_values))
+    _write_sections(path, _SEARCH_MAGIC, dict(meta, num_docs=index.num_docs, avgdl=index.avgdl, terms=len(terms)), [
+        ("term_blob", "B", bytes(term_blob)),
+        ("term_offsets", "Q", term_offsets.tobytes()),
+        ("term_postings", "Q", term_postings.tobytes()),
+        ("post_docs", "I", post_docs.tobytes()),
+        ("post_positions", "Q", post_positions.tobytes()),
+        ("positions", "I", positions.tobytes()),
+        ("doc_lengths", "I", array("I", index.doc_lengths).tobytes()),
+        ("part_offsets", "Q", part_offsets.tobytes()),
+        ("part_values", "I", part_values.tobytes()),
+    ])
+
+
+class MappedIndex(InvertedIndex):
+    """An InvertedIndex served straight from a file written by ``write_search_index``.
+
+    Postings are memoryviews over the shared mapping; a term is found by binary search over the
+    sorted term table, so nothing proportional to the vocabulary is copied into the process.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mm, header = _open_sections(path, _SEARCH_MAGIC)
+        self.meta = header
+        buf = memoryview(self._mm)
+        sec = header["sections"]
+
+        def view(name: str):
+            off, length, code = sec[name]
+            mv = buf[off:off + length]
+            return mv if code == "B" else mv.cast(code)
+
+        self._blob_start = sec["term_blob"][0]
+        self._term_offsets = view("term_offsets")
+        self._term_postings = view("term_postings")
+        self._post_docs = view("post_docs")
+        self._post_positions = view("post_positions")
+        self._positions = view("positions")
+        self._num_terms = header["terms"]
+        self.postings = None
+        self.doc_lengths = view("doc_lengths")
+        self.part_starts = _Slices(view("part_offsets"), view("part_values"))
+        self.num_docs = header["num_docs"]
+        self.avgdl = header["avgdl"]
+
+    def _term(self, i: int) -> bytes:
+        return self._mm[self._blob_start + self._term_offsets[i]:self._blob_start + self._term_offsets[i + 1]]
+
+    def _find(self, term: str) -> int:
+        key = term.encode("utf-8")
+        lo, hi = 0, self._num_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self._num_terms and self._term(lo) == key else -1
+
+    def _entry(self, term: str):
+        i = self._find(term)
+        if i < 0:
+            return None
+        start, end = self._term_postings[i], self._term_postings[i + 1]
+        return self._post_docs[start:end], _Slices(self._post_positions, self._positions, start, end - start)
+
+    def terms(self) -> List[str]:
+        return [self._term(i).decode("utf-8") for i in range(self._num_terms)]
+
+
+def open_or_build_search_index(root: str, digest: str, articles: Iterable) -> InvertedIndex:
+    """The mapped index for ``digest``, written first from ``articles`` if no worker has yet.
+
+    Falls back to the in-memory index if the file cannot be written or read.
+    """
+    path = search_index_path(root, digest)
+    if os.path.exists(path):
+        try:
+            return MappedIndex(path)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable search index %s: %s", path, e)
+    index = InvertedIndex(articles)
+    try:
+        write_search_index(index, path, digest=digest)
+        return MappedIndex(path)
+    except (OSError, ValueError) as e:
+        logger.warning("Could not write mapped search index %s, keeping it in memory: %s", path, e)
+        return index
+
+
+def write_vectors(path: str, ids: Sequence[Tuple[int, ...]], vectors: Any, texts: Optional[Sequence[str]] = None,
+                  **meta: Any) -> None:
+    """Store ``vectors`` (one row per chunk, L2-normalised here) with their ids.
+
+    Each id starts with (article, chunk); callers may append more integers per row (the same
+    number for every row). ``texts`` are the chunks' contents, stored so that a hit is read back
+    by offset instead of chunking its article again.
+    """
+    import numpy as np
+    mat = np.ascontiguousarray(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    mat /= np.where(norms == 0, 1.0, norms)
+    id_arr = np.asarray(ids, dtype=np.uint32).reshape(mat.shape[0], -1)
+    sections = [("ids", "I", id_arr.tobytes())]
+    if texts is not None:
+        blob = bytearray()
+        offsets = array("Q", [0])
+        for text in texts:
+            blob += text.encode("utf-8")
+            offsets.append(len(blob))
+        sections += [("text_offsets", "Q", offsets.tobytes()), ("texts", "B", bytes(blob))]
+    sections.append(("vectors", "f", mat.tobytes()))
+    _write_sections(path, _VECTORS_MAGIC, dict(meta, count=int(mat.shape[0]), dim=int(mat.shape[1]),
+                                               id_columns=int(id_arr.shape[1])), sections)
+
+
+class MappedVectors:
+    """Exact cosine search over a mapped float32 matrix (needs numpy)."""
+
+    def __init__(self, path: str):
+        import numpy as np
+        self.path = path
+        self._mm, header = _open_sections(path, _VECTORS_MAGIC)
+        self.meta = header
+        n, dim, cols = header["count"], header["dim"], header.get("id_columns", 2)
+        sec = header["sections"]
+        self.ids = np.frombuffer(self._mm, dtype=np.uint32, count=n * cols, offset=sec["ids"][0]).reshape(n, cols)
+        self.vectors = np.frombuffer(self._mm, dtype=np.float32, count=n * dim, offset=sec["vectors"][0]).reshape(n, dim)
+        # files exported before chunk texts were stored have neither section
+        self._text_offsets = None
+        if "texts" in sec:
+            off, length, _ = sec["text_offsets"]
+            self._text_offsets = memoryview(self._mm)[off:off + length].cast("Q")
+            self._texts_start = sec["texts"][0]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def has_texts(self) -> bool:
+        return self._text_offsets is not None
+
+    def text(self, row: int) -> str:
+        """The stored content of chunk ``row`` (needs ``has_texts``)."""
+        start = self._texts_start + self._text_offsets[row]
+        return self._mm[start:self._texts_start + self._text_offsets[row + 1]].decode("utf-8")
+
+    def top(self, query: Sequence[float], k: int) -> List[Tuple[int, float]]:
+        """Top-``k`` ``(row, cosine similarity)``, best first."""
+        import numpy as np
+        n = len(self.ids)
+        if n == 0 or k <= 0:
+            return []
+        q = np.asarray(query, dtype=np.float32)
+        norm = float(np.linalg.norm(q))
+        scores = self.vectors @ (q / norm if norm else q)
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def search(self, query: Sequence[float], k: int) -> List[Tuple[int, int, float]]:
+        """Top-``k`` ``(article index, chunk number, cosine similarity)``, best first."""
+        return [(int(self.ids[i, 0]), int(self.ids[i, 1]), score) for i, score in self.top(query, k)]
+
+
+def prune(root: str, keep_digest: str) -> None:
+    """Remove the mapped files of other data file versions."""
+    keep = version_dir(root, keep_digest)
+    if not os.path.isdir(root):
+        return
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if path != keep and os.path.isdir(path):
+            logger.info("Removing stale mapped index %s", path)
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from corpus import DATA_PATH, load_snapshot
+
+    parser = argparse.ArgumentParser(description="Build the memory-mapped search index (and vectors).")
+    parser.add_argument("--data", default=DATA_PATH, help="path to data.json / data.jsonl")
+    parser.add_argument("--vectors", action="store_true",
+                        help="also export the chunk embeddings (builds the Chroma index if needed)")
+    parser.add_argument("--prune", action="store_true", help="delete mapped files of older data versions")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    # loading the snapshot writes (or reuses) the mapped search index
+    corpus = load_snapshot(args.data)
+    root = mapped_root(args.data)
+    logger.info("Search index ready: %s", search_index_path(root, corpus.digest))
+    if args.vectors:
+        import vector_index
+        logger.info("Vectors ready: %s", vector_index.export_vectors(corpus))
+    if args.prune:
+        prune(root, corpus.digest)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+# In-process metrics: counters and latency histograms, plus per-request stage timings that the
+# app returns as a Server-Timing header.
+#
+#     with stage("corpus_load"):
+#         ...
+#
+# records the block's duration in the "stage_duration_seconds" histogram and, when called while
+# serving a request, adds it to that request's Server-Timing breakdown.
+
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# seconds; covers cached /search hits up to cold model loads and long generations
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus layout)."""
+
+    __slots__ = ("buckets", "counts", "count", "total")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        cumulative = []
+        acc = 0
+        for c in self.counts:
+            acc += c
+            cumulative.append(acc)
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "buckets": {**{str(b): n for b, n in zip(self.buckets, cumulative)}, "+Inf": cumulative[-1]},
+        }
+
+
+class Metrics:
+    """Thread-safe registry of labelled counters and histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+
+    @staticmethod
+    def _labels(labels: Dict[str, Any]) -> Labels:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        key = self._labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        key = self._labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram()
+            hist.observe(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "counters": {name: [{"labels": dict(k), "value": v} for k, v in series.items()]
+                             for name, series in self._counters.items()},
+                "histograms": {name: [{"labels": dict(k), **h.snapshot()} for k, h in series.items()]
+                               for name, series in self._histograms.items()},
+            }
+
+    def prometheus(self, prefix: str, gauges: Dict[str, List[Tuple[Dict[str, Any], float]]]) -> str:
+        """Text exposition format; ``gauges`` are point-in-time values supplied by the caller."""
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {prefix}{name} counter")
+                for key, v in series.items():
+                    lines.append(f"{prefix}{name}{_fmt_labels(dict(key))} {_num(v)}")
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {prefix}{name} histogram")
+                for key, h in series.items():
+                    labels = dict(key)
+                    acc = 0
+                    for bound, c in zip(h.buckets + (float("inf"),), h.counts):
+                        acc += c
+                        le = "+Inf" if bound == float("inf") else _num(bound)
+                        lines.append(f"{prefix}{name}_bucket{_fmt_labels({**labels, 'le': le})} {acc}")
+                    lines.append(f"{prefix}{name}_sum{_fmt_labels(labels)} {_num(h.total)}")
+                    lines.append(f"{prefix}{name}_count{_fmt_labels(labels)} {h.count}")
+        for name, samples in sorted(gauges.items()):
+            lines.append(f"# TYPE {prefix}{name} gauge")
+            for labels, v in samples:
+                lines.append(f"{prefix}{name}{_fmt_labels(labels)} {_num(v)}")
+        return "\n".join(lines) + "\n"
+
+
+def _num(v: float) -> str:
+    return repr(float(v)) if isinstance(v, float) and not float(v).is_integer() else str(int(v))
+
+
+def _fmt_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    inner = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in labels.items())
+    return "{" + inner + "}"
+
+
+metrics = Metrics()
+
+# (stage, seconds) recorded while serving the current request; None outside requests
+request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    metrics.observe("stage_duration_seconds", seconds, stage=name)
+    timings = request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - t0)
+
+
+def server_timing(timings: List[Tuple[str, float]]) -> str:
+    """Server-Timing header value; repeated stages are summed, in first-seen order."""
+    totals: Dict[str, float] = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ", ".join(f"{name};dur={seconds * 1000.0:.2f}" for name, seconds in totals.items())
@@ -0,0 +1,115 @@
+# Long-lived Ollama clients shared by all requests: pooled HTTP connections for health probes,
+# one OllamaLLM instance, and a concurrency gate in front of the model.
+
+import os
+import asyncio
+import logging
+import threading
+from typing import TYPE_CHECKING, Optional
+
+import httpx
+
+if TYPE_CHECKING:
+    from langchain_ollama import OllamaLLM
+
+logger = logging.getLogger("nasaSpaceChallenge")
+
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "127.0.0.1")
+OLLAMA_PORT = int(os.environ.get("OLLAMA_PORT", "11434"))
+OLLAMA_BASE_URL = f"http://{OLLAMA_HOST}:{OLLAMA_PORT}"
+# Generations allowed to run at once, and how many more may wait before /ask answers 503
+OLLAMA_MAX_CONCURRENCY = int(os.environ.get("OLLAMA_MAX_CONCURRENCY", "2"))
+OLLAMA_MAX_QUEUE = int(os.environ.get("OLLAMA_MAX_QUEUE", "16"))
+# How long Ollama keeps the model in memory after the warm-up load (Ollama duration syntax)
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+
+_http = httpx.Client(base_url=OLLAMA_BASE_URL)
+_ahttp = httpx.AsyncClient(base_url=OLLAMA_BASE_URL)
+
+
+def healthcheck(timeout: float = 0.75) -> bool:
+    try:
+        resp = _http.get("/api/version", timeout=timeout)
+        return 200 <= resp.status_code < 300
+    except Exception:
+        return False
+
+
+async def ahealthcheck(timeout: float = 0.75) -> bool:
+    try:
+        resp = await _ahttp.get("/api/version", timeout=timeout)
+        return 200 <= resp.status_code < 300
+    except Exception:
+        return False
+
+
+def preload_model(model: str, timeout: float = 300.0) -> None:
+    """Have Ollama load ``model`` into memory (a generate request without a prompt)."""
+    resp = _http.post("/api/generate", json={"model": model, "keep_alive": OLLAMA_KEEP_ALIVE}, timeout=timeout)
+    resp.raise_for_status()
+
+
+async def aclose() -> None:
+    _http.close()
+    await _ahttp.aclose()
+
+
+class ModelBusyError(Exception):
+    """Raised when the generation queue is full."""
+
+
+class ConcurrencyGate:
+    """Async semaphore with a bounded number of waiters.
+
+    ``async with gate:`` runs at most ``limit`` bodies at once; once ``max_waiting`` callers are
+    already queued, further callers get ModelBusyError instead of piling up.
+    """
+
+    def __init__(self, limit: int, max_waiting: int):
+        self.limit = max(1, limit)
+        self.max_waiting = max(0, max_waiting)
+        self._sem = asyncio.Semaphore(self.limit)
+        self.active = 0
+        self.waiting = 0
+
+    def check(self) -> None:
+        """Raise ModelBusyError if a new caller would be rejected right now."""
+        if self._sem.locked() and self.waiting >= self.max_waiting:
+            raise ModelBusyError(f"Model busy: {self.active} running, {self.waiting} queued")
+
+    async def __aenter__(self):
+        self.check()
+        self.waiting += 1
+        try:
+            await self._sem.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.active -= 1
+        self._sem.release()
+        return False
+
+
+model_gate = ConcurrencyGate(OLLAMA_MAX_CONCURRENCY, OLLAMA_MAX_QUEUE)
+
+_llm: Optional["OllamaLLM"] = None
+_llm_lock = threading.Lock()
+
+
+def get_llm(model: str, options: dict) -> "OllamaLLM":
+    """The process-wide OllamaLLM; its sync and async clients keep their connections open."""
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                from langchain_ollama import OllamaLLM
+                _llm = OllamaLLM(
+                    model=model,
+                    base_url=OLLAMA_BASE_URL,
+                    temperature=0,
+                    model_kwargs={"options": options},
+                )
+    return _llm
@@ -0,0 +1,316 @@
+# Owns the local `ollama serve` process: one background thread probes its health, (re)starts it
+# with exponential backoff and preloads the model, so request handlers only read the state and
+# answer 503 with a Retry-After while Ollama is starting, loading the model or backing off.
+#
+# With OLLAMA_AUTOSTART=0 nothing is launched; the thread still tracks an external server's
+# health. Any command that serves Ollama's /api/version works as OLLAMA_COMMAND, e.g. the stub:
+#     OLLAMA_COMMAND="python ../bench/stub_ollama.py --port 11434"
+
+import os
+import math
+import time
+import shlex
+import logging
+import threading
+import subprocess
+from typing import Any, Callable, Dict, Optional
+
+import ollama_client
+from metrics import metrics, stage
+
+logger = logging.getLogger("nasaSpaceChallenge")
+
+OLLAMA_AUTOSTART = os.environ.get("OLLAMA_AUTOSTART", "1") not in ("0", "false", "False")
+OLLAMA_COMMAND = os.environ.get("OLLAMA_COMMAND", "ollama serve")
+# How long a launched (or previously healthy) server may stay unreachable before it is restarted
+OLLAMA_START_TIMEOUT = float(os.environ.get("OLLAMA_START_TIMEOUT", "60"))
+# 0 = launch at most once; never restart a server that exited or hung
+OLLAMA_LAZY_RETRY = os.environ.get("OLLAMA_LAZY_RETRY", "1") not in ("0", "false", "False")
+# Seconds between health probes once ready (probes run every 0.5s while starting)
+OLLAMA_HEALTH_INTERVAL = float(os.environ.get("OLLAMA_HEALTH_INTERVAL", "5"))
+# Restart delay doubles from OLLAMA_BACKOFF_MIN up to OLLAMA_BACKOFF_MAX seconds after each failure
+OLLAMA_BACKOFF_MIN = float(os.environ.get("OLLAMA_BACKOFF_MIN", "1"))
+OLLAMA_BACKOFF_MAX = float(os.environ.get("OLLAMA_BACKOFF_MAX", "60"))
+# 1 = load the model into memory as soon as the server is up (kept for OLLAMA_KEEP_ALIVE)
+OLLAMA_PRELOAD = os.environ.get("OLLAMA_PRELOAD", "1") not in ("0", "false", "False")
+# Consecutive failed model loads (e.g. the model was never pulled) after which the state turns
+# "down" and the load error is reported; loading is still retried with backoff
+OLLAMA_PRELOAD_ATTEMPTS = int(os.environ.get("OLLAMA_PRELOAD_ATTEMPTS", "3"))
+
+STARTING, WARMING, READY, DOWN, STOPPED = "starting", "warming", "ready", "down", "stopped"
+_STARTING_POLL = 0.5
+
+
+class OllamaUnavailable(Exception):
+    """Raised by ``OllamaSupervisor.check`` when Ollama cannot take a request yet."""
+
+    def __init__(self, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.retry_after = retry_after
+
+
+def _log_process_pipes(proc: subprocess.Popen, prefix: str):
+    def _reader(stream, level):
+        if not stream:
+            return
+        for line in iter(stream.readline, b""):
+            if not line:
+                break
+            try:
+                logger.log(level, "%s%s", prefix, line.decode(errors="ignore").rstrip())
+            except Exception:
+                pass
+    threading.Thread(target=_reader, args=(proc.stdout, logging.INFO), daemon=True).start()
+    threading.Thread(target=_reader, args=(proc.stderr, logging.WARNING), daemon=True).start()
+
+
+class OllamaSupervisor:
+    """Health-checks, starts and restarts Ollama from a single background thread.
+
+    States: "starting" (launched or recovering, not answering yet), "warming" (answering, model
+    loading), "ready", "down" (unreachable and waiting for the next restart or for an external
+    server, or answering but the model failed to load ``preload_attempts`` times in a row) and
+    "stopped". Only the supervisor thread and ``stop`` touch the process.
+    """
+
+    def __init__(self, model: str, command: str = OLLAMA_COMMAND, autostart: bool = OLLAMA_AUTOSTART,
+                 restart: bool = OLLAMA_LAZY_RETRY, preload: bool = OLLAMA_PRELOAD,
+                 preload_attempts: int = OLLAMA_PRELOAD_ATTEMPTS, start_timeout: float = OLLAMA_START_TIMEOUT, interval: float = OLLAMA_HEALTH_INTERVAL,
+                 backoff_min: float = OLLAMA_BACKOFF_MIN, backoff_max: float = OLLAMA_BACKOFF_MAX,
+                 healthcheck: Callable[[], bool] = ollama_client.healthcheck,
+                 preload_model: Callable[[str], None] = ollama_client.preload_model):
+        self.model = model
+        self.command = command
+        self.autostart = autostart
+        self.restart = restart
+        self.preload = preload
+        self.preload_attempts = max(1, preload_attempts)
+        self.start_timeout = start_timeout
+        self.interval = interval
+        self.backoff_min = backoff_min
+        self.backoff_max = max(backoff_min, backoff_max)
+        self._healthcheck = healthcheck
+        self._preload = preload_model
+
+        self.state = DOWN
+        self.reachable = False
+        self.model_loaded = False
+        self.process: Optional[subprocess.Popen] = None
+        self.launches = 0           # processes actually spawned
+        self.launch_failures = 0    # spawn attempts that raised (command missing, ...)
+        self.failures = 0
+        self.preload_failures = 0
+        self.last_error: Optional[str] = None
+        self._deadline = 0.0    # monotonic time a starting server must answer by
+        self._next_try = 0.0    # monotonic time of the next launch / preload attempt
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- request side ---
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def wake(self) -> None:
+        """Probe now instead of at the next interval (e.g. after a request saw Ollama fail)."""
+        self._wake.set()
+
+    def wait_ready(self, timeout: float) -> bool:
+        return self._ready.wait(timeout)
+
+    def retry_after(self) -> int:
+        """Seconds a client should wait before retrying, from the current state."""
+        wait = max(0.0, self._next_try - time.monotonic())
+        if self.state == STARTING:
+            wait = max(0.0, min(self._deadline - time.monotonic(), 10.0))
+        return max(1, int(math.ceil(wait)) + 1)
+
+    def check(self) -> None:
+        """Return if requests can go to Ollama, else raise OllamaUnavailable."""
+        state = self.state
+        if state == READY:
+            return
+        self.wake()
+        if state == WARMING:
+            detail = f"Ollama is loading {self.model}"
+        elif state == STARTING:
+            detail = "Ollama is starting"
+        elif self.reachable and self.last_error:
+            detail = self.last_error
+        else:
+            detail = "Ollama backend not reachable" + (f": {self.last_error}" if self.last_error else "")
+        raise OllamaUnavailable(detail, self.retry_after())
+
+    def status(self) -> Dict[str, Any]:
+        proc = self.process
+        return {
+            "state": self.state,
+            "reachable": self.reachable,
+            "model_loaded": self.model_loaded,
+            "managed": proc is not None,
+            "pid": proc.pid if proc else None,
+            "running": bool(proc and proc.poll() is None),
+            "returncode": proc.returncode if proc else None,
+            "restarts": max(0, self.launches - 1),
+            "launch_failures": self.launch_failures,
+            "failures": self.failures,
+            "preload_failures": self.preload_failures,
+            "last_error": self.last_error,
+        }
+
+    # --- lifecycle ---
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        if not self.autostart:
+            logger.info("OLLAMA_AUTOSTART disabled; expecting external Ollama server.")
+        self._thread = threading.Thread(target=self._run, name="ollama-supervisor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._set(STOPPED)
+        with self._lock:
+            proc, self.process = self.process, None
+        if proc is not None and proc.poll() is None:
+            logger.info("Terminating Ollama process started by this app...")
+            self._terminate(proc)
+
+    # --- supervisor thread ---
+
+    def _set(self, state: str) -> None:
+        if state != self.state:
+            logger.info("Ollama: %s -> %s", self.state, state)
+            self.state = state
+        if state == READY:
+            self._ready.set()
+        else:
+            self._ready.clear()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self._tick()
+            except Exception:
+                logger.exception("Ollama supervisor check failed")
+            if self.state == READY:
+                delay = self.interval
+            elif self.state == STARTING:
+                delay = _STARTING_POLL
+            else:
+                delay = min(self.interval, max(_STARTING_POLL, self._next_try - time.monotonic()))
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def _backoff(self, reason: str) -> None:
+        self.failures += 1
+        self.last_error = reason
+        delay = min(self.backoff_max, self.backoff_min * 2 ** (self.failures - 1))
+        self._next_try = time.monotonic() + delay
+        logger.warning("%s; next attempt in %.1fs", reason, delay)
+
+    def _tick(self) -> None:
+        now = time.monotonic()
+        healthy = self._healthcheck()
+        self.reachable = healthy
+        if healthy:
+            if self.preload and not self.model_loaded:
+                # a model that keeps failing to load is an error, not a warm-up
+                self._set(DOWN if self.preload_failures >= self.preload_attempts else WARMING)
+                if now < self._next_try:
+                    return
+                try:
+                    with stage("ollama_preload"):
+                        self._preload(self.model)
+                except Exception as e:
+                    self.preload_failures += 1
+                    self._backoff(f"Loading {self.model} failed: {e}")
+                    if self.preload_failures >= self.preload_attempts:
+                        self._set(DOWN)
+                    return
+                self.model_loaded = True
+            self.failures = 0
+            self.preload_failures = 0
+            self.last_error = None
+            self._next_try = 0.0
+            self._set(READY)
+            return
+
+        self.model_loaded = False
+        self.preload_failures = 0
+        if self.state in (READY, WARMING):
+            # give a server that was healthy the same grace period as a fresh start
+            self._deadline = now + self.start_timeout
+        proc = self.process
+        if proc is not None and proc.poll() is None:
+            if now < self._deadline:
+                self._set(STARTING)
+                return
+            self._kill()
+            self._backoff(f"Ollama did not answer within {self.start_timeout:.0f}s; restarting it")
+        elif proc is not None:
+            with self._lock:
+                self.process = None
+            metrics.inc("ollama_exits")
+            self._backoff(f"Ollama process exited with code {proc.returncode}")
+
+        attempted = self.launches or self.launch_failures
+        if not self.autostart or (attempted and not self.restart) or now < self._next_try:
+            self._set(DOWN)
+            return
+        self._launch()
+
+    def _launch(self) -> None:
+        if self._stopping.is_set():
+            return
+        logger.info("Starting Ollama server with command: %s", self.command)
+        try:
+            if os.name == 'nt':
+                proc = subprocess.Popen(self.command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            else:
+                proc = subprocess.Popen(shlex.split(self.command), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except FileNotFoundError:
+            self.launch_failures += 1
+            self._set(DOWN)
+            self._backoff("Ollama command not found. Set OLLAMA_COMMAND env var to full path, e.g. "
+                          "C:/Users/<user>/AppData/Local/Programs/Ollama/ollama.exe serve")
+            return
+        except Exception as e:
+            self.launch_failures += 1
+            self._set(DOWN)
+            self._backoff(f"Failed to launch Ollama: {e}")
+            return
+        with self._lock:
+            self.process = proc
+        self.launches += 1
+        if self.launches > 1:
+            metrics.inc("ollama_restarts")
+        _log_process_pipes(proc, "[ollama] ")
+        self._deadline = time.monotonic() + self.start_timeout
+        self._set(STARTING)
+
+    def _kill(self) -> None:
+        with self._lock:
+            proc, self.process = self.process, None
+        if proc is not None:
+            self._terminate(proc)
+
+    @staticmethod
+    def _terminate(proc: subprocess.Popen) -> None:
+        try:
+            proc.terminate()
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                logger.info("Ollama did not exit gracefully; killing...")
+                proc.kill()
+        except Exception as e:
+            logger.warning("Error stopping Ollama: %s", e)
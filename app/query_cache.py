@@ -0,0 +1,135 @@
+# Bounded result cache for /search and /ask (LRU + TTL + memory cap, with hit/miss counters)
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+class QueryCache:
+    """Thread-safe LRU cache with per-entry TTL and a total size cap.
+
+    Callers pass the size of each value (e.g. its serialized length); entries are evicted
+    least-recently-used first until both ``max_entries`` and ``max_bytes`` hold. ``bind()``
+    ties the cache to a corpus version: when the version changes every entry is dropped, and a
+    ``put`` made for another version (a request that started on the previous corpus and finished
+    after the swap) is discarded.
+    ``max_entries=0`` disables caching.
+    """
+
+    def __init__(self, name: str, max_entries: int, ttl: float, max_bytes: int):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._version: Optional[Hashable] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_puts = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def bind(self, version: Hashable) -> None:
+        if version == self._version:
+            return
+        with self._lock:
+            if version != self._version:
+                if self._data:
+                    self.invalidations += 1
+                self._data.clear()
+                self._bytes = 0
+                self._version = version
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if not self.enabled:
+            return default
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires, size, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                self._bytes -= size
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Whether ``key`` has a live entry; unlike ``get`` it counts nothing and keeps the LRU order."""
+        if not self.enabled:
+            return False
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            return entry is not _MISSING and entry[0] >= time.monotonic()
+
+    def put(self, key: Hashable, value: Any, size: int, version: Optional[Hashable] = None) -> None:
+        """Store ``value``; with ``version``, only while the cache is still bound to it."""
+        if not self.enabled or size > self.max_bytes:
+            return
+        with self._lock:
+            if version is not None and version != self._version:
+                self.stale_puts += 1
+                return
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size, _) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "stale_puts": self.stale_puts,
+            }
+
+
+def _cache_from_env(prefix: str, entries: int, ttl: float, max_mb: float) -> QueryCache:
+    return QueryCache(
+        prefix.lower(),
+        int(os.environ.get(f"{prefix}_CACHE_SIZE", str(entries))),
+        float(os.environ.get(f"{prefix}_CACHE_TTL", str(ttl))),
+        int(float(os.environ.get(f"{prefix}_CACHE_MAX_MB", str(max_mb))) * 1024 * 1024),
+    )
+
+
+# rendered /search pages (JSON bytes) and /ask answers
+search_cache = _cache_from_env("SEARCH", entries=1024, ttl=600, max_mb=64)
+ask_cache = _cache_from_env("ASK", entries=256, ttl=3600, max_mb=16)
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(text.lower().split())
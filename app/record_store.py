@@ -0,0 +1,116 @@
+# Reader for the line-delimited corpus written by Space challenge/record_writer.py
+# (data.jsonl plus the data.idx offset index, keyed by PMC id, and the data.aliases.json table
+# of duplicate records folded into a canonical one).
+
+import os
+import sys
+import json
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Record ids and file names are defined once, by the writer; importing them from there keeps the
+# reader's offset index and alias resolution in step with what the scraper wrote.
+_SCRAPER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "Space challenge"))
+if _SCRAPER_DIR not in sys.path:
+    sys.path.append(_SCRAPER_DIR)
+from record_writer import aliases_path_for, index_path_for, record_key
+
+logger = logging.getLogger("nasaSpaceChallenge")
+
+
+class RecordStore:
+    """Random access to single records of a data.jsonl file through its offset index.
+
+    If the index is missing or was written for a different data file (size mismatch), offsets
+    are rebuilt with one sequential scan. Reads re-check the data file's mtime/size and return
+    None once the scraper has published a newer file, instead of decoding stale offsets.
+    """
+
+    def __init__(self, data_path: str):
+        self.data_path = data_path
+        self.index_path = index_path_for(data_path)
+        st = os.stat(data_path)
+        self.version = (st.st_mtime_ns, st.st_size)
+        self.entries: List[Tuple[str, int, int]] = self._load_index()
+        self._by_key: Dict[str, Tuple[int, int]] = {}
+        for key, offset, length in self.entries:
+            self._by_key.setdefault(key, (offset, length))
+        # alias id -> {"canonical", "reason", "similarity", "name", "link"}
+        self.aliases: Dict[str, Dict[str, Any]] = self._load_aliases()
+
+    def _load_index(self) -> List[Tuple[str, int, int]]:
+        size = self.version[1]
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("data_size") == size:
+                return [tuple(e) for e in index["records"]]
+            logger.warning("Index %s does not match %s; rescanning", self.index_path, self.data_path)
+        except (OSError, ValueError, KeyError, TypeError):
+            logger.warning("No usable index for %s; rescanning", self.data_path)
+        return self._scan()
+
+    def _load_aliases(self) -> Dict[str, Dict[str, Any]]:
+        path = aliases_path_for(self.data_path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                table = json.load(f)
+        except OSError:
+            return {}
+        except ValueError:
+            logger.warning("Ignoring unreadable alias table %s", path)
+            return {}
+        if table.get("data_size") != self.version[1]:
+            logger.warning("Alias table %s does not match %s; ignoring it", path, self.data_path)
+            return {}
+        return {k: v for k, v in table.get("aliases", {}).items() if v.get("canonical") in self._by_key}
+
+    def _scan(self) -> List[Tuple[str, int, int]]:
+        entries = []
+        offset = 0
+        with open(self.data_path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    rec = json.loads(line)
+                    entries.append((record_key(rec.get("link", "")), offset, len(line)))
+                offset += len(line)
+        return entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._by_key
+
+    def _read(self, offset: int, length: int) -> Optional[Dict[str, Any]]:
+        with open(self.data_path, "rb") as f:
+            st = os.fstat(f.fileno())
+            if (st.st_mtime_ns, st.st_size) != self.version:
+                logger.info("%s changed on disk; record lookup skipped until the corpus reloads", self.data_path)
+                return None
+            f.seek(offset)
+            raw = f.read(length)
+        return json.loads(raw)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        loc = self._by_key.get(key)
+        if loc is None:
+            return None
+        return self._read(*loc)
+
+    def iter_raw(self) -> Iterator[bytes]:
+        """Raw record lines in index order, one at a time.
+
+        Each record is read at its offset, so only one line is held in memory. When the file is in
+        index order (the scraper rewrites it in CSV order when it deduplicates) the reads run
+        straight through it without seeking.
+        """
+        with open(self.data_path, "rb") as f:
+            pos = 0
+            for _, offset, length in self.entries:
+                if offset != pos:
+                    f.seek(offset)
+                line = f.read(length)
+                pos = offset + len(line)
+                if line:
+                    yield line
@@ -0,0 +1,159 @@
+# Hybrid retrieval: BM25 over the corpus fused with vector similarity by reciprocal rank
+# fusion (RRF), plus an optional cross-encoder reranker over the fused top-N.
+#
+# /search fuses at article level (the article BM25 index with the articles of the best dense
+# chunks); /ask fuses at chunk level (a BM25 index over the same chunks the vector index holds).
+
+import os
+import logging
+import threading
+from typing import TYPE_CHECKING, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from corpus import CorpusSnapshot
+from chunking import corpus_chunks
+from search_index import InvertedIndex, Match, tokenize
+from metrics import stage
+
+if TYPE_CHECKING:
+    from langchain_community.docstore.document import Document
+
+logger = logging.getLogger("nasaSpaceChallenge")
+
+# Standard RRF damping constant: larger values flatten the advantage of the very top ranks
+RRF_K = int(os.environ.get("RRF_K", "60"))
+# Cross-encoder used to rerank fused results, e.g. cross-encoder/ms-marco-MiniLM-L-6-v2; empty disables
+RERANK_MODEL = os.environ.get("RERANK_MODEL", "")
+RERANK_TOP_N = int(os.environ.get("RERANK_TOP_N", "20"))
+
+_reranker = None
+_reranker_lock = threading.Lock()
+_chunk_indexes: Dict[str, "ChunkIndex"] = {}
+_chunk_indexes_lock = threading.Lock()
+
+
+def rrf(rankings: Sequence[Sequence[Hashable]], k: int = RRF_K) -> List[Tuple[Hashable, float]]:
+    """Fuse ranked id lists: score(id) = sum of 1 / (k + rank) over the lists containing it."""
+    scores: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, 1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+
+
+def lexical_ranking(corpus: CorpusSnapshot, terms: List[str], exact: bool) -> List[Tuple[Match, bool]]:
+    """Ranked ``(match, is_phrase)`` for ``terms``: phrase hits by BM25, then (unless ``exact``)
+    the remaining word hits by BM25; duplicate articles (same name+link) are dropped."""
+    index = corpus.index
+    scored = index.word_matches(terms)
+    phrase = index.phrase_matches(terms, scored)
+    phrase_hits = sorted(phrase.values(), key=lambda m: m.score, reverse=True)
+    word_hits = [] if exact else sorted(
+        (m for doc, m in scored.items() if doc not in phrase), key=lambda m: m.score, reverse=True)
+
+    ranked = []
+    seen = set()
+    for group, is_phrase in ((phrase_hits, True), (word_hits, False)):
+        for m in group:
+            art = corpus.articles[m.doc]
+            key = (art.name or "", art.link or "")
+            if key in seen:
+                continue
+            seen.add(key)
+            ranked.append((m, is_phrase))
+    return ranked
+
+
+def chunk_id(doc: "Document") -> Tuple[str, int]:
+    return doc.metadata.get("article", ""), doc.metadata.get("chunk", 0)
+
+
+class _ChunkText:
+    # the one-part shape InvertedIndex reads from articles
+    __slots__ = ("haystack", "spans")
+
+    def __init__(self, text: str):
+        self.haystack = text.lower()
+        self.spans = (0, len(self.haystack))
+
+
+class ChunkIndex:
+    """BM25 index over the corpus chunks, aligned with the documents stored in the vector index."""
+
+    def __init__(self, corpus: CorpusSnapshot):
+        self.docs = corpus_chunks(corpus)
+        self.by_id = {chunk_id(d): d for d in self.docs}
+        self.index = InvertedIndex(_ChunkText(d.page_content) for d in self.docs)
+
+    def search(self, query: str, k: int) -> List["Document"]:
+        matches = self.index.word_matches(tokenize(query))
+        best = sorted(matches.values(), key=lambda m: m.score, reverse=True)[:k]
+        return [self.docs[m.doc] for m in best]
+
+
+def chunk_index(corpus: CorpusSnapshot) -> ChunkIndex:
+    """The chunk BM25 index of ``corpus``, built on first use; only the current version is kept."""
+    idx = _chunk_indexes.get(corpus.digest)
+    if idx is not None:
+        return idx
+    with _chunk_indexes_lock:
+        idx = _chunk_indexes.get(corpus.digest)
+        if idx is None:
+            with stage("chunk_index_build"):
+                idx = ChunkIndex(corpus)
+            _chunk_indexes.clear()
+            _chunk_indexes[corpus.digest] = idx
+        return idx
+
+
+def hybrid_chunks(corpus: CorpusSnapshot, query: str, dense: List["Document"], k: int) -> List["Document"]:
+    """Top-``k`` chunks fusing the dense ranking ``dense`` with BM25 over the chunk texts."""
+    cidx = chunk_index(corpus)
+    lexical = cidx.search(query, k)
+    fused = rrf([[chunk_id(d) for d in lexical], [chunk_id(d) for d in dense]])
+    # dense hits come back from Chroma; map them onto the local copies when they exist
+    from_dense = {chunk_id(d): d for d in dense}
+    return [cidx.by_id.get(key) or from_dense[key] for key, _ in fused[:k]]
+
+
+def hybrid_articles(corpus: CorpusSnapshot, lexical: List[Tuple[Match, bool]], dense: List["Document"],
+                    exact: bool) -> List[Tuple[Match, bool, float]]:
+    """Fuse the article ranking from ``lexical_ranking`` with the articles of the ``dense`` chunks.
+
+    Returns ``(match, is_phrase, fused_score)``. Articles found only by the vector index get an
+    empty Match; with ``exact`` the dense ranking only reorders phrase hits and adds nothing.
+    """
+    by_doc = {m.doc: (m, is_phrase) for m, is_phrase in lexical}
+    dense_docs = []
+    for d in dense:
+        doc = d.metadata["doc"] if "doc" in d.metadata else corpus.by_key.get(d.metadata.get("article"))
+        if doc is not None and doc not in dense_docs and (not exact or doc in by_doc):
+            dense_docs.append(doc)
+    fused = rrf([[m.doc for m, _ in lexical], dense_docs])
+    return [(*by_doc.get(doc, (Match(doc), False)), score) for doc, score in fused]
+
+
+def get_reranker():
+    """The cross-encoder named by RERANK_MODEL (loaded on first use), or None when disabled."""
+    global _reranker
+    if not RERANK_MODEL:
+        return None
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                from sentence_transformers import CrossEncoder
+                logger.info("Loading reranker %s", RERANK_MODEL)
+                _reranker = CrossEncoder(RERANK_MODEL, device="cpu")
+    return _reranker
+
+
+def rerank(query: str, texts: List[str], top_n: int = RERANK_TOP_N) -> Optional[List[int]]:
+    """New order (indices into ``texts``) of the first ``top_n`` texts, best first, followed by
+    the rest unchanged; None when no reranker is configured."""
+    model = get_reranker()
+    if model is None or len(texts) < 2:
+        return None
+    head = min(top_n, len(texts))
+    with stage("rerank"):
+        scores = model.predict([(query, t) for t in texts[:head]])
+    order = sorted(range(head), key=lambda i: float(scores[i]), reverse=True)
+    return order + list(range(head, len(texts)))
@@ -0,0 +1,208 @@
+# Positional inverted index with BM25 ranking over the corpus snapshot
+
+import re
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+TOKEN_RE = re.compile(r"\w+")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, the same way documents are indexed."""
+    return TOKEN_RE.findall(text.lower())
+
+
+class Match:
+    """Per-document result of a query: BM25 score plus what matched.
+
+    ``starts`` holds the token positions where a phrase match begins (phrase queries only);
+    which parts matched is resolved lazily with ``InvertedIndex.part_tokens``, so ranking a
+    broad query never walks positions of documents that are not returned.
+    """
+
+    __slots__ = ("doc", "score", "occurrences", "terms_matched", "starts")
+
+    def __init__(self, doc: int, score: float = 0.0, occurrences: int = 0, terms_matched: int = 0,
+                 starts: Optional[List[int]] = None):
+        self.doc = doc
+        self.score = score
+        self.occurrences = occurrences
+        self.terms_matched = terms_matched
+        self.starts = starts
+
+
+class InvertedIndex:
+    """Postings of ``term -> (doc ids, token positions per doc)`` built from Article haystacks.
+
+    Every article is tokenized part by part (name, link, section titles, section bodies, the same
+    part numbering as ``Article.spans``). Token positions run across the whole article with a gap
+    between parts so a phrase can never straddle two sections; ``part_starts`` maps a position
+    back to the part it came from.
+    """
+
+    def __init__(self, articles: Iterable):
+        postings: Dict[str, Tuple[array, List[array]]] = {}
+        doc_lengths = array("I")
+        part_starts: List[array] = []
+
+        for doc, art in enumerate(articles):
+            hay = art.haystack
+            spans = art.spans
+            starts = array("I")
+            terms: Dict[str, array] = {}
+            pos = 0
+            for p in range(0, len(spans), 2):
+                starts.append(pos)
+                for m in TOKEN_RE.finditer(hay, spans[p], spans[p + 1]):
+                    positions = terms.get(m.group())
+                    if positions is None:
+                        positions = terms[m.group()] = array("I")
+                    positions.append(pos)
+                    pos += 1
+                pos += 1  # part boundary
+            doc_lengths.append(pos - len(starts))
+            part_starts.append(starts)
+            for term, positions in terms.items():
+                entry = postings.get(term)
+                if entry is None:
+                    entry = postings[term] = (array("I"), [])
+                entry[0].append(doc)
+                entry[1].append(positions)
+
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.part_starts = part_starts
+        self.num_docs = len(doc_lengths)
+        self.avgdl = (sum(doc_lengths) / self.num_docs) if self.num_docs else 0.0
+
+    def _entry(self, term: str):
+        """``(doc ids, positions per doc)`` of ``term`` or None; both are indexable sequences."""
+        return self.postings.get(term)
+
+    def terms(self) -> List[str]:
+        return sorted(self.postings)
+
+    def __contains__(self, term: str) -> bool:
+        return self._entry(term) is not None
+
+    def idf(self, term: str) -> float:
+        entry = self._entry(term)
+        df = len(entry[0]) if entry else 0
+        return math.log(1.0 + (self.num_docs - df + 0.5) / (df + 0.5))
+
+    def part_of(self, doc: int, position: int) -> int:
+        return bisect_right(self.part_starts[doc], position) - 1
+
+    def _bm25(self, tf: int, doc: int, idf: float) -> float:
+        norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self.doc_lengths[doc] / (self.avgdl or 1.0))
+        return idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+
+    def positions(self, term: str, doc: int) -> Optional[Sequence[int]]:
+        entry = self._entry(term)
+        if entry is None:
+            return None
+        docs = entry[0]
+        i = bisect_left(docs, doc)
+        if i == len(docs) or docs[i] != doc:
+            return None
+        return entry[1][i]
+
+    def word_matches(self, terms: List[str]) -> Dict[int, Match]:
+        """Documents containing any of ``terms``, scored with BM25."""
+        matches: Dict[int, Match] = {}
+        for term in dict.fromkeys(terms):
+            entry = self._entry(term)
+            if entry is None:
+                continue
+            idf = self.idf(term)
+            docs, positions = entry
+            for doc, pos in zip(docs, positions):
+                m = matches.get(doc)
+                if m is None:
+                    m = matches[doc] = Match(doc)
+                m.score += self._bm25(len(pos), doc, idf)
+                m.terms_matched += 1
+        return matches
+
+    def phrase_matches(self, terms: List[str], scored: Optional[Dict[int, Match]] = None) -> Dict[int, Match]:
+        """Documents containing ``terms`` as consecutive tokens.
+
+        ``occurrences`` counts phrase hits. Scores are taken from ``scored`` (a ``word_matches``
+        result for the same terms) when given.
+        """
+        if not terms:
+            return {}
+        entries = [self._entry(t) for t in terms]
+        if any(e is None for e in entries):
+            return {}
+        # walk the rarest term's documents and binary-search the others
+        rarest = min(range(len(terms)), key=lambda i: len(entries[i][0]))
+        matches: Dict[int, Match] = {}
+        for doc in entries[rarest][0]:
+            per_term = [self.positions(t, doc) for t in terms]
+            if any(p is None for p in per_term):
+                continue
+            starts = self._phrase_starts(per_term)
+            if not starts:
+                continue
+            base = scored.get(doc) if scored else None
+            matches[doc] = Match(doc, base.score if base else 0.0, len(starts), len(set(terms)), starts)
+        return matches
+
+    @staticmethod
+    def _phrase_starts(per_term: List[Sequence[int]]) -> List[int]:
+        """Start positions where term ``i`` of the phrase sits at ``start + i`` for every ``i``.
+
+        Anchors on the term with the fewest positions in the document and bisects forward through
+        the others' sorted position lists; a cursor per term only moves ahead, and the walk stops
+        as soon as one of them runs out.
+        """
+        anchor = min(range(len(per_term)), key=lambda i: len(per_term[i]))
+        others = [(i, per_term[i]) for i in range(len(per_term)) if i != anchor]
+        cursors = [0] * len(others)
+        starts: List[int] = []
+        for p in per_term[anchor]:
+            start = p - anchor
+            if start < 0:
+                continue
+            for n, (i, positions) in enumerate(others):
+                lo = bisect_left(positions, start + i, cursors[n])
+                if lo == len(positions):
+                    return starts
+                cursors[n] = lo
+                if positions[lo] != start + i:
+                    break
+            else:
+                starts.append(start)
+        return starts
+
+    def part_tokens(self, match: Match, terms: List[str]) -> Dict[int, List[Tuple[int, int, int]]]:
+        """Where ``match`` matched, per part: sorted ``(token number within the part, tokens, term)``.
+
+        A phrase match yields one entry per occurrence covering all of its tokens (term 0); a word
+        match yields one entry per occurrence of each distinct term, numbered in query order.
+        """
+        doc = match.doc
+        starts = self.part_starts[doc]
+        hits: Dict[int, List[Tuple[int, int, int]]] = {}
+        if match.starts is not None:
+            for p in match.starts:
+                part = bisect_right(starts, p) - 1
+                hits.setdefault(part, []).append((p - starts[part], len(terms), 0))
+        else:
+            for t, term in enumerate(dict.fromkeys(terms)):
+                for p in self.positions(term, doc) or ():
+                    part = bisect_right(starts, p) - 1
+                    hits.setdefault(part, []).append((p - starts[part], 1, t))
+        for tokens in hits.values():
+            tokens.sort()
+        return hits
+
+    def matched_parts(self, match: Match, terms: List[str]) -> Set[int]:
+        """Parts of ``match.doc`` where the phrase starts (phrase match) or any of ``terms`` occurs."""
+        return set(self.part_tokens(match, terms))
@@ -1,5 +1,9 @@
 //code regarding was written with the help of Copilot, the rest was not
 
+const SEARCH_PAGE_SIZE = 20;
+// full article sections fetched on demand from /article/{id}, keyed by id
+const articleCache = new Map();
+
 function runSearch() {
     const term = document.getElementById('searchInput').value.trim();
     const exactOnly = !!document.getElementById('exactOnly') && document.getElementById('exactOnly').checked;
@@ -7,16 +11,23 @@ function runSearch() {
         document.getElementById('results').innerText = "Please enter a search term.";
         return;
     }
-    // store current search configuration globally for highlighting later
+    // store current search configuration globally for highlighting and paging later
     window.__searchConfig = {
         term: term,
         words: term.split(/\s+/).filter(Boolean),
-        exact: exactOnly
+        exact: exactOnly,
+        loaded: 0,
+        total: 0
     };
     document.getElementById('results').innerText = "Searching...";
     document.getElementById('detailPanel').innerHTML = "";
-    const exactParam = exactOnly ? "&exact=1" : "";
-    fetch('/search?query=' + encodeURIComponent(term) + exactParam)
+    loadSearchPage(window.__searchConfig, true);
+}
+
+function loadSearchPage(cfg, first) {
+    const exactParam = cfg.exact ? "&exact=1" : "";
+    const pageParams = "&limit=" + SEARCH_PAGE_SIZE + "&offset=" + cfg.loaded;
+    fetch('/search?query=' + encodeURIComponent(cfg.term) + exactParam + pageParams)
         .then(response => {
             if (!response.ok) {
                 return response.json().then(errBody => {
@@ -28,86 +39,141 @@ function runSearch() {
             }
             return response.json();
         })
-        .then(items => {
+        .then(page => {
+            // a newer search replaced this one while the request was in flight
+            if (cfg !== window.__searchConfig) return;
             const resultsEl = document.getElementById('results');
-            resultsEl.innerHTML = "";
-            if (!Array.isArray(items) || items.length === 0) {
-                resultsEl.innerText = "No results.";
-                const summaryEl = document.getElementById('resultsSummary');
-                if (summaryEl) summaryEl.innerText = "Found 0 articles.";
-                return;
-            }
-            const totalArticles = items.length;
-            const totalMatchedSections = items.reduce((acc, it) => acc + (it.match_count || 0), 0);
+            const items = (page && Array.isArray(page.results)) ? page.results : [];
+            cfg.total = (page && page.total) || 0;
+            cfg.loaded += items.length;
             const summaryEl = document.getElementById('resultsSummary');
-            if (summaryEl) summaryEl.innerText = `Found ${totalArticles} articles — ${totalMatchedSections} matched sections (shown per item)`;
-            const list = document.createElement('ul');
-            items.forEach(article => {
-                const li = document.createElement('li');
-                const header = document.createElement('div');
-                const a = document.createElement('a');
-                a.href = article.link || "#";
-                a.innerText = article.name || (article.link || "Untitled");
-                a.target = "_blank";
-                a.style.fontWeight = "600";
-                header.appendChild(a);
-                const meta = document.createElement('span');
-                meta.style.marginLeft = "8px";
-                meta.style.fontSize = "0.95rem";
-                meta.style.color = "var(--muted)";
-                const mcount = article.match_count || 0;
-                const occ = article.occurrence_count || 0;
-                const wcount = article.word_match_count || 0;
-                let parts = [`${mcount} matches`];
-                if (occ > 0) parts.push(`${occ} occurrences`);
-                else if (wcount > 0) parts.push(`${wcount} words`);
-                meta.innerText = ` ${parts.join(' • ')}`;
-                header.appendChild(meta);
-                const openBtn = document.createElement('button');
-                openBtn.innerText = "Open article";
-                openBtn.style.marginLeft = "8px";
-                openBtn.onclick = () => window.open(article.link || "#", "_blank");
-                header.appendChild(openBtn);
-                li.appendChild(header);
-                if (Array.isArray(article.sections) && article.sections.length > 0) {
-                    const sub = document.createElement('ul');
-                    article.sections.forEach((sectionObj, idx) => {
-                        const subLi = document.createElement('li');
-                        const sectionBtn = document.createElement('button');
-                        sectionBtn.innerText = sectionObj.title || ("section " + (idx + 1));
-                        sectionBtn.style.marginRight = "8px";
-                        if (sectionObj.matched) {
-                            sectionBtn.style.backgroundColor = "#2a2";
-                            sectionBtn.style.color = "#000";
-                        }
-                        sectionBtn.onclick = () => showSection(article, sectionObj);
-                        subLi.appendChild(sectionBtn);
-                        sub.appendChild(subLi);
-                    });
-                    li.appendChild(sub);
-                } else if (Array.isArray(article.matches) && article.matches.length > 0) {
-                    const sub = document.createElement('ul');
-                    article.matches.forEach((m, idx) => {
-                        const subLi = document.createElement('li');
-                        const btn = document.createElement('button');
-                        btn.innerText = (m.title || ("section " + (idx+1)));
-                        btn.style.marginRight = "8px";
-                        btn.onclick = () => showSection(article, m);
-                        subLi.appendChild(btn);
-                        sub.appendChild(subLi);
-                    });
-                    li.appendChild(sub);
+            if (first) {
+                resultsEl.innerHTML = "";
+                if (items.length === 0) {
+                    resultsEl.innerText = "No results.";
+                    if (summaryEl) summaryEl.innerText = "Found 0 articles.";
+                    return;
                 }
-                list.appendChild(li);
-            });
-            resultsEl.appendChild(list);
+                const list = document.createElement('ul');
+                list.id = 'resultsList';
+                resultsEl.appendChild(list);
+            }
+            if (summaryEl) summaryEl.innerText = `Found ${cfg.total} articles — showing ${cfg.loaded}`;
+            const list = document.getElementById('resultsList');
+            items.forEach(article => list.appendChild(renderArticle(article)));
+
+            const oldMore = document.getElementById('loadMore');
+            if (oldMore) oldMore.remove();
+            if (cfg.loaded < cfg.total) {
+                const more = document.createElement('button');
+                more.id = 'loadMore';
+                more.innerText = `Load more (${cfg.total - cfg.loaded} remaining)`;
+                more.onclick = () => {
+                    more.disabled = true;
+                    more.innerText = "Loading...";
+                    loadSearchPage(cfg, false);
+                };
+                resultsEl.appendChild(more);
+            }
         })
         .catch(err => {
             const out = "Error during search: " + err.message;
-            document.getElementById('results').innerText = out;
+            if (first) document.getElementById('results').innerText = out;
             const summaryEl = document.getElementById('resultsSummary');
             if (summaryEl) summaryEl.innerText = out;
+            const more = document.getElementById('loadMore');
+            if (more) {
+                more.disabled = false;
+                more.innerText = "Retry loading more";
+            }
+        });
+}
+
+function renderArticle(article) {
+    const li = document.createElement('li');
+    const header = document.createElement('div');
+    const a = document.createElement('a');
+    a.href = article.link || "#";
+    a.innerText = article.name || (article.link || "Untitled");
+    a.target = "_blank";
+    a.style.fontWeight = "600";
+    header.appendChild(a);
+    const meta = document.createElement('span');
+    meta.style.marginLeft = "8px";
+    meta.style.fontSize = "0.95rem";
+    meta.style.color = "var(--muted)";
+    const mcount = article.match_count || 0;
+    const occ = article.occurrence_count || 0;
+    const wcount = article.word_match_count || 0;
+    let parts = [`${mcount} matches`];
+    if (occ > 0) parts.push(`${occ} occurrences`);
+    else if (wcount > 0) parts.push(`${wcount} words`);
+    meta.innerText = ` ${parts.join(' • ')}`;
+    header.appendChild(meta);
+    const openBtn = document.createElement('button');
+    openBtn.innerText = "Open article";
+    openBtn.style.marginLeft = "8px";
+    openBtn.onclick = () => window.open(article.link || "#", "_blank");
+    header.appendChild(openBtn);
+    li.appendChild(header);
+    const best = firstHighlight(article);
+    if (best) {
+        const snippet = document.createElement('div');
+        snippet.className = 'snippet';
+        snippet.style.fontSize = "0.95rem";
+        snippet.innerHTML = renderHighlights([best]);
+        li.appendChild(snippet);
+    }
+    if (Array.isArray(article.sections) && article.sections.length > 0) {
+        const sub = document.createElement('ul');
+        article.sections.forEach((sectionObj, idx) => {
+            const subLi = document.createElement('li');
+            const sectionBtn = document.createElement('button');
+            sectionBtn.innerText = sectionObj.title || ("section " + (idx + 1));
+            sectionBtn.style.marginRight = "8px";
+            if (sectionObj.matched) {
+                sectionBtn.style.backgroundColor = "#2a2";
+                sectionBtn.style.color = "#000";
+            }
+            sectionBtn.onclick = () => showSection(article, sectionObj);
+            subLi.appendChild(sectionBtn);
+            sub.appendChild(subLi);
         });
+        li.appendChild(sub);
+    } else if (Array.isArray(article.matches) && article.matches.length > 0) {
+        const sub = document.createElement('ul');
+        article.matches.forEach((m, idx) => {
+            const subLi = document.createElement('li');
+            const btn = document.createElement('button');
+            btn.innerText = (m.title || ("section " + (idx+1)));
+            btn.style.marginRight = "8px";
+            btn.onclick = () => showSection(article, m);
+            subLi.appendChild(btn);
+            sub.appendChild(subLi);
+        });
+        li.appendChild(sub);
+    }
+    return li;
+}
+
+// fetch (once) the full sections of an article; resolves to {title: content}
+function fetchArticleSections(article) {
+    if (!article || !article.id) return Promise.resolve(null);
+    if (!articleCache.has(article.id)) {
+        const pending = fetch('/article/' + encodeURIComponent(article.id))
+            .then(response => response.ok ? response.json() : null)
+            .then(data => {
+                const map = {};
+                ((data && data.sections) || []).forEach(s => { map[s.title] = s.content; });
+                return map;
+            })
+            .catch(() => {
+                articleCache.delete(article.id);
+                return null;
+            });
+        articleCache.set(article.id, pending);
+    }
+    return articleCache.get(article.id);
 }
 
 // helper: make a safe id from strings
@@ -148,6 +214,26 @@ function highlightText(raw, cfg) {
     }
 }
 
+// snippets from /search carry match offsets ("spans", relative to "text"); no re-matching needed
+function renderHighlights(highlights) {
+    return highlights.map(h => {
+        let html = h.start > 0 ? "… " : "";
+        let pos = 0;
+        (h.spans || []).forEach(([s, e]) => {
+            html += escapeHTML(h.text.slice(pos, s)) + `<mark class="hl">${escapeHTML(h.text.slice(s, e))}</mark>`;
+            pos = e;
+        });
+        return html + escapeHTML(h.text.slice(pos));
+    }).join("<br>");
+}
+function firstHighlight(article) {
+    const entries = (article.matches || []).concat(article.sections || []);
+    for (const entry of entries) {
+        if (Array.isArray(entry.highlights) && entry.highlights.length > 0) return entry.highlights[0];
+    }
+    return null;
+}
+
 function showSection(article, sec) {
     const panel = document.getElementById('detailPanel');
     panel.innerHTML = "";
@@ -171,10 +257,22 @@ function showSection(article, sec) {
 
     const content = document.createElement('div');
     content.className = 'section-content';
-    const rawText = (sec.content !== undefined && sec.content !== null && sec.content !== "") ? sec.content : (sec.excerpt || "");
     const cfg = window.__searchConfig || null;
-    content.innerHTML = highlightText(rawText, cfg);
+    const hasContent = sec.content !== undefined && sec.content !== null && sec.content !== "";
+    if (!hasContent && Array.isArray(sec.highlights) && sec.highlights.length > 0) {
+        content.innerHTML = renderHighlights(sec.highlights);
+    } else {
+        content.innerHTML = highlightText(hasContent ? sec.content : (sec.excerpt || ""), cfg);
+    }
     wrapper.appendChild(content);
+    if (!hasContent && sec.title && sec.type !== "title" && sec.type !== "link") {
+        // search results carry excerpts only; swap in the full section text once it arrives
+        fetchArticleSections(article).then(sections => {
+            if (sections && typeof sections[sec.title] === "string" && sections[sec.title] !== "") {
+                content.innerHTML = highlightText(sections[sec.title], cfg);
+            }
+        });
+    }
 
     const openBtn = document.createElement('button');
     openBtn.innerText = "Open full article";
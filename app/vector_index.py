@@ -0,0 +1,322 @@
+# Persistent Chroma vector index for /ask, keyed by the content hash of data.json and the
+# chunking settings (see chunking.py: one entry per section or paragraph group, not per article).
+#
+# Build it offline after every scrape (from the app directory):
+#     python vector_index.py
+# The app then only opens the persisted store; a question costs one query embedding plus a
+# nearest-neighbour lookup instead of re-embedding the whole corpus.
+
+import os
+import sys
+import shutil
+import asyncio
+import logging
+import argparse
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from corpus import DATA_PATH, CorpusSnapshot, load_snapshot
+from chunking import CHUNK_LEVELS, article_chunks, chunk_metadata, chunking_signature, corpus_chunks
+from mapped_index import MappedVectors, mapped_root, vectors_path, write_vectors
+from metrics import stage
+
+# langchain / Chroma / sentence-transformers are imported on first use, so processes that only
+# serve /search never load them
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
+    from langchain_community.docstore.document import Document
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+logger = logging.getLogger("nasaSpaceChallenge")
+
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+VECTOR_INDEX_DIR = os.environ.get("VECTOR_INDEX_DIR", os.path.join(os.path.dirname(DATA_PATH), "vector_index"))
+# Build the index inside the app when it is missing (slow, once per data.json version).
+VECTOR_AUTOBUILD = os.environ.get("VECTOR_AUTOBUILD", "1") not in ("0", "false", "False")
+COLLECTION_NAME = "articles"
+# Query embeddings arriving within this window are encoded in one batch
+EMBED_BATCH_WINDOW_MS = float(os.environ.get("EMBED_BATCH_WINDOW_MS", "5"))
+EMBED_BATCH_MAX = int(os.environ.get("EMBED_BATCH_MAX", "32"))
+# 1 = search the memory-mapped vectors written by `python mapped_index.py --vectors` when present
+VECTOR_MMAP = os.environ.get("VECTOR_MMAP", "1") not in ("0", "false", "False")
+
+_embeddings = None
+_embeddings_lock = threading.Lock()
+_stores: Dict[str, "Chroma"] = {}
+_stores_lock = threading.Lock()
+_mapped: Dict[str, MappedVectors] = {}
+
+
+class VectorIndexError(Exception):
+    """Raised when no vector index exists for the current corpus and autobuild is disabled."""
+
+
+def get_embeddings() -> "HuggingFaceEmbeddings":
+    """The process-wide embedding model (loaded on first use)."""
+    global _embeddings
+    if _embeddings is None:
+        with _embeddings_lock:
+            if _embeddings is None:
+                logger.info("Loading embedding model %s", EMBEDDING_MODEL)
+                with stage("embeddings_init"):
+                    from langchain_huggingface import HuggingFaceEmbeddings
+                    _embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    return _embeddings
+
+
+def index_path(digest: str, root: str = VECTOR_INDEX_DIR) -> str:
+    return os.path.join(root, f"{EMBEDDING_MODEL.replace('/', '_')}-{digest[:16]}-{chunking_signature()}")
+
+
+def build_index(corpus: CorpusSnapshot, root: str = VECTOR_INDEX_DIR) -> str:
+    """Embed ``corpus`` and persist it under ``root``. Returns the index directory.
+
+    The store is written to a temporary directory and renamed into place, so a reader never
+    opens a half-written index.
+    """
+    final = index_path(corpus.digest, root)
+    if os.path.isdir(final):
+        return final
+    os.makedirs(root, exist_ok=True)
+    tmp = f"{final}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    docs = corpus_chunks(corpus)
+    logger.info("Building vector index for %d articles (%d chunks) in %s", len(corpus), len(docs), final)
+    embeddings = get_embeddings()
+    from langchain_community.vectorstores import Chroma
+    with stage("index_build"):
+        db = Chroma.from_documents(docs, embeddings, collection_name=COLLECTION_NAME, persist_directory=tmp)
+    # the directory cannot be renamed while its SQLite files are open (Windows)
+    _close_store(db)
+    del db
+    try:
+        os.rename(tmp, final)
+    except OSError:
+        if not os.path.isdir(final):
+            # keep the embeddings: the directory can be renamed by hand once the lock is gone
+            logger.error("Could not publish vector index %s as %s", tmp, final)
+            raise
+        # another process published the same version first
+        shutil.rmtree(tmp, ignore_errors=True)
+    return final
+
+
+def _close_store(db: "Chroma") -> None:
+    """Release the Chroma client behind ``db`` and its file handles.
+
+    chromadb caches one client system per directory for the whole process; it is stopped and
+    dropped from the cache so nothing keeps the files open.
+    """
+    client = getattr(db, "_client", None)
+    if client is None:
+        return
+    try:
+        close = getattr(client, "close", None)
+        if callable(close):
+            close()
+        else:
+            system = getattr(client, "_system", None)
+            if system is not None:
+                system.stop()
+        from chromadb.api.client import SharedSystemClient
+        SharedSystemClient.clear_system_cache()
+    except Exception as e:
+        logger.warning("Could not close Chroma client: %s", e)
+
+
+def prune_indexes(keep: str, root: str = VECTOR_INDEX_DIR) -> None:
+    """Remove index directories other than ``keep``."""
+    if not os.path.isdir(root):
+        return
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if path != keep and os.path.isdir(path):
+            logger.info("Removing stale vector index %s", path)
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def vector_store(corpus: CorpusSnapshot) -> "Chroma":
+    """Open (once per process) the persisted store matching ``corpus``'s content hash."""
+    db = _stores.get(corpus.digest)
+    if db is not None:
+        return db
+    with _stores_lock:
+        db = _stores.get(corpus.digest)
+        if db is not None:
+            return db
+        path = index_path(corpus.digest)
+        if not os.path.isdir(path):
+            if not VECTOR_AUTOBUILD:
+                raise VectorIndexError(f"No vector index for this data.json at {path}; run: python vector_index.py")
+            logger.warning("Vector index missing for current data.json; building it now (run vector_index.py offline to avoid this)")
+            path = build_index(corpus)
+        embeddings = get_embeddings()
+        from langchain_community.vectorstores import Chroma
+        with stage("index_open"):
+            db = Chroma(collection_name=COLLECTION_NAME, embedding_function=embeddings, persist_directory=path)
+        # only the current corpus version stays open
+        _stores.clear()
+        _stores[corpus.digest] = db
+        return db
+
+
+def mapped_vectors_path(corpus: CorpusSnapshot) -> str:
+    return vectors_path(mapped_root(corpus.path), corpus.digest, EMBEDDING_MODEL, chunking_signature())
+
+
+def export_vectors(corpus: CorpusSnapshot) -> str:
+    """Copy ``corpus``'s chunk embeddings out of the Chroma index into a mapped vectors file."""
+    path = mapped_vectors_path(corpus)
+    if os.path.exists(path):
+        return path
+    data = vector_store(corpus).get(include=["embeddings", "metadatas", "documents"])
+    ids = []
+    for meta in data["metadatas"]:
+        # indexes built before chunks carried "doc" fall back to the (first-wins) article key
+        doc = meta["doc"] if "doc" in meta else corpus.by_key[meta["article"]]
+        section = corpus.articles[doc].titles.index(meta["section"])
+        ids.append((doc, meta["chunk"], section, CHUNK_LEVELS.index(meta["level"])))
+    write_vectors(path, ids, data["embeddings"], texts=data["documents"], digest=corpus.digest,
+                  model=EMBEDDING_MODEL)
+    return path
+
+
+def mapped_vectors(corpus: CorpusSnapshot) -> Optional[MappedVectors]:
+    """The mapped vectors for ``corpus`` if they have been exported, else None (use Chroma)."""
+    if not VECTOR_MMAP:
+        return None
+    mv = _mapped.get(corpus.digest)
+    if mv is not None:
+        return mv
+    path = mapped_vectors_path(corpus)
+    if not os.path.exists(path):
+        return None
+    try:
+        mv = MappedVectors(path)
+    except (ImportError, OSError, ValueError) as e:
+        logger.warning("Ignoring mapped vectors %s: %s", path, e)
+        return None
+    _mapped.clear()
+    _mapped[corpus.digest] = mv
+    return mv
+
+
+def _mapped_search(corpus: CorpusSnapshot, mv: MappedVectors, vector: List[float], k: int) -> List["Document"]:
+    if not mv.has_texts:
+        # exported before chunk texts were stored: chunk the hit's article again
+        return [article_chunks(corpus.articles[doc], doc=doc)[chunk] for doc, chunk, _ in mv.search(vector, k)]
+    from langchain_community.docstore.document import Document
+    docs = []
+    for row, _ in mv.top(vector, k):
+        doc, chunk, section, level = (int(x) for x in mv.ids[row])
+        art = corpus.articles[doc]
+        docs.append(Document(page_content=mv.text(row),
+                             metadata=chunk_metadata(art, art.titles[section], CHUNK_LEVELS[level], chunk, doc)))
+    return docs
+
+
+class EmbeddingBatcher:
+    """Micro-batches query embeddings from concurrent requests.
+
+    ``await embed(text)`` queues the text; the queue is encoded with one ``embed_documents`` call
+    (in a worker thread) after ``window`` seconds or as soon as ``max_batch`` texts are waiting.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, window: float = EMBED_BATCH_WINDOW_MS / 1000.0, max_batch: int = EMBED_BATCH_MAX):
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def embed(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((text, fut))
+        if len(self._pending) >= self.max_batch:
+            self._flush(loop)
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush, loop)
+        return await fut
+
+    def _flush(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            loop.create_task(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        try:
+            vectors = await asyncio.to_thread(get_embeddings().embed_documents, [t for t, _ in batch])
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), vec in zip(batch, vectors):
+            if not fut.done():
+                fut.set_result(vec)
+
+
+embedding_batcher = EmbeddingBatcher()
+
+
+def retrieve(corpus: CorpusSnapshot, query: str, k: int) -> List["Document"]:
+    """Top-``k`` chunks for ``query`` (blocking; for sync endpoints)."""
+    mv = mapped_vectors(corpus)
+    if mv is not None:
+        with stage("embed"):
+            vector = get_embeddings().embed_query(query)
+        with stage("vector_search"):
+            return _mapped_search(corpus, mv, vector, k)
+    db = vector_store(corpus)
+    with stage("vector_search"):
+        return db.similarity_search(query, k)
+
+
+async def aretrieve(corpus: CorpusSnapshot, query: str, k: int) -> List["Document"]:
+    """Top-``k`` chunks for ``query`` without blocking the event loop."""
+    mv = mapped_vectors(corpus)
+    db = None if mv is not None else await asyncio.to_thread(vector_store, corpus)
+    with stage("embed"):
+        vector = await embedding_batcher.embed(query)
+    with stage("vector_search"):
+        if mv is not None:
+            return await asyncio.to_thread(_mapped_search, corpus, mv, vector, k)
+        return await asyncio.to_thread(db.similarity_search_by_vector, vector, k)
+
+
+def retrieve_many(corpus: CorpusSnapshot, queries: List[str], k: int) -> List[List["Document"]]:
+    """Top-``k`` chunks for each of ``queries``; all queries are embedded in one batch (blocking)."""
+    if not queries:
+        return []
+    mv = mapped_vectors(corpus)
+    db = None if mv is not None else vector_store(corpus)
+    with stage("embed"):
+        vectors = get_embeddings().embed_documents(list(queries))
+    with stage("vector_search"):
+        if mv is not None:
+            return [_mapped_search(corpus, mv, vector, k) for vector in vectors]
+        return [db.similarity_search_by_vector(vector, k) for vector in vectors]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build the persisted vector index for /ask.")
+    parser.add_argument("--data", default=DATA_PATH, help="path to data.json")
+    parser.add_argument("--out", default=VECTOR_INDEX_DIR, help="index root directory")
+    parser.add_argument("--prune", action="store_true", help="delete indexes of older data.json versions")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    corpus = load_snapshot(args.data)
+    path = build_index(corpus, args.out)
+    logger.info("Vector index ready: %s", path)
+    if args.prune:
+        prune_indexes(path, args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
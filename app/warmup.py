@@ -0,0 +1,93 @@
+# Startup warm-up: named steps run once, in order, in a background thread (or blocking the
+# startup hook), with per-step status for the /health endpoint.
+#
+# WARMUP lists the steps to run (comma separated, "" for none); steps not listed report
+# "skipped" and are loaded lazily by the first request that needs them.
+
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List
+
+from metrics import stage
+
+logger = logging.getLogger("nasaSpaceChallenge")
+
+WARMUP = os.environ.get("WARMUP", "corpus,embeddings,vector_index,chunk_index,reranker,ollama_model")
+# 1 = the startup hook waits for warm-up before the server accepts requests
+WARMUP_BLOCKING = os.environ.get("WARMUP_BLOCKING", "0") not in ("0", "false", "False")
+
+PENDING, RUNNING, READY, FAILED, SKIPPED = "pending", "running", "ready", "failed", "skipped"
+
+
+class Warmup:
+    """Ordered warm-up steps and their outcome.
+
+    A failed step is logged and recorded, and the following steps still run; the app keeps
+    serving and retries the work lazily on the request path.
+    """
+
+    def __init__(self, enabled: str = WARMUP):
+        self.enabled = [s.strip() for s in enabled.split(",") if s.strip()]
+        self._steps: Dict[str, Callable[[], Any]] = {}
+        self._status: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.finished_at = None
+
+    def step(self, name: str) -> Callable[[Callable[[], Any]], Callable[[], Any]]:
+        """Decorator registering ``fn`` as warm-up step ``name`` (run in registration order)."""
+        def register(fn: Callable[[], Any]) -> Callable[[], Any]:
+            self._steps[name] = fn
+            self._status[name] = {"status": PENDING if name in self.enabled else SKIPPED}
+            return fn
+        return register
+
+    def _set(self, name: str, **fields: Any) -> None:
+        with self._lock:
+            self._status[name] = fields
+
+    def run(self) -> None:
+        unknown = [s for s in self.enabled if s not in self._steps]
+        if unknown:
+            logger.warning("Unknown warm-up step(s) ignored: %s", ", ".join(unknown))
+        for name, fn in self._steps.items():
+            if name not in self.enabled:
+                continue
+            self._set(name, status=RUNNING)
+            started = time.perf_counter()
+            try:
+                with stage(f"warmup_{name}"):
+                    detail = fn()
+            except Exception as e:
+                logger.warning("Warm-up step %s failed: %s", name, e)
+                self._set(name, status=FAILED, error=str(e), seconds=round(time.perf_counter() - started, 3))
+                continue
+            seconds = round(time.perf_counter() - started, 3)
+            if detail is False:
+                self._set(name, status=SKIPPED, seconds=seconds)
+            else:
+                logger.info("Warm-up step %s ready in %.2fs", name, seconds)
+                self._set(name, status=READY, seconds=seconds, **({"detail": detail} if detail else {}))
+        self.finished_at = time.time()
+
+    def start(self) -> None:
+        if WARMUP_BLOCKING:
+            self.run()
+        else:
+            threading.Thread(target=self.run, name="warmup", daemon=True).start()
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            steps = {name: dict(s) for name, s in self._status.items()}
+        failed: List[str] = [n for n, s in steps.items() if s["status"] == FAILED]
+        if not self.done:
+            overall = "warming"
+        else:
+            overall = "degraded" if failed else "ready"
+        return {"status": overall, "uptime": round(time.time() - self.started_at, 1), "steps": steps}
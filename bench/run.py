@@ -0,0 +1,407 @@
+# Offline benchmark and load-test harness for /search, /ask and the scraper's parser.
+#
+#     python bench/run.py                                 # search + scrape at 600 and 10k articles
+#     python bench/run.py --suite search --sizes 600,10000,100000
+#     python bench/run.py --suite ask --sizes 600         # needs the embedding model in the HF cache
+#     python bench/run.py --save-baseline                 # store this run as bench/baseline.json
+#
+# The app runs under uvicorn in a subprocess against generated corpora (bench/.data); /ask talks
+# to stub_ollama.py instead of a model. Each scenario reports p50/p95/p99 latency, throughput and
+# peak RSS; with a stored baseline, p95 / throughput / RSS changes beyond --tolerance are flagged
+# and the exit status is 1.
+#
+# The regression check is manual: timings only compare on the same machine, so no baseline is
+# committed (bench/baseline.json is git-ignored). Save one on your machine before a change and
+# rerun after it; --require-baseline exits 2 instead of 0 when there is none to compare with.
+
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+import platform
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+import synth
+import stub_ollama
+
+BENCH_DIR = os.path.abspath(os.path.dirname(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+APP_DIR = os.path.join(REPO_ROOT, "app")
+SCRAPER_DIR = os.path.join(REPO_ROOT, "Space challenge")
+DATA_DIR = os.path.join(BENCH_DIR, ".data")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+
+# metric -> True when larger is worse
+COMPARED_METRICS = {"p95_ms": True, "throughput_rps": False, "peak_rss_mb": True}
+
+logger = logging.getLogger("bench")
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(latencies: List[float], elapsed: float, errors: int) -> Dict[str, Any]:
+    ms = sorted(x * 1000.0 for x in latencies)
+    return {
+        "count": len(ms),
+        "errors": errors,
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "mean_ms": round(sum(ms) / len(ms), 3) if ms else 0.0,
+        "throughput_rps": round(len(ms) / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+
+
+def peak_rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """High-water RSS of ``pid`` (default: this process) from /proc, or getrusage for ourselves."""
+    try:
+        with open(f"/proc/{pid or 'self'}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024.0, 1)
+    except OSError:
+        pass
+    if pid is None:
+        try:
+            import resource
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # kilobytes on Linux, bytes on macOS
+            return round(rss / (1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0), 1)
+        except ImportError:
+            pass
+    return None
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class AppServer:
+    """The FastAPI app under uvicorn in a subprocess, started with ``env`` on a free port."""
+
+    def __init__(self, env: Dict[str, str], log_path: str, startup_timeout: float = 600.0):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.env = dict(os.environ, **env)
+        self.log_path = log_path
+        self.startup_timeout = startup_timeout
+        self.proc: Optional[subprocess.Popen] = None
+        self.startup_s = 0.0
+
+    def __enter__(self) -> "AppServer":
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        self._log = open(self.log_path, "w")
+        t0 = time.perf_counter()
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(self.port),
+             "--log-level", "warning"],
+            cwd=APP_DIR, env=self.env, stdout=self._log, stderr=subprocess.STDOUT)
+        deadline = t0 + self.startup_timeout
+        while time.perf_counter() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"app exited with code {self.proc.returncode}; see {self.log_path}")
+            try:
+                # 200 once the warm-up steps selected by WARMUP have run
+                if httpx.get(self.url + "/health", timeout=1.0).status_code == 200:
+                    self.startup_s = time.perf_counter() - t0
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise RuntimeError(f"app did not start within {self.startup_timeout}s; see {self.log_path}")
+
+    def peak_rss_mb(self) -> Optional[float]:
+        return peak_rss_mb(self.proc.pid) if self.proc else None
+
+    def __exit__(self, *exc) -> None:
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        self._log.close()
+
+
+def drive(url: str, path: str, params: List[Dict[str, str]], concurrency: int,
+          timeout: float = 120.0, until: Optional[str] = None) -> Dict[str, Any]:
+    """Send GET ``path`` once per params dict from ``concurrency`` threads and summarize.
+
+    With ``until`` the response is streamed and the latency is the time to the first line
+    containing that text (e.g. the first "token" event of /ask/stream).
+    """
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(p: Dict[str, str]) -> None:
+        nonlocal errors
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = httpx.Client(base_url=url, timeout=timeout)
+        t0 = time.perf_counter()
+        try:
+            if until:
+                with client.stream("GET", path, params=p) as resp:
+                    ok = False
+                    dt = 0.0
+                    for line in resp.iter_lines():
+                        if not ok and until in line:
+                            ok, dt = resp.status_code == 200, time.perf_counter() - t0
+            else:
+                resp = client.get(path, params=p)
+                ok = resp.status_code == 200
+                dt = time.perf_counter() - t0
+        except httpx.HTTPError:
+            ok, dt = False, time.perf_counter() - t0
+        with lock:
+            if ok:
+                latencies.append(dt)
+            else:
+                errors += 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, params))
+    return summarize(latencies, time.perf_counter() - t0, errors)
+
+
+def app_env(corpus: str, cache: bool, warmup: str, **extra: str) -> Dict[str, str]:
+    env = {
+        "DATA_PATH": corpus,
+        "WARMUP": warmup,
+        "OLLAMA_AUTOSTART": "0",
+        "VECTOR_AUTOBUILD": "0",
+        "PYTHONUNBUFFERED": "1",
+    }
+    if not cache:
+        env.update(SEARCH_CACHE_SIZE="0", ASK_CACHE_SIZE="0")
+    env.update(extra)
+    return env
+
+
+def bench_search(size: int, args) -> Dict[str, Dict[str, Any]]:
+    corpus = synth.write_corpus(synth.corpus_path(DATA_DIR, size, args.seed, args.section_chars),
+                                size, args.seed, args.section_chars)
+    mix = synth.query_mix(corpus, args.requests, args.seed + 1)
+    out = {}
+    with AppServer(app_env(corpus, args.cache, "corpus"), os.path.join(RESULTS_DIR, f"app-search-{size}.log")) as app:
+        drive(app.url, "/search", [p for _, p in mix[:30]], args.concurrency)  # warm-up
+        for kind in ("word", "phrase", "exact"):
+            params = [dict(p, limit="20") for k, p in mix if k == kind]
+            stats = drive(app.url, "/search", params, args.concurrency)
+            stats["peak_rss_mb"] = app.peak_rss_mb()
+            stats["startup_s"] = round(app.startup_s, 2)
+            out[f"search/{size}/{kind}"] = stats
+    return out
+
+
+def build_vector_index(corpus: str, out_dir: str) -> Optional[str]:
+    """Build the /ask index for ``corpus`` offline; returns an error message on failure."""
+    env = dict(os.environ, HF_HUB_OFFLINE="1", TRANSFORMERS_OFFLINE="1")
+    proc = subprocess.run([sys.executable, "vector_index.py", "--data", corpus, "--out", out_dir],
+                          cwd=APP_DIR, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return (proc.stderr.strip().splitlines() or ["vector_index.py failed"])[-1]
+    return None
+
+
+def bench_ask(size: int, args) -> Dict[str, Dict[str, Any]]:
+    corpus = synth.write_corpus(synth.corpus_path(DATA_DIR, size, args.seed, args.section_chars),
+                                size, args.seed, args.section_chars)
+    index_dir = os.path.join(DATA_DIR, "vector_index")
+    error = build_vector_index(corpus, index_dir)
+    if error:
+        logger.warning("ask/%d skipped: cannot build the vector index offline (%s)", size, error)
+        return {f"ask/{size}": {"skipped": error}}
+
+    stub = stub_ollama.start(first_token_ms=args.stub_first_token_ms, token_ms=args.stub_token_ms)
+    questions = [{"query": f"{p['query']} effect {i}"} for i, (k, p) in
+                 enumerate(synth.query_mix(corpus, args.ask_requests, args.seed + 2)) if k == "phrase"]
+    env = app_env(corpus, args.cache, "corpus,embeddings,vector_index,chunk_index,ollama_model", OLLAMA_HOST="127.0.0.1", OLLAMA_PORT=str(stub.server_port),
+                  VECTOR_INDEX_DIR=index_dir, HF_HUB_OFFLINE="1", TRANSFORMERS_OFFLINE="1")
+    out = {}
+    try:
+        with AppServer(env, os.path.join(RESULTS_DIR, f"app-ask-{size}.log")) as app:
+            drive(app.url, "/ask", questions[:2], 1)  # warm-up
+            for name, path, until in (("answer", "/ask", None), ("stream_first_token", "/ask/stream", '"token"')):
+                stats = drive(app.url, path, questions, args.concurrency, until=until)
+                stats["peak_rss_mb"] = app.peak_rss_mb()
+                out[f"ask/{size}/{name}"] = stats
+    finally:
+        stub.shutdown()
+    return out
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, fmt, *args):
+        pass
+
+
+def bench_scrape(args) -> Dict[str, Dict[str, Any]]:
+    fixtures_dir = os.path.join(DATA_DIR, "html")
+    names = synth.write_fixtures(fixtures_dir, args.fixtures, args.seed + 3)
+    sys.path.insert(0, SCRAPER_DIR)
+    import parseris
+    logging.getLogger().setLevel(logging.WARNING)
+
+    pages: List[Tuple[str, str]] = []
+    for name in names:
+        with open(os.path.join(fixtures_dir, name), "r", encoding="utf-8") as f:
+            pages.append((name, f.read()))
+
+    out = {}
+    default_parser = parseris.HTML_PARSER
+    for parser in dict.fromkeys((default_parser, "html.parser") + (("lxml",) if hasattr(parseris, "etree") else ())):
+        parseris.HTML_PARSER = parser
+        latencies = []
+        t0 = time.perf_counter()
+        for name, html in pages:
+            t = time.perf_counter()
+            parseris.extract_sections(name, name, html, progress=False)
+            latencies.append(time.perf_counter() - t)
+        stats = summarize(latencies, time.perf_counter() - t0, 0)
+        stats["peak_rss_mb"] = peak_rss_mb()
+        out[f"scrape/extract/{parser}"] = stats
+    parseris.HTML_PARSER = default_parser
+
+    # parsing() end to end: fetch from a local server, then extract
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_QuietHandler, directory=fixtures_dir))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        base = f"http://127.0.0.1:{server.server_port}/"
+        latencies = []
+        errors = 0
+        t0 = time.perf_counter()
+        for name, _ in pages:
+            t = time.perf_counter()
+            rec = parseris.parsing(name, base + name)
+            latencies.append(time.perf_counter() - t)
+            errors += bool(rec.get("error"))
+        stats = summarize(latencies, time.perf_counter() - t0, errors)
+        stats["peak_rss_mb"] = peak_rss_mb()
+        out["scrape/parsing"] = stats
+    finally:
+        server.shutdown()
+    return out
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            tolerance: float) -> List[str]:
+    regressions = []
+    for scenario, stats in results.items():
+        base = baseline.get(scenario)
+        if not base:
+            continue
+        for metric, larger_is_worse in COMPARED_METRICS.items():
+            new, old = stats.get(metric), base.get(metric)
+            if not new or not old:
+                continue
+            change = (new - old) / old
+            if (change > tolerance) if larger_is_worse else (change < -tolerance):
+                regressions.append(f"{scenario} {metric}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def print_table(results: Dict[str, Dict[str, Any]]) -> None:
+    cols = ("count", "errors", "p50_ms", "p95_ms", "p99_ms", "throughput_rps", "peak_rss_mb")
+    print(f"{'scenario':<28}" + "".join(f"{c:>15}" for c in cols))
+    for scenario, stats in results.items():
+        if "skipped" in stats:
+            print(f"{scenario:<28}  skipped: {stats['skipped']}")
+            continue
+        print(f"{scenario:<28}" + "".join(f"{'' if stats.get(c) is None else stats.get(c):>15}" for c in cols))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark /search, /ask and the scraper offline.")
+    parser.add_argument("--suite", default="search,scrape", help="comma separated: search, ask, scrape")
+    parser.add_argument("--sizes", default="600,10000", help="corpus sizes in articles (e.g. 600,10000,100000)")
+    parser.add_argument("--requests", type=int, default=200, help="/search requests per query kind")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent client connections")
+    parser.add_argument("--ask-requests", type=int, default=30, help="/ask questions per run")
+    parser.add_argument("--ask-max-articles", type=int, default=10000,
+                        help="skip /ask for larger corpora (embedding them takes long)")
+    parser.add_argument("--stub-first-token-ms", type=float, default=200.0)
+    parser.add_argument("--stub-token-ms", type=float, default=20.0)
+    parser.add_argument("--fixtures", type=int, default=50, help="HTML pages for the scraper benchmark")
+    parser.add_argument("--section-chars", type=int, default=700, help="characters per synthetic section")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", action="store_true", help="keep the /search and /ask result caches on")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--require-baseline", action="store_true",
+                        help="exit with status 2 when there is no baseline to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative change before flagging")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    suites = {s.strip() for s in args.suite.split(",") if s.strip()}
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for size in sizes:
+        if "search" in suites:
+            logger.info("search: %d articles", size)
+            results.update(bench_search(size, args))
+        if "ask" in suites and size <= args.ask_max_articles:
+            logger.info("ask: %d articles", size)
+            results.update(bench_ask(size, args))
+    if "scrape" in suites:
+        logger.info("scrape: %d fixtures", args.fixtures)
+        results.update(bench_scrape(args))
+
+    print_table(results)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    report = {"when": stamp, "python": platform.python_version(), "machine": platform.machine(),
+              "args": vars(args), "results": results}
+    with open(os.path.join(RESULTS_DIR, f"bench-{stamp}.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        logger.info("Baseline saved to %s", args.baseline)
+        return 0
+    if not os.path.exists(args.baseline):
+        if args.require_baseline:
+            logger.error("No baseline at %s; run with --save-baseline first", args.baseline)
+            return 2
+        logger.info("No baseline at %s, regression check skipped; run with --save-baseline to store one",
+                    args.baseline)
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    for r in regressions:
+        logger.warning("REGRESSION %s", r)
+    if not regressions:
+        logger.info("No regressions against %s (tolerance %.0f%%)", args.baseline, args.tolerance * 100)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+# Minimal stand-in for the Ollama HTTP API, so /ask can be load tested without a model.
+#
+# Serves /api/version, /api/tags and /api/generate (streamed or not). Every answer is the same
+# canned text emitted as TOKENS chunks, with a fixed delay before the first token and between
+# tokens to imitate generation speed.
+#
+#     python stub_ollama.py --port 11500 --first-token-ms 200 --token-ms 20
+
+import json
+import time
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = ("The provided context indicates that microgravity exposure is associated with bone loss "
+          "and muscle atrophy in rodent models (Source: stub). Further data would be required to "
+          "quantify the effect size.")
+
+
+class StubOllama(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, first_token_ms: float = 200.0, token_ms: float = 20.0, tokens: int = 40):
+        super().__init__(addr, _Handler)
+        self.first_token = first_token_ms / 1000.0
+        self.token_delay = token_ms / 1000.0
+        words = ANSWER.split(" ")
+        step = max(1, len(words) // max(1, tokens))
+        self.chunks = [" ".join(words[i:i + step]) + " " for i in range(0, len(words), step)]
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def count(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _json(self, obj, status=200):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.startswith("/api/version"):
+            self._json({"version": "0.0.0-stub"})
+        elif self.path.startswith("/api/tags"):
+            self._json({"models": [{"name": "llama3:latest", "model": "llama3:latest", "size": 0}]})
+        else:
+            self._json({"error": "not found"}, 404)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            req = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            req = {}
+        if not self.path.startswith("/api/generate"):
+            self._json({"error": "not found"}, 404)
+            return
+        server: StubOllama = self.server
+        server.count()
+        model = req.get("model", "llama3")
+        started = time.perf_counter()
+        time.sleep(server.first_token)
+        if not req.get("stream", True):
+            time.sleep(server.token_delay * (len(server.chunks) - 1))
+            self._json(self._event(model, "".join(server.chunks), True, started))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, text in enumerate(server.chunks):
+            if i:
+                time.sleep(server.token_delay)
+            self._chunk(self._event(model, text, False, started))
+        self._chunk(self._event(model, "", True, started))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, obj):
+        data = (json.dumps(obj) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    @staticmethod
+    def _event(model, text, done, started):
+        event = {"model": model, "created_at": datetime.now(timezone.utc).isoformat(),
+                 "response": text, "done": done}
+        if done:
+            event.update(done_reason="stop", context=[], total_duration=int((time.perf_counter() - started) * 1e9),
+                         load_duration=0, prompt_eval_count=1, prompt_eval_duration=0,
+                         eval_count=1, eval_duration=0)
+        return event
+
+
+def start(port: int = 0, host: str = "127.0.0.1", **timing) -> StubOllama:
+    """Start the stub in a background thread; ``server.server_port`` is the bound port."""
+    server = StubOllama((host, port), **timing)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Stub Ollama server for benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--first-token-ms", type=float, default=200.0)
+    parser.add_argument("--token-ms", type=float, default=20.0)
+    parser.add_argument("--tokens", type=int, default=40)
+    args = parser.parse_args(argv)
+    server = StubOllama((args.host, args.port), args.first_token_ms, args.token_ms, args.tokens)
+    print(f"stub Ollama on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
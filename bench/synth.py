@@ -0,0 +1,150 @@
+# Deterministic synthetic inputs for the benchmarks: data.json corpora in the scraper's format,
+# PMC-like article pages for the parser, and /search query mixes drawn from a corpus.
+
+import os
+import json
+import random
+from typing import Dict, List, Tuple
+
+SECTION_NAMES = ["Abstract", "Introduction", "Methods", "Results", "Discussion", "References"]
+DOMAIN_WORDS = [
+    "microgravity", "spaceflight", "radiation", "cosmic", "rays", "bone", "loss", "muscle", "atrophy",
+    "osteoclast", "mice", "drosophila", "arabidopsis", "yeast", "plant", "cell", "cells", "stem",
+    "immune", "response", "gene", "expression", "iss", "orbit", "astronaut", "hindlimb", "unloading",
+    "transcriptome", "oxidative", "stress", "mitochondrial", "calcium", "signaling", "root", "growth",
+]
+
+
+class Vocabulary:
+    """Domain words plus generated filler words, sampled with a Zipf-like skew like real text."""
+
+    def __init__(self, rng: random.Random, size: int = 5000):
+        syllables = ["ka", "lo", "mi", "ne", "ro", "ta", "vi", "su", "de", "pa", "ge", "fo", "ri", "zu"]
+        filler = set()
+        while len(filler) < size:
+            filler.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+        self.words = DOMAIN_WORDS + sorted(filler)
+        weights = [1.0 / (rank + 1) for rank in range(len(self.words))]
+        total = sum(weights)
+        self.cum = []
+        acc = 0.0
+        for w in weights:
+            acc += w / total
+            self.cum.append(acc)
+
+    def sample(self, rng: random.Random, n: int) -> List[str]:
+        return rng.choices(self.words, cum_weights=self.cum, k=n)
+
+
+def _sentence(rng: random.Random, vocab: Vocabulary) -> str:
+    words = vocab.sample(rng, rng.randint(8, 24))
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraph(rng: random.Random, vocab: Vocabulary, chars: int) -> str:
+    out = []
+    size = 0
+    while size < chars:
+        s = _sentence(rng, vocab)
+        out.append(s)
+        size += len(s) + 1
+    return " ".join(out)
+
+
+def make_article(rng: random.Random, vocab: Vocabulary, i: int, section_chars: int) -> Dict:
+    name = " ".join(vocab.sample(rng, rng.randint(5, 12))).capitalize()
+    sections = {}
+    for sec in SECTION_NAMES:
+        paras = [_paragraph(rng, vocab, section_chars // 3) for _ in range(3)]
+        sections[sec] = "\n".join(paras) + "\n"
+    return {
+        "name": name,
+        "link": f"https://www.ncbi.nlm.nih.gov/pmc/articles/PMC{1000000 + i}/",
+        "sectionNames": list(SECTION_NAMES),
+        "sections": sections,
+    }
+
+
+def corpus_path(root: str, articles: int, seed: int, section_chars: int) -> str:
+    return os.path.join(root, f"data-{articles}-s{seed}-c{section_chars}.json")
+
+
+def write_corpus(path: str, articles: int, seed: int = 0, section_chars: int = 700) -> str:
+    """Write a data.json with ``articles`` records (streamed; skipped when it already exists)."""
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    rng = random.Random(seed)
+    vocab = Vocabulary(rng)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("[")
+        for i in range(articles):
+            if i:
+                f.write(",\n")
+            json.dump(make_article(rng, vocab, i, section_chars), f, ensure_ascii=False)
+        f.write("]\n")
+    os.replace(tmp, path)
+    return path
+
+
+def query_mix(path: str, count: int, seed: int = 1) -> List[Tuple[str, Dict[str, str]]]:
+    """``count`` (kind, /search params) pairs per kind: "word" (1-2 words), "phrase" (3
+    consecutive words of some article body) and "exact" (the same phrases with exact=true)."""
+    rng = random.Random(seed)
+    sample = []
+    with open(path, "r", encoding="utf-8") as f:
+        # write_corpus puts one record per line; read the first ones without loading the file
+        for line in f:
+            line = line.strip().lstrip("[").rstrip("]").rstrip(",")
+            if line:
+                sample.append(json.loads(line))
+            if len(sample) >= 2000:
+                break
+    words = sorted({w for a in sample[:200] for w in a["name"].lower().split()} | set(DOMAIN_WORDS))
+    phrases = []
+    while len(phrases) < count:
+        art = rng.choice(sample)
+        body = art["sections"][rng.choice(art["sectionNames"])].replace(".", "").lower().split()
+        if len(body) > 3:
+            start = rng.randrange(len(body) - 3)
+            phrases.append(" ".join(body[start:start + 3]))
+    mix = []
+    for i in range(count):
+        mix.append(("word", {"query": " ".join(rng.sample(words, rng.randint(1, 2)))}))
+        mix.append(("phrase", {"query": phrases[i]}))
+        mix.append(("exact", {"query": phrases[i], "exact": "true"}))
+    return mix
+
+
+def article_html(record: Dict) -> str:
+    """A PMC-like page holding ``record``: the markup extract_sections reads, plus page chrome."""
+    parts = ["<!DOCTYPE html><html><head><meta charset='utf-8'><title>", record["name"], "</title>",
+             "<script>var x = 1;</script><style>p{margin:0}</style></head><body>",
+             "<header><nav>" + "<a href='#'>link</a>" * 40 + "</nav></header>",
+             "<main><article><section class='main-article-body'>"]
+    for sec in record["sectionNames"]:
+        parts.append(f"<section id='{sec.lower()}'><h2 class='pmc_sec_title'>{sec}</h2>")
+        for para in record["sections"][sec].split("\n"):
+            if para:
+                parts.append(f"<p>{para[:40]}<em>{para[40:60]}</em>{para[60:]}<sup>[1]</sup></p>")
+        parts.append("</section>")
+    parts.append("</section></article></main><footer>" + "<div>footer</div>" * 50 + "</footer></body></html>")
+    return "".join(parts)
+
+
+def write_fixtures(root: str, count: int, seed: int = 2, section_chars: int = 4000) -> List[str]:
+    """``count`` article pages under ``root`` (kept across runs); returns their file names."""
+    os.makedirs(root, exist_ok=True)
+    rng = random.Random(seed)
+    vocab = Vocabulary(rng)
+    names = []
+    for i in range(count):
+        name = f"PMC{2000000 + i}.html"
+        path = os.path.join(root, name)
+        record = make_article(rng, vocab, i, section_chars)
+        if not os.path.exists(path):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(article_html(record))
+        names.append(name)
+    return names
@@ -0,0 +1,11 @@
+# The app and the scraper are plain script directories, imported the way they run:
+# ``cd app && python ...`` / ``cd "Space challenge" && python ...``.
+
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+for _dir in ("Space challenge", "app"):
+    sys.path.insert(0, os.path.join(ROOT, _dir))
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
@@ -0,0 +1,164 @@
+import json
+import random
+
+from dedup import MIN_WORDS, Deduplicator, content_hash, signature, similarity, words
+from record_writer import RecordWriter, iter_records
+
+_rng = random.Random(7)
+_VOCAB = [f"w{i}" for i in range(5000)]
+TEXT = [" ".join(_rng.choice(_VOCAB) for _ in range(800)) for _ in range(3)]
+
+
+def record(pmc, text, name=None, **extra):
+    return dict({"name": name or f"T{pmc}", "link": f"https://example.org/PMC{pmc}/",
+                 "sectionNames": ["Body"], "sections": {"Body": text}}, **extra)
+
+
+def edited(text, every):
+    w = text.split()
+    for i in range(0, len(w), every):
+        w[i] = f"changed{i}"
+    return " ".join(w)
+
+
+def test_words_ignore_case_punctuation_and_title():
+    rec = record(1, "Bone, LOSS!", name="Completely different title")
+    assert words(rec) == ["bone", "loss"]
+    assert content_hash(words(rec)) == content_hash(["bone", "loss"])
+
+
+def test_similarity_estimates_jaccard():
+    a = signature(TEXT[0].split())
+    assert similarity(a, a) == 1.0
+    assert similarity(a, signature(TEXT[1].split())) < 0.1
+    # every 2nd word changed leaves almost no 5-word shingle intact
+    assert similarity(a, signature(edited(TEXT[0], 2).split())) < 0.2
+
+
+def test_same_pmc_id_is_an_alias():
+    dedup = Deduplicator()
+    assert dedup.add(record(1, TEXT[0])) is None
+    assert dedup.add(dict(record(1, TEXT[1]), link="https://other.org/pmc1")) == (0, "pmcid", 1.0)
+
+
+def test_same_normalized_text_is_an_alias():
+    dedup = Deduplicator()
+    dedup.add(record(1, TEXT[0]))
+    dedup.add(record(2, TEXT[1]))
+    assert dedup.add(record(3, TEXT[1].upper() + " !")) == (1, "content_hash", 1.0)
+
+
+def test_near_duplicate_above_threshold():
+    dedup = Deduplicator(threshold=0.85)
+    dedup.add(record(1, TEXT[0]))
+    canonical, reason, score = dedup.add(record(2, edited(TEXT[0], 400)))
+    assert (canonical, reason) == (0, "near_duplicate")
+    assert score >= 0.85
+
+
+def test_threshold_decides_near_duplicates():
+    near = edited(TEXT[0], 400)
+    strict = Deduplicator(threshold=1.01)
+    strict.add(record(1, TEXT[0]))
+    assert strict.add(record(2, near)) is None
+    loose = Deduplicator(threshold=0.85)
+    loose.add(record(1, TEXT[0]))
+    assert loose.add(record(2, edited(TEXT[0], 2))) is None
+
+
+def test_short_texts_are_not_compared_by_minhash():
+    short = " ".join(TEXT[0].split()[:MIN_WORDS - 1])
+    dedup = Deduplicator(threshold=0.0)
+    dedup.add(record(1, short))
+    assert dedup.add(record(2, short + " extra")) is None
+
+
+def test_error_and_empty_records_are_kept():
+    dedup = Deduplicator()
+    assert dedup.add(record(1, "", error="timeout")) is None
+    assert dedup.add(record(2, "")) is None
+    assert dedup.add(record(3, "")) is None
+    assert dedup.replaced == {}
+
+
+def test_good_record_replaces_error_record_of_the_same_id():
+    dedup = Deduplicator()
+    assert dedup.add(record(1, "", error="timeout")) is None
+    assert dedup.add(record(1, "", name="Other title", error="timeout")) == (0, "pmcid", 1.0)
+    assert dedup.add(record(1, TEXT[0])) is None
+    assert dedup.replaced == {2: 0}
+    assert dedup.add(record(1, "", error="timeout")) == (2, "pmcid", 1.0)
+
+
+def test_aliases_point_at_canonical_records():
+    dedup = Deduplicator()
+    dedup.add(record(1, TEXT[0]))
+    dedup.add(record(2, TEXT[0]))
+    # the third copy matches record 0, never the alias at number 1
+    assert dedup.add(record(3, TEXT[0]))[0] == 0
+
+
+def test_writer_publishes_canonical_records_and_alias_table(tmp_path):
+    path = str(tmp_path / "data.jsonl")
+    recs = [record(1, TEXT[0]), record(2, TEXT[1]), record(3, TEXT[0], name="Copy"), record(1, TEXT[2], name="Again")]
+    recs[3]["link"] = "https://other.org/PMC1"
+    writer = RecordWriter(path)
+    for rec in reversed(recs):
+        writer.write(rec)
+    writer.commit({r["link"]: i for i, r in enumerate(recs)}, dedup=Deduplicator())
+
+    kept = list(iter_records(path))
+    assert [r["name"] for r in kept] == ["T1", "T2"]
+    assert {a["id"]: a["reason"] for a in kept[0]["aliases"]} == {"PMC3": "content_hash", "PMC1": "pmcid"}
+    with open(str(tmp_path / "data.aliases.json"), "r", encoding="utf-8") as f:
+        table = json.load(f)
+    assert set(table["aliases"]) == {"PMC3"}
+    assert table["aliases"]["PMC3"]["canonical"] == "PMC1"
+    with open(str(tmp_path / "data.idx"), "r", encoding="utf-8") as f:
+        index = json.load(f)
+    assert [key for key, _, _ in index["records"]] == ["PMC1", "PMC2"]
+    assert index["data_size"] == table["data_size"] == (tmp_path / "data.jsonl").stat().st_size
+
+
+def test_writer_without_dedup_keeps_everything(tmp_path):
+    path = str(tmp_path / "data.jsonl")
+    (tmp_path / "data.aliases.json").write_text("{}")
+    writer = RecordWriter(path)
+    writer.write(record(1, TEXT[0]))
+    writer.write(record(2, TEXT[0]))
+    writer.commit()
+    assert len(list(iter_records(path))) == 2
+    assert not (tmp_path / "data.aliases.json").exists()
+
+
+def test_writer_drops_error_record_replaced_by_a_good_one(tmp_path):
+    path = str(tmp_path / "data.jsonl")
+    failed = dict(record(1, "", name="First title", error="timeout"), link="https://other.org/PMC1")
+    good = record(1, TEXT[0])
+    writer = RecordWriter(path)
+    writer.write(failed)
+    writer.write(good)
+    writer.commit({failed["link"]: 0, good["link"]: 1}, dedup=Deduplicator())
+
+    kept = list(iter_records(path))
+    assert len(kept) == 1 and "error" not in kept[0]
+    assert kept[0]["aliases"] == [{"name": "First title", "link": failed["link"], "reason": "pmcid", "id": "PMC1"}]
+
+
+def test_titles_sharing_a_link_are_folded_into_the_first(tmp_path):
+    path = str(tmp_path / "data.jsonl")
+    first = record(1, TEXT[0], name="Title A")
+    writer = RecordWriter(path)
+    writer.write(record(2, TEXT[1]))
+    writer.write(first)
+    writer.write(dict(first, name="Title B"))
+    writer.write(dict(first, name="Title A"))
+    writer.commit({first["link"]: 0, record(2, "")["link"]: 1}, dedup=Deduplicator())
+
+    kept = list(iter_records(path))
+    assert [r["name"] for r in kept] == ["Title A", "T2"]
+    assert [a["name"] for a in kept[0]["aliases"]] == ["Title B", "Title A"]
+    with open(str(tmp_path / "data.aliases.json"), "r", encoding="utf-8") as f:
+        table = json.load(f)
+    assert table["aliases"] == {}
+    assert table["titles"] == {"PMC1": ["Title B"]}
@@ -0,0 +1,72 @@
+# Section extraction compared with the output of the original html.parser extractor.
+#
+# Each tests/fixtures/pmc/<name>.html is a PMC-style page; <name>.json holds the sectionNames and
+# sections the baseline scraper produced for it. The malformed_* pages are known lxml differences:
+# lxml closes the <p> before a block element (or at the next <p>), so text is lost. That is why
+# html.parser stays the default and lxml is opt-in through SCRAPER_HTML_PARSER.
+
+import os
+import json
+import importlib.util
+
+import pytest
+
+import parseris
+from conftest import FIXTURES
+
+PMC_DIR = os.path.join(FIXTURES, "pmc")
+PAGES = sorted(n[:-5] for n in os.listdir(PMC_DIR) if n.endswith(".html"))
+HAVE_LXML = importlib.util.find_spec("lxml") is not None
+
+
+def load(name):
+    with open(os.path.join(PMC_DIR, name + ".html"), "r", encoding="utf-8") as f:
+        html = f.read()
+    with open(os.path.join(PMC_DIR, name + ".json"), "r", encoding="utf-8") as f:
+        golden = json.load(f)
+    return html, golden
+
+
+def extract(monkeypatch, parser, html):
+    monkeypatch.setattr(parseris, "HTML_PARSER", parser)
+    rec = parseris.extract_sections("Title", "https://example.org/PMC1/", html, progress=False)
+    return {"sectionNames": rec["sectionNames"], "sections": rec["sections"]}
+
+
+def test_default_parser_is_html_parser():
+    if not os.environ.get("SCRAPER_HTML_PARSER"):
+        assert parseris.HTML_PARSER == "html.parser"
+
+
+def test_lxml_override_without_lxml_falls_back_to_html_parser(caplog):
+    html, golden = load("article")
+    find_spec = importlib.util.find_spec
+    try:
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setenv("SCRAPER_HTML_PARSER", "lxml")
+            mp.setattr(importlib.util, "find_spec", lambda name, *a: None if name == "lxml" else find_spec(name, *a))
+            mp.delattr(parseris, "etree", raising=False)
+            importlib.reload(parseris)
+            assert parseris.HTML_PARSER == "html.parser"
+            assert "lxml is not installed" in caplog.text
+            rec = parseris.extract_sections("Title", "https://example.org/PMC1/", html, progress=False)
+            assert {"sectionNames": rec["sectionNames"], "sections": rec["sections"]} == golden
+    finally:
+        importlib.reload(parseris)
+
+
+@pytest.mark.parametrize("name", PAGES)
+def test_html_parser_matches_baseline(monkeypatch, name):
+    html, golden = load(name)
+    assert extract(monkeypatch, "html.parser", html) == golden
+
+
+@pytest.mark.skipif(not HAVE_LXML, reason="lxml not installed")
+@pytest.mark.parametrize("name", [
+    pytest.param(n, marks=pytest.mark.xfail(strict=True, reason="lxml repairs malformed <p> differently"))
+    if n.startswith("malformed_") else n
+    for n in PAGES
+])
+def test_lxml_matches_baseline(monkeypatch, name):
+    html, golden = load(name)
+    assert extract(monkeypatch, "lxml", html) == golden
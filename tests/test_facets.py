@@ -0,0 +1,86 @@
+import pytest
+
+from corpus import Article
+from facets import FacetIndex, bitset, section_value
+from search_index import InvertedIndex
+
+ARTICLES = [
+    Article("a", "https://example.org/PMC1/", {"1. Introduction": "Mice flown in microgravity.",
+                                               "Methods": "Hindlimb unloading of mice."}),
+    Article("b", "https://example.org/PMC2/", {"Introduction": "Rats exposed to radiation."}),
+    Article("c", "https://example.org/PMC3/", {"II. Results": "Arabidopsis roots in microgravity and radiation."}),
+]
+
+
+@pytest.fixture(scope="module")
+def facets():
+    return FacetIndex(ARTICLES, InvertedIndex(ARTICLES))
+
+
+def docs(mask, size=len(ARTICLES)):
+    return [d for d in range(size) if mask >> d & 1]
+
+
+def test_section_value_strips_numbering():
+    assert section_value("1. Introduction") == "introduction"
+    assert section_value("II) Results ") == "results"
+    assert section_value("Methods") == "methods"
+
+
+def test_bitset():
+    assert bitset([0, 3, 9], 10) == 0b1000001001
+    assert bitset([], 10) == 0
+
+
+def test_parse_filters_applies_aliases(facets):
+    assert facets.parse_filters(["organism:Mice", "organism:rat", "section:2. Methods", "condition:microgravity"]) == {
+        "organism": ["mouse", "rat"], "section": ["methods"], "condition": ["microgravity"]}
+
+
+@pytest.mark.parametrize("spec", ["organism", "organism:", ":mouse", "planet:mars"])
+def test_parse_filters_rejects_bad_specs(facets, spec):
+    with pytest.raises(ValueError):
+        facets.parse_filters([spec])
+
+
+def test_mask_ors_within_and_ands_across_facets(facets):
+    assert facets.mask({}) is None
+    assert docs(facets.mask({"organism": ["mouse", "rat"]})) == [0, 1]
+    assert docs(facets.mask({"condition": ["microgravity", "radiation"]})) == [0, 1, 2]
+    assert docs(facets.mask({"organism": ["mouse", "rat"], "condition": ["radiation"]})) == [1]
+    assert docs(facets.mask({"section": ["introduction"]})) == [0, 1]
+    assert facets.mask({"organism": ["zebrafish"]}) == 0
+
+
+def test_member_test_matches_mask(facets):
+    mask = facets.mask({"condition": ["microgravity"]})
+    member = FacetIndex.member_test(mask, facets.size)
+    assert [d for d in range(facets.size) if member(d)] == docs(mask)
+
+
+def test_counts_over_results(facets):
+    counts = facets.counts([0, 2], ["condition", "organism"])
+    assert counts["condition"] == {"microgravity": 2, "radiation": 1, "unloading": 1}
+    assert counts["organism"] == {"arabidopsis": 1, "mouse": 1}
+    assert facets.counts([0, 1, 2], ["organism"], top=1) == {"organism": {"arabidopsis": 1}}
+
+
+def test_meta(facets):
+    meta = facets.meta(0, ARTICLES[0])
+    assert meta["pmcid"] == "PMC1"
+    assert meta["sections"] == ["introduction", "methods"]
+    assert meta["organisms"] == ["mouse"]
+    assert meta["conditions"] == ["microgravity", "unloading"]
+
+
+def test_top_terms_look_up_each_idf_once():
+    class CountingIndex(InvertedIndex):
+        def idf(self, term):
+            calls.append(term)
+            return super().idf(term)
+
+    calls = []
+    built = FacetIndex(ARTICLES, CountingIndex(ARTICLES))
+    assert len(calls) == len(set(calls))
+    assert "microgravity" in calls
+    assert built.top_terms == FacetIndex(ARTICLES, InvertedIndex(ARTICLES)).top_terms
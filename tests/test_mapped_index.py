@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from corpus import Article
+from mapped_index import MappedIndex, MappedVectors, write_search_index, write_vectors
+from search_index import InvertedIndex, tokenize
+
+ARTICLES = [
+    Article("Bone loss", "https://example.org/PMC1", {
+        "Abstract": "Bone loss in microgravity. Mice lost bone density in microgravity.",
+        "Methods": "Mice were flown for thirty days; bone density was measured twice."}),
+    Article("Muscle", "https://example.org/PMC2", {"Results": "Muscle mass and bone density fell in mice."}),
+    Article("Plants", "https://example.org/PMC3", {"Intro": "Plant roots in microgravity grow sideways."}),
+    Article("Empty", "https://example.org/PMC4", {}),
+]
+QUERIES = ["bone density", "microgravity", "mice bone", "density in microgravity", "plant roots", "missing term"]
+
+
+@pytest.fixture(scope="module")
+def indexes(tmp_path_factory):
+    memory = InvertedIndex(ARTICLES)
+    path = str(tmp_path_factory.mktemp("mapped") / "search.idx")
+    write_search_index(memory, path, digest="d")
+    return memory, MappedIndex(path)
+
+
+def ranking(matches):
+    return [(m.doc, round(m.score, 9), m.occurrences, m.terms_matched, m.starts)
+            for m in sorted(matches.values(), key=lambda m: (-m.score, m.doc))]
+
+
+def test_mapped_index_has_the_same_statistics(indexes):
+    memory, mapped = indexes
+    assert mapped.terms() == memory.terms()
+    assert (mapped.num_docs, mapped.avgdl, list(mapped.doc_lengths)) == (memory.num_docs, memory.avgdl, list(memory.doc_lengths))
+    for term in memory.terms():
+        assert mapped.idf(term) == memory.idf(term)
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_mapped_index_ranks_and_locates_like_the_memory_index(indexes, query):
+    memory, mapped = indexes
+    terms = tokenize(query)
+    words = (memory.word_matches(terms), mapped.word_matches(terms))
+    assert ranking(words[0]) == ranking(words[1])
+    phrases = (memory.phrase_matches(terms, words[0]), mapped.phrase_matches(terms, words[1]))
+    assert ranking(phrases[0]) == ranking(phrases[1])
+    for doc, m in phrases[0].items():
+        assert mapped.part_tokens(phrases[1][doc], terms) == memory.part_tokens(m, terms)
+    for doc, m in words[0].items():
+        assert mapped.part_tokens(words[1][doc], terms) == memory.part_tokens(m, terms)
+
+
+def test_mapped_vectors_return_stored_chunk_texts(tmp_path):
+    texts = ["Abstract: bone loss", "Methods: mice were flown", "Intro: plant roots ☀"]
+    vectors = [[1.0, 0.0, 0.0], [0.6, 0.8, 0.0], [0.0, 0.0, 2.0]]
+    ids = [(0, 0, 0, 0), (0, 1, 1, 1), (2, 0, 0, 0)]
+    path = str(tmp_path / "vectors.bin")
+    write_vectors(path, ids, vectors, texts=texts, digest="d")
+    mv = MappedVectors(path)
+    assert mv.has_texts and len(mv) == 3
+    rows = mv.top([1.0, 0.1, 0.0], 2)
+    assert [row for row, _ in rows] == [0, 1]
+    assert [mv.text(row) for row, _ in rows] == texts[:2]
+    assert [tuple(int(x) for x in mv.ids[row]) for row, _ in rows] == ids[:2]
+    assert mv.search([0.0, 0.0, 1.0], 1) == [(2, 0, pytest.approx(1.0))]
+
+
+def test_mapped_vectors_without_texts_still_search(tmp_path):
+    path = str(tmp_path / "vectors.bin")
+    write_vectors(path, [(0, 0), (1, 3)], np.eye(2))
+    mv = MappedVectors(path)
+    assert not mv.has_texts
+    assert mv.search([0.0, 1.0], 1) == [(1, 3, pytest.approx(1.0))]
@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+import shlex
+import socket
+import urllib.request
+
+import pytest
+
+from conftest import ROOT
+from ollama_supervisor import READY, OllamaSupervisor
+
+STUB = os.path.join(ROOT, "bench", "stub_ollama.py")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _healthcheck(port):
+    def check():
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/version", timeout=0.5) as resp:
+                return resp.status == 200
+        except OSError:
+            return False
+    return check
+
+
+def _until(condition, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail("timed out")
+        time.sleep(0.05)
+
+
+def _supervisor(command, port, **kwargs):
+    kwargs.setdefault("backoff_min", 0.05)
+    kwargs.setdefault("backoff_max", 0.2)
+    return OllamaSupervisor("llama3", command=command, autostart=True, restart=True, preload=False,
+                            start_timeout=10, interval=0.2, healthcheck=_healthcheck(port), **kwargs)
+
+
+@pytest.fixture
+def stub_command():
+    port = _free_port()
+    return " ".join(shlex.quote(a) for a in (sys.executable, STUB, "--port", str(port))), port
+
+
+def test_starts_the_server_and_restarts_it_after_it_is_killed(stub_command):
+    command, port = stub_command
+    sup = _supervisor(command, port)
+    sup.start()
+    try:
+        assert sup.wait_ready(15)
+        assert sup.launches == 1 and sup.status()["restarts"] == 0
+        first = sup.process
+        first.kill()
+        _until(lambda: sup.state != READY)
+        assert sup.wait_ready(15)
+        assert sup.process is not first
+        status = sup.status()
+        assert (status["restarts"], status["launch_failures"]) == (1, 0)
+    finally:
+        sup.stop()
+    assert first.poll() is not None
+
+
+def test_failed_launches_back_off_and_do_not_count_as_restarts():
+    port = _free_port()
+    sup = _supervisor(os.path.join(ROOT, "no-such-ollama") + " serve", port)
+    started = time.monotonic()
+    sup.start()
+    try:
+        _until(lambda: sup.launch_failures >= 3)
+        elapsed = time.monotonic() - started
+    finally:
+        sup.stop()
+    status = sup.status()
+    assert sup.launches == 0 and status["restarts"] == 0
+    assert status["failures"] >= 3 and "not found" in status["last_error"]
+    # the delays between the attempts doubled: backoff_min * (1 + 2)
+    assert elapsed >= 0.15
+    assert not status["managed"]
@@ -0,0 +1,107 @@
+import pytest
+
+import query_cache
+from query_cache import QueryCache, normalize_query
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(query_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_lru_evicts_least_recently_used():
+    cache = QueryCache("t", max_entries=2, ttl=60, max_bytes=1000)
+    cache.put("a", 1, 1)
+    cache.put("b", 2, 1)
+    assert cache.get("a") == 1          # "b" is now the oldest
+    cache.put("c", 3, 1)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.evictions == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = QueryCache("t", max_entries=10, ttl=5, max_bytes=1000)
+    cache.put("a", 1, 10)
+    clock[0] += 5
+    assert cache.get("a") == 1
+    clock[0] += 0.1
+    assert cache.get("a", "gone") == "gone"
+    assert cache.stats()["bytes"] == 0
+
+
+def test_byte_cap_evicts_until_it_fits():
+    cache = QueryCache("t", max_entries=10, ttl=60, max_bytes=100)
+    cache.put("a", 1, 40)
+    cache.put("b", 2, 40)
+    cache.put("c", 3, 40)
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 80
+    cache.put("huge", 4, 101)           # larger than the cap: never stored
+    assert cache.get("huge") is None
+    assert cache.stats()["entries"] == 2
+
+
+def test_replacing_a_key_updates_its_size():
+    cache = QueryCache("t", max_entries=10, ttl=60, max_bytes=100)
+    cache.put("a", 1, 60)
+    cache.put("a", 2, 30)
+    assert cache.get("a") == 2
+    assert cache.stats()["bytes"] == 30
+
+
+def test_bind_drops_entries_of_other_versions():
+    cache = QueryCache("t", max_entries=10, ttl=60, max_bytes=100)
+    cache.bind("v1")
+    cache.put("a", 1, 1)
+    cache.bind("v1")
+    assert cache.get("a") == 1
+    cache.bind("v2")
+    assert cache.get("a") is None
+    assert cache.invalidations == 1
+
+
+def test_zero_entries_disables_the_cache():
+    cache = QueryCache("t", max_entries=0, ttl=60, max_bytes=100)
+    cache.put("a", 1, 1)
+    assert not cache.enabled
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 0
+
+
+def test_hit_rate():
+    cache = QueryCache("t", max_entries=10, ttl=60, max_bytes=100)
+    cache.put("a", 1, 1)
+    cache.get("a")
+    cache.get("b")
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_normalize_query():
+    assert normalize_query("  Bone   LOSS\tin mice ") == "bone loss in mice"
+
+
+def test_put_for_a_swapped_version_is_dropped():
+    cache = QueryCache("t", max_entries=10, ttl=60, max_bytes=1000)
+    cache.bind("v1")
+    assert cache.get("q") is None       # a request starts on v1 ...
+    cache.bind("v2")                    # ... the corpus is swapped under it ...
+    cache.put("q", "old page", 8, version="v1")
+    assert cache.get("q") is None       # ... and its v1 result is not served for v2
+    assert cache.stats()["stale_puts"] == 1
+    cache.put("q", "new page", 8, version="v2")
+    assert cache.get("q") == "new page"
+
+
+def test_contains_checks_without_counting_or_reordering(clock):
+    cache = QueryCache("t", max_entries=2, ttl=5, max_bytes=1000)
+    cache.put("a", 1, 1)
+    cache.put("b", 2, 1)
+    assert "a" in cache and "missing" not in cache
+    assert (cache.hits, cache.misses) == (0, 0)
+    cache.put("c", 3, 1)                # "a" was not refreshed by the check, so it goes
+    assert "a" not in cache and "b" in cache
+    clock[0] += 6
+    assert "b" not in cache
@@ -0,0 +1,27 @@
+import pytest
+
+import record_store
+import record_writer
+
+
+def test_reader_uses_the_writers_record_key():
+    assert record_store.record_key is record_writer.record_key
+    assert record_store.index_path_for is record_writer.index_path_for
+    assert record_store.aliases_path_for is record_writer.aliases_path_for
+
+
+@pytest.mark.parametrize("link, key", [
+    ("https://www.ncbi.nlm.nih.gov/pmc/articles/PMC4136787/", "PMC4136787"),
+    ("https://pmc.ncbi.nlm.nih.gov/articles/pmc4136787", "PMC4136787"),
+    ("https://example.org/PMC11/figure/PMC22/", "PMC11"),
+])
+def test_pmc_links(link, key):
+    assert record_writer.record_key(link) == key
+
+
+def test_other_links_hash_the_link():
+    key = record_writer.record_key("https://example.org/article/42")
+    assert key.startswith("link-") and len(key) == len("link-") + 16
+    assert key == record_writer.record_key("https://example.org/article/42")
+    assert key != record_writer.record_key("https://example.org/article/43")
+    assert record_writer.record_key(None) == record_writer.record_key("")
@@ -0,0 +1,68 @@
+import pytest
+
+import corpus
+import retrieval
+from corpus import Article, CorpusSnapshot
+from retrieval import rrf
+
+
+def test_rrf_scores_are_summed_reciprocal_ranks():
+    fused = dict(rrf([["a", "b", "c"], ["c", "a"]], k=60))
+    assert fused["a"] == pytest.approx(1 / 61 + 1 / 62)
+    assert fused["b"] == pytest.approx(1 / 62)
+    assert fused["c"] == pytest.approx(1 / 63 + 1 / 61)
+
+
+def test_rrf_orders_by_fused_score():
+    assert [key for key, _ in rrf([["a", "b", "c"], ["c", "b", "a"], ["b"]])] == ["b", "a", "c"]
+
+
+def test_rrf_ties_keep_first_seen_order():
+    assert [key for key, _ in rrf([["x", "y"], ["y", "x"]])] == ["x", "y"]
+
+
+def test_rrf_small_k_favours_top_ranks():
+    # "a" is first once, "b" fourth twice: a small k lets the single first place win
+    rankings = [["a", "x", "y", "b"], ["c", "d", "e", "b"]]
+    for k, winner in ((1, "a"), (60, "b")):
+        fused = dict(rrf(rankings, k=k))
+        assert max(("a", "b"), key=fused.get) == winner
+
+
+def test_rrf_of_nothing():
+    assert rrf([]) == [] and rrf([[], []]) == []
+
+
+class _Doc:
+    def __init__(self, **metadata):
+        self.metadata = metadata
+
+
+@pytest.fixture
+def snapshot(monkeypatch):
+    monkeypatch.setattr(corpus, "SEARCH_INDEX_MMAP", False)
+    arts = tuple(Article(f"t{i}", f"https://example.org/PMC{i}/", {"Body": text})
+                 for i, text in enumerate(["bone loss", "muscle loss", "plant growth"]))
+    return CorpusSnapshot("mem", (0,), "digest", arts)
+
+
+def test_hybrid_articles_fuses_lexical_and_dense(snapshot):
+    lexical = retrieval.lexical_ranking(snapshot, ["loss"], exact=False)
+    dense = [_Doc(article="PMC2"), _Doc(article="PMC1"), _Doc(article="PMC2")]
+    fused = retrieval.hybrid_articles(snapshot, lexical, dense, exact=False)
+    docs = [m.doc for m, _, _ in fused]
+    assert docs[0] == 1 and set(docs) == {0, 1, 2}
+    # dense-only articles come back with an empty match
+    only_dense = next(m for m, _, _ in fused if m.doc == 2)
+    assert only_dense.terms_matched == 0
+
+
+def test_hybrid_articles_exact_adds_no_dense_only_articles(snapshot):
+    lexical = retrieval.lexical_ranking(snapshot, ["bone", "loss"], exact=True)
+    fused = retrieval.hybrid_articles(snapshot, lexical, [_Doc(article="PMC2"), _Doc(article="PMC0")], exact=True)
+    assert [m.doc for m, _, _ in fused] == [0]
+
+
+def test_hybrid_articles_prefers_the_chunk_doc_number(snapshot):
+    fused = retrieval.hybrid_articles(snapshot, [], [_Doc(article="PMC0", doc=2)], exact=False)
+    assert [m.doc for m, _, _ in fused] == [2]
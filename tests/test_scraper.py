@@ -0,0 +1,117 @@
+# parseris.py against a local HTTP server standing in for PMC: per-host rate limiting in the
+# concurrent pipeline, resuming an interrupted run from the journal, and 304 revalidation.
+
+import threading
+from time import monotonic
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import parseris
+from record_writer import iter_records
+from scrape_cache import ResponseCache
+
+PAGE = """<html><body><section class="main-article-body">
+<section><h2>Abstract</h2><p>Article {path} abstract.</p></section>
+<section><h2>Results</h2><p>Results of {path}.</p></section>
+</section></body></html>"""
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        etag = f'"v1{self.path}"'
+        status = 304 if self.headers.get("If-None-Match") == etag else 200
+        with server.lock:
+            server.hits.append((self.path, monotonic(), status))
+        body = b"" if status == 304 else PAGE.format(path=self.path).encode("utf-8")
+        self.send_response(status)
+        self.send_header("ETag", etag)
+        if status == 200:
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    srv.daemon_threads = True
+    srv.hits = []
+    srv.lock = threading.Lock()
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    srv.url = f"http://127.0.0.1:{srv.server_port}"
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture
+def scrape(monkeypatch, tmp_path, server):
+    """Point parseris at tmp_path and five articles on ``server``; returns the output path."""
+    pubs = [(f"Article {n}", f"{server.url}/PMC{n}/") for n in range(1, 6)]
+    monkeypatch.setattr(parseris, "publications", pubs)
+    monkeypatch.setattr(parseris, "OUT_PATH", str(tmp_path / "data.jsonl"))
+    monkeypatch.setattr(parseris, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(parseris, "JOURNAL_PATH", str(tmp_path / "journal.jsonl"))
+    return tmp_path / "data.jsonl"
+
+
+def test_concurrent_fetches_are_spaced_per_host(server):
+    items = [(f"Article {n}", f"{server.url}/PMC{n}/") for n in range(1, 7)]
+    results = []
+    parseris.run_concurrent(items, results.append, workers=4, rate=10, parse_procs=1)
+
+    assert sorted(r["name"] for r in results) == sorted(name for name, _ in items)
+    assert not any(r.get("error") for r in results)
+    assert all(r["sectionNames"] == ["Abstract", "Results"] for r in results)
+    times = sorted(t for _, t, _ in server.hits)
+    # start times are 0.1s apart at the client; allow for scheduling jitter on arrival
+    assert min(b - a for a, b in zip(times, times[1:])) >= 0.08
+
+
+class _Crash(BaseException):
+    pass
+
+
+def test_resume_after_crash_fetches_each_url_once(monkeypatch, scrape, server):
+    parsing = parseris.parsing
+    calls = []
+
+    def crash_on_third(*args, **kwargs):
+        calls.append(args[1])
+        if len(calls) == 3:
+            raise _Crash()
+        return parsing(*args, **kwargs)
+
+    monkeypatch.setattr(parseris, "parsing", crash_on_third)
+    with pytest.raises(_Crash):
+        parseris.main(["--workers", "1"])
+    assert len(server.hits) == 2
+
+    monkeypatch.setattr(parseris, "parsing", parsing)
+    parseris.main(["--workers", "2", "--rate", "0", "--parse-procs", "1"])
+
+    paths = [path for path, _, _ in server.hits]
+    assert sorted(paths) == [f"/PMC{n}/" for n in range(1, 6)]
+    assert [r["name"] for r in iter_records(str(scrape))] == [f"Article {n}" for n in range(1, 6)]
+
+
+def test_revalidation_reuses_cached_body(scrape, server, tmp_path):
+    parseris.main(["--workers", "1"])
+    first = list(iter_records(str(scrape)))
+
+    parseris.main(["--workers", "1", "--revalidate"])
+    assert [status for _, _, status in server.hits] == [200] * 5 + [304] * 5
+    assert list(iter_records(str(scrape))) == first
+
+    url = f"{server.url}/PMC1/"
+    html, err, not_modified = parseris.fetch("Article 1", url, cache=ResponseCache(str(tmp_path / "cache")))
+    assert (err, not_modified) == (None, True)
+    assert html == PAGE.format(path="/PMC1/")
@@ -0,0 +1,78 @@
+import math
+
+import pytest
+
+from corpus import Article
+from search_index import BM25_B, BM25_K1, InvertedIndex, tokenize
+
+
+def article(name, sections):
+    return Article(name, f"https://example.org/{name}", sections)
+
+
+@pytest.fixture
+def index():
+    return InvertedIndex([
+        article("a", {"Intro": "bone loss in microgravity", "Methods": "mice were flown"}),
+        article("b", {"Results": "bone bone bone density fell"}),
+        article("c", {"Bone": "loss of muscle mass"}),
+    ])
+
+
+def test_tokenize_lowercases_words():
+    assert tokenize("Bone-Loss, in 2 MICE!") == ["bone", "loss", "in", "2", "mice"]
+
+
+def test_bm25_score_matches_formula(index):
+    df, n = 2, index.num_docs  # "loss" is in docs 0 and 2
+    idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+    assert index.idf("loss") == pytest.approx(idf)
+    tf, dl = 1, index.doc_lengths[0]
+    norm = BM25_K1 * (1.0 - BM25_B + BM25_B * dl / index.avgdl)
+    expected = idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+    assert index.word_matches(["loss"])[0].score == pytest.approx(expected)
+
+
+def test_rarer_terms_weigh_more(index):
+    assert index.idf("density") > index.idf("bone")
+    assert index.idf("missing") > index.idf("density")
+
+
+def test_term_frequency_raises_score(index):
+    scores = {doc: m.score for doc, m in index.word_matches(["bone"]).items()}
+    assert set(scores) == {0, 1, 2}
+    assert max(scores, key=scores.get) == 1
+
+
+def test_word_matches_count_distinct_terms(index):
+    matches = index.word_matches(["bone", "loss", "bone", "nothing"])
+    assert {doc: m.terms_matched for doc, m in matches.items()} == {0: 2, 1: 1, 2: 2}
+
+
+def test_phrase_needs_consecutive_tokens(index):
+    phrase = index.phrase_matches(["bone", "loss"])
+    assert set(phrase) == {0}
+    assert phrase[0].occurrences == 1
+    assert index.phrase_matches(["loss", "bone"]) == {}
+    assert index.phrase_matches(["bone", "absent"]) == {}
+
+
+def test_phrase_does_not_cross_parts(index):
+    # doc 2: section title "Bone" is followed by the body "loss of ..."
+    assert 2 not in index.phrase_matches(["bone", "loss"])
+    assert 2 in index.word_matches(["bone", "loss"])
+
+
+def test_phrase_keeps_word_scores(index):
+    scored = index.word_matches(["bone", "loss"])
+    phrase = index.phrase_matches(["bone", "loss"], scored)
+    assert phrase[0].score == scored[0].score
+
+
+def test_part_tokens_locate_hits(index):
+    art = article("a", {"Intro": "bone loss in microgravity", "Methods": "mice were flown"})
+    phrase = index.phrase_matches(["bone", "loss"])[0]
+    body = art.body_part(0)
+    assert index.part_tokens(phrase, ["bone", "loss"]) == {body: [(0, 2, 0)]}
+    words = index.word_matches(["mice", "microgravity"])[0]
+    assert index.part_tokens(words, ["mice", "microgravity"]) == {body: [(3, 1, 1)], art.body_part(1): [(0, 1, 0)]}
@@ -0,0 +1,57 @@
+# /ask/stream sanitizes token by token; the result must equal sanitize_answer on the whole answer
+# however the model happens to split it.
+
+import os
+import random
+import importlib
+
+import pytest
+
+from conftest import ROOT
+
+# app.py mounts static/ and templates/ relative to the working directory, like `cd app && uvicorn`
+_cwd = os.getcwd()
+os.chdir(os.path.join(ROOT, "app"))
+try:
+    app = importlib.import_module("app")
+finally:
+    os.chdir(_cwd)
+StreamingSanitizer, sanitize_answer = app.StreamingSanitizer, app.sanitize_answer
+
+ANSWERS = [
+    "**Bone loss** was observed (Source: Mice in *microgravity*).",
+    "Stars: * ** *** **** ***** and a trailing run ***",
+    "Tags stay text: <b>bold</b>, <a href=\"x\">link</a>, <script>alert(1)</script>",
+    "Entities too: &amp; &lt;b&gt; &#42;&#42; &nbsp;**not bold**&quot;",
+    "Mixed <i>**a**</i> &amp;** <**b**> &#x2A;*",
+    "",
+    "*",
+]
+
+
+def stream(chunks):
+    sanitizer = StreamingSanitizer()
+    return "".join(sanitizer.feed(c) for c in chunks) + sanitizer.flush()
+
+
+@pytest.mark.parametrize("text", ANSWERS)
+def test_every_two_way_split_matches_whole_text(text):
+    expected = sanitize_answer(text)
+    for cut in range(len(text) + 1):
+        assert stream([text[:cut], text[cut:]]) == expected, cut
+
+
+def test_random_chunkings_match_whole_text():
+    rng = random.Random(1234)
+    pieces = ["*", "**", "***", "<", ">", "</", "b>", "&", "amp;", "&#", "42;", " ", "bone", "loss", "\n", ""]
+    texts = ANSWERS + ["".join(rng.choice(pieces) for _ in range(rng.randint(0, 60))) for _ in range(300)]
+    for text in texts:
+        expected = sanitize_answer(text)
+        for _ in range(20):
+            cuts = sorted(rng.sample(range(len(text) + 1), rng.randint(0, min(8, len(text) + 1))))
+            chunks = [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+            assert stream(chunks) == expected, chunks
+
+
+def test_empty_and_none_chunks_are_ignored():
+    assert stream(["**a", None, "", "*", "**b**"]) == sanitize_answer("**a***b**") == "a*b"